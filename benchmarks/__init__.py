@@ -0,0 +1,37 @@
+"""
+Standalone benchmarks. Each module runs against a throwaway SQLite file, never
+the project database:
+
+    python -m benchmarks.posting_load
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def setup_scratch_db(**database_options):
+    """Point Django at a fresh temporary SQLite file and migrate it. Returns the file path."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+
+    path = os.path.join(tempfile.mkdtemp(prefix='sacco-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = path
+    settings.DATABASES['default'].update(database_options)
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return path
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
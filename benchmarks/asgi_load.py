@@ -0,0 +1,217 @@
+"""
+Concurrency and tail latency of the member and admin dashboard APIs under
+WSGI and ASGI, with slow clients. Both paths run the full middleware stack
+in-process: the WSGI path calls the sync views through WSGIHandler on a
+fixed pool of worker threads (as a threaded WSGI server would), the ASGI
+path calls the async variants through ASGIHandler on one event loop. Each
+response is then held for --client-delay ms while the client "downloads" it:
+a WSGI worker is blocked for that time, an ASGI request only awaits.
+
+    python -m benchmarks.asgi_load [--members 1000] [--clients 64] [--threads 8] [--seconds 10] [--client-delay 200]
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_scratch_db, percentile
+
+# Share of requests that are staff admin-data reads rather than member dashboards
+STAFF_SHARE = 0.1
+
+PATHS = {
+    'wsgi': ('/api/dashboard-data/', '/api/admin-data/'),
+    'asgi': ('/api/async/dashboard-data/', '/api/async/admin-data/'),
+}
+
+
+class InFlight:
+    """Counts requests between entering the handler and the client finishing the download."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.current -= 1
+
+
+def pick(rng, paths, cookies):
+    """(path, query string, cookie) for the next request."""
+    member_path, staff_path = paths
+    if rng.random() < STAFF_SHARE:
+        return staff_path, f'page={rng.randrange(1, 4)}', cookies['staff']
+    return member_path, f'page={rng.randrange(1, 3)}', rng.choice(cookies['members'])
+
+
+def summarize(name, latencies, failures, elapsed, in_flight, threads):
+    return {
+        'path': name,
+        'requests': len(latencies),
+        'failures': failures,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+        'peak_in_flight': in_flight.peak,
+        'peak_threads': threads,
+    }
+
+
+def run_wsgi(cookies, clients, threads, seconds, delay):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    in_flight = InFlight()
+    latencies, failures = [], []
+
+    def serve(path, query, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        }
+        status = []
+        with in_flight:
+            response = handler(environ, lambda s, headers: status.append(s))
+            try:
+                b''.join(response)
+                # A sync worker writes the body itself, so it is tied up until the client has read it
+                time.sleep(delay)
+            finally:
+                response.close()
+        return status[0].startswith('200')
+
+    stop = time.monotonic() + seconds
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as workers:
+        def client(seed):
+            rng = random.Random(seed)
+            while time.monotonic() < stop:
+                begun = time.perf_counter()
+                ok = workers.submit(serve, *pick(rng, PATHS['wsgi'], cookies)).result()
+                (latencies if ok else failures).append(time.perf_counter() - begun)
+
+        client_threads = [threading.Thread(target=client, args=(seed,)) for seed in range(clients)]
+        for thread in client_threads:
+            thread.start()
+        for thread in client_threads:
+            thread.join()
+    return summarize('wsgi', latencies, len(failures), time.monotonic() - started, in_flight, threads)
+
+
+def run_asgi(cookies, clients, seconds, delay):
+    from django.core.handlers.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+    in_flight = InFlight()
+    latencies, failures = [], []
+    peak_threads = threading.active_count()
+
+    async def serve(path, query, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        done = asyncio.Event()
+        received = False
+        status = []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                # The slow download only keeps this coroutine waiting
+                await asyncio.sleep(delay)
+                done.set()
+
+        with in_flight:
+            await handler(scope, receive, send)
+        return status[0] == 200
+
+    async def client(seed, stop):
+        nonlocal peak_threads
+        rng = random.Random(seed)
+        while time.monotonic() < stop:
+            begun = time.perf_counter()
+            ok = await serve(*pick(rng, PATHS['asgi'], cookies))
+            (latencies if ok else failures).append(time.perf_counter() - begun)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    async def main():
+        stop = time.monotonic() + seconds
+        await asyncio.gather(*(client(seed, stop) for seed in range(clients)))
+
+    started = time.monotonic()
+    asyncio.run(main())
+    return summarize('asgi', latencies, len(failures), time.monotonic() - started, in_flight, peak_threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=64, help="Concurrent clients")
+    parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+    parser.add_argument('--seconds', type=float, default=10, help="Duration of each run")
+    parser.add_argument('--client-delay', type=float, default=200, help="Milliseconds each client takes to read a response")
+    args = parser.parse_args()
+
+    setup_scratch_db()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import close_old_connections
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from finance.seeding import seed_members
+
+    # Allows the test client's host name and keeps DEBUG off, as in production
+    setup_test_environment()
+    # Every request here is slow by design; don't log each one
+    settings.METRICS_SLOW_REQUEST_SECONDS = float('inf')
+    seed_members(args.members, 1)
+    staff = User.objects.create_user(username='staff-bench', password='x', is_staff=True)
+
+    def cookie_for(user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    members = User.objects.filter(is_staff=False).order_by('?')[:min(args.members, 200)]
+    cookies = {'staff': cookie_for(staff), 'members': [cookie_for(member) for member in members]}
+    close_old_connections()
+
+    delay = args.client_delay / 1000
+    wsgi = run_wsgi(cookies, args.clients, args.threads, args.seconds, delay)
+    asgi = run_asgi(cookies, args.clients, args.seconds, delay)
+    print(json.dumps({
+        'members': args.members,
+        'clients': args.clients,
+        'wsgi_threads': args.threads,
+        'client_delay_ms': args.client_delay,
+        'runs': [wsgi, asgi],
+        'throughput_ratio': round(asgi['requests_per_second'] / wsgi['requests_per_second'], 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Annual dividend run over a large share register: seeds SHARE_TRANSFER history
+spread over two years, then times the streaming computation (dry run) and the
+full payout (finance.dividends.pay_dividends).
+
+    python -m benchmarks.dividends [--transactions 1000000] [--members 50000]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks import setup_scratch_db
+
+
+def seed(members, transactions):
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django.utils import timezone
+    from finance.models import Transaction, MemberAccount
+
+    User.objects.bulk_create([User(username=f'member{i}') for i in range(members)], batch_size=5000)
+    user_ids = list(User.objects.values_list('id', flat=True))
+    MemberAccount.objects.bulk_create([MemberAccount(user_id=user_id) for user_id in user_ids], batch_size=5000)
+
+    rng = random.Random(42)
+    start = timezone.make_aware(datetime(2024, 1, 1))
+    span = 2 * 365 * 24 * 3600
+    for offset in range(0, transactions, 50000):
+        with transaction.atomic():
+            Transaction.objects.bulk_create([
+                Transaction(user_id=rng.choice(user_ids), transaction_type='SHARE_TRANSFER',
+                            amount=Decimal(rng.randrange(100, 100000)) / 100,
+                            date=start + timedelta(seconds=rng.randrange(span)))
+                for _ in range(min(50000, transactions - offset))
+            ], batch_size=5000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--members', type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup_scratch_db()
+    from finance.dividends import pay_dividends
+
+    started = time.perf_counter()
+    seed(args.members, args.transactions)
+    seeded = time.perf_counter() - started
+
+    started = time.perf_counter()
+    preview = pay_dividends(2025, dry_run=True)
+    computed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    paid = pay_dividends(2025)
+    payout = time.perf_counter() - started
+
+    print(json.dumps({
+        'share_transactions': args.transactions,
+        'members': args.members,
+        'seed_seconds': round(seeded, 2),
+        'dry_run_seconds': round(computed, 2),
+        'rows_per_second': round(args.transactions / computed),
+        'payout_seconds': round(payout, 2),
+        'members_paid': paid['members'],
+        'total_paid': str(paid['total']),
+        'matches_dry_run': preview['total'] == paid['total'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Endpoint benchmark suite: seeds synthetic members (finance.seeding) up to
+each scale point in turn, then measures latency percentiles and SQL query
+counts for the main member, staff and admin endpoints through the full
+middleware stack. The JSON report has stable keys, so reports from two
+releases can be diffed directly.
+
+    python -m benchmarks.endpoints [--scales 100 1000 10000] [--years 2] [--requests 50] [--output report.json]
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import time
+
+from benchmarks import setup_scratch_db, percentile
+
+
+def endpoint_cases(rng):
+    """(name, method, url, payload, who) for every measured endpoint; `who` is 'member' or 'staff'."""
+    return [
+        ('dashboard_api', 'get', '/api/dashboard-data/', None, 'member'),
+        ('transact_api', 'post', '/api/transact/',
+         lambda: {'action': 'DEPOSIT', 'amount': str(rng.randrange(100, 1000))}, 'member'),
+        ('admin_dashboard_api', 'get', '/api/admin-data/', None, 'staff'),
+        ('staff_dashboard', 'get', '/staff/dashboard/', None, 'staff'),
+        ('admin_invest_api', 'post', '/api/admin-invest/', lambda: {'amount': '1'}, 'staff'),
+    ]
+
+
+def measure(client_for, case, requests, member_ids):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    name, method, url, payload, who = case
+    latencies, queries, failures = [], [], 0
+    for i in range(requests):
+        # Members rotate so dashboard reads are cache misses, as on a real first page load
+        client = client_for(member_ids[i % len(member_ids)] if who == 'member' else None)
+        cache.clear()
+        kwargs = {'data': json.dumps(payload()), 'content_type': 'application/json'} if payload else {}
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(ctx.captured_queries))
+        if response.status_code != 200:
+            failures += 1
+
+    return {
+        'requests': requests,
+        'failures': failures,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[100, 1000, 10000], help="Member counts, ascending")
+    parser.add_argument('--years', type=int, default=2, help="Years of history per member")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per endpoint per scale point")
+    parser.add_argument('--output', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    setup_scratch_db()
+    import django
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from finance.models import Transaction, Loan
+    from finance.seeding import seed_members
+
+    # Allows the test client's host name and keeps DEBUG off, as in production
+    setup_test_environment()
+    staff = User.objects.create_user(username='staff-bench', password='x', is_staff=True)
+    staff_client = Client()
+    staff_client.force_login(staff)
+    member_clients = {}
+
+    def client_for(user_id):
+        if user_id is None:
+            return staff_client
+        if user_id not in member_clients:
+            member_clients[user_id] = Client()
+            member_clients[user_id].force_login(User.objects.get(pk=user_id))
+        return member_clients[user_id]
+
+    rng = random.Random(7)
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'years': args.years,
+        'requests_per_endpoint': args.requests,
+        'scales': [],
+    }
+
+    members = 0
+    for scale in sorted(args.scales):
+        seeded = seed_members(scale - members, args.years, seed=scale) if scale > members else None
+        members = scale
+        member_ids = rng.sample(list(User.objects.filter(username__startswith='bench').exclude(is_staff=True)
+                                     .values_list('id', flat=True)), min(scale, args.requests))
+        point = {
+            'members': scale,
+            'transactions': Transaction.objects.count(),
+            'loans': Loan.objects.count(),
+            'seed_seconds': seeded['seconds'] if seeded else 0,
+            'endpoints': {},
+        }
+        for case in endpoint_cases(rng):
+            point['endpoints'][case[0]] = measure(client_for, case, args.requests, member_ids)
+        report['scales'].append(point)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Month-end burst benchmark: many threads posting tiny DEPOSITs, first with one
+commit per request (finance.posting.post_transaction), then through the
+group-commit writer (finance.group_commit.GroupCommitter). Reports throughput
+and p50/p99 latency for both paths.
+
+    python -m benchmarks.group_commit [--requests 2000] [--threads 64] [--window-ms 5]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks import setup_scratch_db, percentile
+
+
+def measure(name, post, members, requests, threads):
+    from django.db import connections
+
+    def run(i):
+        started = time.perf_counter()
+        try:
+            post(members[i % len(members)], 'DEPOSIT', Decimal(100), 'BENCH')
+            ok = True
+        except Exception:
+            ok = False
+        finally:
+            connections.close_all()
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(run, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for _, latency in outcomes]
+
+    return {
+        'path': name,
+        'requests': requests,
+        'failed': sum(1 for ok, _ in outcomes if not ok),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--window-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    setup_scratch_db()
+    from django.contrib.auth.models import User
+    from finance.group_commit import GroupCommitter
+    from finance.ledger import rebuild_member_accounts
+    from finance.posting import post_transaction
+
+    members = [User.objects.create_user(username=f'member{i}') for i in range(args.members)]
+
+    per_request = measure('per_request_commit', post_transaction, members, args.requests, args.threads)
+
+    committer = GroupCommitter(window=args.window_ms / 1000)
+    try:
+        grouped = measure('group_commit', committer.submit, members, args.requests, args.threads)
+    finally:
+        committer.stop()
+    grouped['batches'] = committer.batches
+    grouped['mean_batch_size'] = round(committer.postings / committer.batches, 1) if committer.batches else 0
+
+    print(json.dumps({
+        'results': [per_request, grouped],
+        'speedup': round(grouped['requests_per_second'] / per_request['requests_per_second'], 2),
+        'ledger_mismatches': len(rebuild_member_accounts(repair=False)),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
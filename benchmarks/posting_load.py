@@ -0,0 +1,100 @@
+"""
+Multithreaded load test for finance.posting: hundreds of concurrent
+withdrawals and share transfers against one hot member and against many
+members. Reports throughput and checks that no account was overdrawn.
+
+    python -m benchmarks.posting_load [--requests 400] [--threads 32] [--members 20]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks import setup_scratch_db, percentile
+
+
+def run_scenario(name, jobs, threads):
+    from django.db import connections
+    from finance.posting import InsufficientFunds
+
+    latencies, outcomes = [], {'posted': 0, 'refused': 0, 'errors': 0}
+
+    def run(job):
+        started = time.perf_counter()
+        try:
+            job()
+            outcome = 'posted'
+        except InsufficientFunds:
+            outcome = 'refused'
+        except Exception:
+            outcome = 'errors'
+        finally:
+            connections.close_all()
+        return outcome, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for outcome, latency in pool.map(run, jobs):
+            outcomes[outcome] += 1
+            latencies.append(latency)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'scenario': name,
+        'requests': len(jobs),
+        **outcomes,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(jobs) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--members', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_scratch_db()
+    from django.contrib.auth.models import User
+    from finance.ledger import rebuild_member_accounts
+    from finance.models import Transaction, MemberAccount
+    from finance.posting import post_transaction
+
+    opening = Decimal(1000)
+    hot = User.objects.create_user(username='hot')
+    members = [User.objects.create_user(username=f'member{i}') for i in range(args.members)]
+    for member in [hot] + members:
+        Transaction.objects.create(user=member, amount=opening, transaction_type='DEPOSIT')
+
+    kinds = ('WITHDRAWAL', 'SHARE_TRANSFER')
+    same_member = [
+        lambda i=i: post_transaction(hot, kinds[i % 2], Decimal(7))
+        for i in range(args.requests)
+    ]
+    many_members = [
+        lambda i=i: post_transaction(members[i % len(members)], kinds[i % 2], Decimal(7))
+        for i in range(args.requests)
+    ]
+
+    results = [
+        run_scenario('same_member', same_member, args.threads),
+        run_scenario('many_members', many_members, args.threads),
+    ]
+
+    overdrawn = MemberAccount.objects.filter(savings__lt=0).count()
+    report = {
+        'scenarios': results,
+        'overdrawn_accounts': overdrawn,
+        'ledger_mismatches': len(rebuild_member_accounts(repair=False)),
+    }
+    print(json.dumps(report, indent=2))
+    if overdrawn or report['ledger_mismatches']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Mixed read/write throughput under the development and production SQLite
+profiles (config/settings.py). Threads run a request mix for a fixed time:
+member deposits, member history reads and, for staff, the portfolio-at-risk
+report. Each operation ends like a request does, with close_old_connections(),
+so the development profile reopens the file every time while the production
+one keeps its connections. In the production run the report reads come from
+the replica. Each profile runs in its own process.
+
+    python -m benchmarks.sqlite_profile [--members 2000] [--threads 16] [--seconds 10] [--writes 0.2]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks import setup_scratch_db, percentile
+
+PROFILES = ('development', 'production')
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Share of reads that are staff reports rather than member history pages
+REPORT_SHARE = 0.1
+
+
+def configure(profile):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+
+    if profile == 'production':
+        settings.DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': '',
+                                         'OPTIONS': settings.SQLITE_REPLICA_OPTIONS, 'CONN_MAX_AGE': 600}
+        settings.REPLICA_DATABASE = 'replica'
+        path = setup_scratch_db(OPTIONS=settings.SQLITE_PRODUCTION_OPTIONS, CONN_MAX_AGE=600)
+        settings.DATABASES['replica']['NAME'] = os.path.join(os.path.dirname(path), 'replica.sqlite3')
+    else:
+        setup_scratch_db()
+
+
+def run_profile(profile, members, threads, seconds, writes):
+    configure(profile)
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, close_old_connections
+    from finance.models import Transaction
+    from finance.posting import post_transaction
+    from finance.replica import replica_reads, sync_replica, replica_database
+    from finance.reports import par_report
+    from finance.seeding import seed_members
+
+    seed_members(members, 1)
+    if replica_database():
+        sync_replica()
+    user_ids = list(User.objects.values_list('id', flat=True))
+    close_old_connections()
+
+    def deposit(rng):
+        post_transaction(User(pk=rng.choice(user_ids)), 'DEPOSIT', Decimal(rng.randrange(100, 1000)))
+
+    def history(rng):
+        list(Transaction.objects.filter(user_id=rng.choice(user_ids)).order_by('-date', '-id')
+             .values('id', 'amount', 'transaction_type', 'date')[:20])
+
+    def report(rng):
+        with replica_reads():
+            par_report()
+
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    latencies = {'deposit': [], 'history': [], 'report': []}
+    errors = {'deposit': 0, 'history': 0, 'report': 0}
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < stop:
+            roll = rng.random()
+            name = 'deposit' if roll < writes else 'report' if roll < writes + (1 - writes) * REPORT_SHARE else 'history'
+            started = time.perf_counter()
+            try:
+                {'deposit': deposit, 'history': history, 'report': report}[name](rng)
+                failed = False
+            except OperationalError:
+                failed = True
+            finally:
+                close_old_connections()
+            elapsed = time.perf_counter() - started
+            with lock:
+                if failed:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(elapsed)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.monotonic() - started
+
+    completed = sum(len(samples) for samples in latencies.values())
+    return {
+        'profile': profile,
+        'operations_per_second': round(completed / elapsed, 1),
+        'errors': sum(errors.values()),
+        'operations': {
+            name: {
+                'completed': len(samples),
+                'errors': errors[name],
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            } for name, samples in latencies.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writes', type=float, default=0.2, help="Share of operations that are deposits")
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.members, args.threads, args.seconds, args.writes)))
+        return
+
+    results = []
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_profile', '--profile', profile, '--members', str(args.members),
+             '--threads', str(args.threads), '--seconds', str(args.seconds), '--writes', str(args.writes)],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    before, after = results
+    print(json.dumps({
+        'members': args.members,
+        'threads': args.threads,
+        'write_share': args.writes,
+        'profiles': results,
+        'speedup': round(after['operations_per_second'] / before['operations_per_second'], 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
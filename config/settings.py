@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'finance.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,9 +79,174 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test DB: the in-memory default uses shared-cache table locks,
+        # which don't behave like production SQLite under the concurrency tests.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Production SQLite profile
+# SACCO_DB_PROFILE=production switches SQLite to WAL (readers stop waiting behind writers) and
+# tunes every new connection: synchronous=NORMAL, a busy timeout, a memory map and a larger page
+# cache. Connections persist between requests, and transactions start with BEGIN IMMEDIATE so a
+# writer queues on the busy timeout up front instead of failing when a read lock can't be upgraded.
+# Staff reports read from the 'replica' file, refreshed by `manage.py sync_replica` (see finance/replica.py).
+
+DATABASE_PROFILE = os.environ.get('SACCO_DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=5000; '
+        'PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536; PRAGMA temp_store=MEMORY'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+
+SQLITE_REPLICA_OPTIONS = {
+    'init_command': 'PRAGMA query_only=1; PRAGMA busy_timeout=5000; PRAGMA mmap_size=268435456; PRAGMA cache_size=-65536',
+}
+
+REPLICA_DATABASE = None
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update(OPTIONS=SQLITE_PRODUCTION_OPTIONS, CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'OPTIONS': SQLITE_REPLICA_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASE = 'replica'
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Member dashboard summaries are cached per user under the ledger version on their account row,
+# which every write bumps in the database, so writes from any process or command invalidate them.
+# With the per-process default each worker warms its own copy; a shared backend lets them share.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sacco-dashboard',
     }
 }
 
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+# Contributions
+# Members paying less than MONTHLY_CONTRIBUTION (KES) in DEPOSITs for a month are
+# charged LATE_CONTRIBUTION_FINE by `manage.py apply_fines --period YYYY-MM`.
+
+MONTHLY_CONTRIBUTION = 1000
+
+LATE_CONTRIBUTION_FINE = 200
+
+
+# Dividends
+# Annual rate (%) paid on time-weighted share capital by `manage.py pay_dividends --year YYYY`.
+
+DIVIDEND_RATE = 10
+
+
+# Loan schedules
+# Amortization tables are memoized per (principal, rate, duration, method); this caps the LRU.
+
+LOAN_SCHEDULE_CACHE_SIZE = 1024
+
+
+# Loan decisions
+# Most approve/reject decisions accepted in one POST to /api/staff/loans/decide/.
+
+LOAN_DECISION_BATCH_LIMIT = 500
+
+
+# Loan eligibility
+# A member may borrow LOAN_SAVINGS_MULTIPLIER times their savings, plus LOAN_TRACK_RECORD_BONUS
+# times more for each loan already repaid (up to four), less any outstanding loan balance.
+
+LOAN_SAVINGS_MULTIPLIER = 3
+LOAN_TRACK_RECORD_BONUS = '0.5'
+
+
+# Group commit for /api/transact/
+# When enabled, postings arriving within TRANSACT_GROUP_COMMIT_WINDOW seconds are
+# committed together by one writer thread per process (see finance/group_commit.py).
+
+TRANSACT_GROUP_COMMIT = False
+
+TRANSACT_GROUP_COMMIT_WINDOW = 0.005
+
+TRANSACT_GROUP_COMMIT_MAX_BATCH = 200
+
+
+# Transaction archive
+# `manage.py archive_transactions` moves closed-period transactions into ArchivedTransaction.
+# Set ARCHIVE_DATABASE to another DATABASES alias (e.g. a second SQLite file) to keep the
+# archive out of the main database file, then run `manage.py migrate --database <alias>`.
+
+ARCHIVE_DATABASE = None
+
+ARCHIVE_BATCH_SIZE = 5000
+
+DATABASE_ROUTERS = ['finance.routers.ArchiveRouter', 'finance.routers.ReplicaRouter']
+
+
+# Request metrics
+# finance.metrics.MetricsMiddleware records latency, SQL query count and SQL time per URL name,
+# served in Prometheus format at /api/metrics (staff, or `Authorization: Bearer <METRICS_TOKEN>`).
+# Requests slower than METRICS_SLOW_REQUEST_SECONDS are logged to `finance.metrics` with their
+# METRICS_SLOW_REQUEST_TOP_QUERIES most expensive queries.
+
+METRICS_TOKEN = None
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_REQUEST_TOP_QUERIES = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'finance.metrics': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Async views
+# Under ASGI (config/asgi.py), /api/async/dashboard-data/ and /api/async/admin-data/ serve the
+# same JSON as their sync counterparts. With ASYNC_PARALLEL_READS the admin view's table-wide
+# aggregates run on separate threads and connections; that only pays off when connections persist.
+
+ASYNC_PARALLEL_READS = DATABASE_PROFILE == 'production'
+
+# Live updates
+# By default the dashboards poll every DASHBOARD_POLL_SECONDS: the member page asks for a ?since=
+# delta, the staff page re-fetches and gets a 304 while nothing changed. With EVENTS_ENABLED,
+# /api/events/ (members) and /api/staff/events/ (staff) stream server-sent events fed by an
+# in-process broker (finance/events.py), and pages served over ASGI open them. Enable it only for a
+# single ASGI process: under WSGI every open stream holds a worker thread, and the broker never
+# hears about writes made by other processes or management commands. Streams send a keep-alive
+# comment every EVENTS_HEARTBEAT_SECONDS and close after EVENTS_MAX_SECONDS, when the browser reconnects.
+
+EVENTS_ENABLED = False
+DASHBOARD_POLL_SECONDS = 30
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_MAX_SECONDS = 300
+EVENTS_QUEUE_LIMIT = 100
+
+
+# Delta sync
+# /api/dashboard-data/?since=<version> returns only the rows written after a version from an
+# earlier response. A client more than DASHBOARD_DELTA_LIMIT rows behind is told to reload in full.
+
+DASHBOARD_DELTA_LIMIT = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
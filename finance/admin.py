@@ -1,6 +1,11 @@
 from django.contrib import admin
-from .models import Transaction, Loan, LoanRepayment
+from .models import Transaction, Loan, LoanRepayment, MemberAccount, Dividend, ClosedPeriod, BalanceSnapshot, ArchivedTransaction
 
 admin.site.register(Transaction)
 admin.site.register(Loan)
-admin.site.register(LoanRepayment)
\ No newline at end of file
+admin.site.register(LoanRepayment)
+admin.site.register(MemberAccount)
+admin.site.register(Dividend)
+admin.site.register(ClosedPeriod)
+admin.site.register(BalanceSnapshot)
+admin.site.register(ArchivedTransaction)
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import members_changed
+from .models import Loan, MemberAccount
+
+# Most decisions accepted in one request
+MAX_DECISIONS = getattr(settings, 'LOAN_DECISION_BATCH_LIMIT', 500)
+
+ACTIONS = ('approve', 'reject')
+
+UPDATE_CHUNK = 500
+
+
+class DecisionError(ValueError):
+    pass
+
+
+def parse_decisions(items):
+    """
+    Validate a list of {'loan_id', 'action', 'reason'} dicts. Returns
+    ({loan_id: (action, reason)}, [{'loan_id', 'error'}, ...]); malformed
+    entries are reported instead of failing the whole batch.
+    """
+    if not isinstance(items, list) or not items:
+        raise DecisionError("Expected a non-empty list of decisions")
+    if len(items) > MAX_DECISIONS:
+        raise DecisionError(f"At most {MAX_DECISIONS} decisions per request")
+
+    decisions, errors = {}, []
+    for item in items:
+        if not isinstance(item, dict):
+            errors.append({'loan_id': None, 'error': 'Each decision must be an object'})
+            continue
+        loan_id, action = item.get('loan_id'), str(item.get('action', '')).lower()
+        reason = (item.get('reason') or '').strip()
+        if not isinstance(loan_id, int) or isinstance(loan_id, bool):
+            errors.append({'loan_id': loan_id, 'error': 'loan_id must be an integer'})
+        elif action not in ACTIONS:
+            errors.append({'loan_id': loan_id, 'error': f"action must be one of {', '.join(ACTIONS)}"})
+        elif action == 'reject' and not reason:
+            errors.append({'loan_id': loan_id, 'error': 'A rejection needs a reason'})
+        elif loan_id in decisions:
+            errors.append({'loan_id': loan_id, 'error': 'Duplicate decision'})
+        else:
+            decisions[loan_id] = (action, reason)
+    return decisions, errors
+
+
+def decide_loans(decisions):
+    """
+    Apply {loan_id: (action, reason)} to pending loans with one bulk_update
+    in a single transaction. Loans that are missing or no longer pending
+    are skipped and reported. bulk_update bypasses Loan.save and the cache
+    signals, so the affected members' loan totals and versions are refreshed
+    in one grouped pass and their live streams notified after commit.
+    Returns {'approved', 'rejected', 'skipped'}.
+    """
+    summary = {'approved': [], 'rejected': [], 'skipped': []}
+    if not decisions:
+        return summary
+
+    now = timezone.now()
+    with transaction.atomic():
+        loans = {loan.id: loan for loan in Loan.objects.select_for_update().filter(id__in=list(decisions))}
+        changed = []
+        for loan_id, (action, reason) in decisions.items():
+            loan = loans.get(loan_id)
+            if loan is None:
+                summary['skipped'].append({'loan_id': loan_id, 'error': 'Loan not found'})
+                continue
+            if loan.status != 'PENDING':
+                summary['skipped'].append({'loan_id': loan_id, 'error': f'Loan is {loan.status}, not PENDING'})
+                continue
+            if action == 'approve':
+                loan.status, loan.date_approved = 'APPROVED', now
+                summary['approved'].append(loan_id)
+            else:
+                loan.status, loan.rejection_reason = 'REJECTED', reason
+                summary['rejected'].append(loan_id)
+            changed.append(loan)
+
+        user_ids = {loan.user_id for loan in changed}
+        versions = MemberAccount.next_versions(user_ids)
+        for loan in changed:
+            loan.version = versions[loan.user_id]
+        Loan.objects.bulk_update(changed, ['status', 'date_approved', 'rejection_reason', 'version'],
+                                 batch_size=UPDATE_CHUNK)
+
+        MemberAccount.refresh_loans_for({loan.user_id for loan in changed if loan.status == 'APPROVED'})
+        transaction.on_commit(lambda: members_changed(user_ids))
+    return summary
@@ -0,0 +1,144 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import members_changed
+from .models import Transaction, ArchivedTransaction, ClosedPeriod, MemberAccount
+
+BATCH_SIZE = getattr(settings, 'ARCHIVE_BATCH_SIZE', 5000)
+
+# Marks the per-member, per-type row that carries the archived total in the hot table
+ROLLUP_REFERENCE = 'ROLLUP'
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'amount', 'transaction_type', 'date', 'reference_code')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def archived_through():
+    """End of the latest archived period, or None. Entries before it live in the archive."""
+    return ClosedPeriod.objects.filter(archived_at__isnull=False).aggregate(end=Max('end'))['end']
+
+
+def uses_archive(start, end, through=None):
+    """
+    Whether a query over entries dated [start, end) needs archived detail.
+    Windows wholly after the archive, or all-time totals (start None and
+    end past the archive), are answered by the hot table and its rollups.
+    """
+    through = through or archived_through()
+    if not through:
+        return False
+    return (start is not None and start < through) or (end is not None and end < through)
+
+
+def ledger_sources(start=None, end=None):
+    """
+    Querysets that together hold every ledger entry dated [start, end) exactly
+    once: the hot table alone, or, when the window reaches into archived
+    periods, the hot table without rollups plus the archive.
+    """
+    hot = Transaction.objects.all()
+    cold = ArchivedTransaction.objects.all()
+    if start is not None:
+        hot, cold = hot.filter(date__gte=start), cold.filter(date__gte=start)
+    if end is not None:
+        hot, cold = hot.filter(date__lt=end), cold.filter(date__lt=end)
+    if uses_archive(start, end):
+        return [hot.exclude(reference_code=ROLLUP_REFERENCE), cold]
+    return [hot]
+
+
+def move_batch(rows, rollup_date):
+    """
+    Copy one batch to the archive and replace it in the hot table with the
+    members' rollup rows, so every (member, type) total is unchanged.
+    """
+    archive_db = router.db_for_write(ArchivedTransaction)
+    sums = defaultdict(Decimal)
+    for row in rows:
+        sums[row['user_id'], row['transaction_type']] += row['amount']
+    user_ids = {user_id for user_id, _ in sums}
+
+    # The archive commits first when it is a separate database, so a crash in between
+    # leaves a duplicate (skipped on the re-run), never a lost row
+    with transaction.atomic(), transaction.atomic(using=archive_db):
+        ArchivedTransaction.objects.using(archive_db).bulk_create(
+            [ArchivedTransaction(**row) for row in rows], batch_size=1000, ignore_conflicts=True
+        )
+
+        existing = (Transaction.objects
+                    .filter(reference_code=ROLLUP_REFERENCE, user_id__in=user_ids)
+                    .values_list('id', 'user_id', 'transaction_type', 'amount'))
+        replaced = []
+        for rollup_id, user_id, transaction_type, amount in existing:
+            if (user_id, transaction_type) in sums:
+                sums[user_id, transaction_type] += amount
+                replaced.append(rollup_id)
+
+        # Plain SQL deletes: these rows leave the ledger without moving any balance, so the
+        # per-row post_delete signals (change notifications) would only slow the batch down
+        doomed = replaced + [row['id'] for row in rows]
+        # Rows leave the hot table, so members' delta-synced dashboards must reload
+        versions = MemberAccount.next_versions(user_ids, reset=True)
+        table = connection.ops.quote_name(Transaction._meta.db_table)
+        with connection.cursor() as cursor:
+            for start in range(0, len(doomed), 1000):
+                chunk = doomed[start:start + 1000]
+                cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(chunk))})', chunk)
+        Transaction.objects.bulk_create([
+            Transaction(user_id=user_id, transaction_type=transaction_type, amount=amount,
+                        date=rollup_date, reference_code=ROLLUP_REFERENCE, version=versions[user_id])
+            for (user_id, transaction_type), amount in sums.items()
+        ], batch_size=1000)
+
+        transaction.on_commit(lambda: members_changed(user_ids))
+    return user_ids
+
+
+def archive_transactions(period, batch_size=BATCH_SIZE):
+    """
+    Move every transaction dated before the end of closed period `period`
+    ('YYYY-MM') into the archive, in batches that each commit on their own.
+    Each member keeps one ROLLUP row per transaction type in the hot table
+    carrying the archived total, so balances and pool totals stay correct.
+    Returns a stats dict.
+    """
+    closed = ClosedPeriod.objects.filter(period=period).first()
+    if closed is None:
+        raise ArchiveError(f"{period} has not been closed; run close_period first")
+    through = archived_through()
+    if through and closed.end <= through:
+        raise ArchiveError(f"Transactions through {period} are already archived")
+
+    # Flag the periods before moving anything, so windowed readers switch to the
+    # archive (see ledger_sources) even if the run is interrupted part way
+    ClosedPeriod.objects.filter(end__lte=closed.end, archived_at__isnull=True).update(archived_at=timezone.now())
+
+    started = time.monotonic()
+    rollup_date = closed.end - timedelta(microseconds=1)
+    stats = {'archived': 0, 'members': 0}
+    members, last_id = set(), 0
+    while True:
+        rows = list(Transaction.objects
+                    .filter(id__gt=last_id, date__lt=closed.end)
+                    .exclude(reference_code=ROLLUP_REFERENCE)
+                    .order_by('id')
+                    .values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        members |= move_batch(rows, rollup_date)
+        stats['archived'] += len(rows)
+        last_id = rows[-1]['id']
+
+    stats['members'] = len(members)
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    return stats
@@ -0,0 +1,73 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.views.decorators.http import condition
+
+
+def parallel_reads():
+    # Read per call so tests can switch it on (separate connections can't see a test's open transaction)
+    return getattr(settings, 'ASYNC_PARALLEL_READS', False)
+
+
+def isolated(func):
+    """
+    Wrap `func` for an executor thread of its own. The thread's database
+    connection is closed afterwards (or kept, under CONN_MAX_AGE) as at the
+    end of a request, since no request_finished signal reaches it.
+    """
+    @wraps(func)
+    def run():
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_reads(*funcs):
+    """
+    Await independent read-only ORM calls (zero-argument callables) and
+    return their results in order. Django's async ORM runs every query on
+    the request's one thread-sensitive thread, so gathered aqueries still
+    execute one after another. With ASYNC_PARALLEL_READS on, each call here
+    gets an executor thread and a connection of its own instead, and SQLite
+    serves the readers concurrently. That pays off for table-wide
+    aggregates on persistent connections, not for single-row lookups.
+    """
+    if not parallel_reads():
+        return [await sync_to_async(func)() for func in funcs]
+    return list(await asyncio.gather(*(sync_to_async(isolated(func), thread_sensitive=False)() for func in funcs)))
+
+
+def resolve_user(view):
+    """
+    Async view decorator: load request.user with `await request.auser()`,
+    so ETag functions and the view body can read it without touching the
+    database from the event loop.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    django.views.decorators.http.condition for async views whose ETag and
+    Last-Modified functions query the database: they run on the request's
+    sync thread, and their results feed the stock decorator.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = await sync_to_async(etag_func)(request, *args, **kwargs) if etag_func else None
+            modified = await sync_to_async(last_modified_func)(request, *args, **kwargs) if last_modified_func else None
+            conditional = condition(etag_func=etag_func and (lambda *args, **kwargs: etag),
+                                    last_modified_func=last_modified_func and (lambda *args, **kwargs: modified))
+            return await conditional(view)(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,162 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from .events import publish_changes
+from .models import MemberAccount
+
+DASHBOARD_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+HITS_KEY = 'finance:dashboard-cache:hits'
+MISSES_KEY = 'finance:dashboard-cache:misses'
+
+# Bumped in-process on membership changes (sign-ups, profile edits), which no account row records
+MEMBERSHIP_VERSION_KEY = 'finance:membership-version'
+MEMBERSHIP_MODIFIED_KEY = 'finance:membership-modified'
+
+
+def member_version(user_id):
+    """
+    The member's ledger version, read from their account row. Every write to
+    their transactions or loans bumps it in the same database transaction
+    (MemberAccount.next_versions), whichever process or command made it.
+    """
+    return MemberAccount.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+async def amember_version(user_id):
+    return await MemberAccount.objects.filter(user_id=user_id).values_list('version', flat=True).afirst() or 0
+
+
+def member_state(user_id):
+    """The member's (ledger version, time of the last write) from their account row."""
+    return MemberAccount.objects.filter(user_id=user_id).values_list('version', 'updated_at').first() or (0, None)
+
+
+def membership_version():
+    version = cache.get(MEMBERSHIP_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so an evicted counter can't collide with an older cached entry
+        cache.add(MEMBERSHIP_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MEMBERSHIP_VERSION_KEY)
+    return version
+
+
+def ledger_state():
+    """
+    Sacco-wide (version, time of the last write) for the admin views: every
+    member's ledger version summed, and the latest account write, read in one
+    aggregate, so a write from any process moves them.
+    """
+    ledger = MemberAccount.objects.aggregate(accounts=Count('pk'), versions=Sum('version'), modified=Max('updated_at'))
+    version = f"{ledger['accounts']}.{ledger['versions'] or 0}.{membership_version()}"
+    return version, max(filter(None, (ledger['modified'], cache.get(MEMBERSHIP_MODIFIED_KEY))), default=None)
+
+
+def ledger_version():
+    return ledger_state()[0]
+
+
+def bump_membership_version():
+    try:
+        cache.incr(MEMBERSHIP_VERSION_KEY)
+    except ValueError:
+        cache.set(MEMBERSHIP_VERSION_KEY, time.time_ns(), None)
+    cache.set(MEMBERSHIP_MODIFIED_KEY, datetime.now(timezone.utc), None)
+
+
+def member_changed(user_id):
+    """Wake the member's live streams after a commit; cache keys and validators follow the account row."""
+    publish_changes([user_id])
+
+
+def members_changed(user_ids):
+    """member_changed for many members at once (bulk jobs)."""
+    user_ids = list(user_ids)
+    if user_ids:
+        publish_changes(user_ids)
+
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def summary_key(user_id, version):
+    return f'finance:dashboard:{user_id}:{version}'
+
+
+def cached_dashboard_summary(user, compute):
+    """
+    Return the member's dashboard summary, calling `compute(user)` on a miss.
+    Entries are keyed by the account's version, so any backend is safe: a
+    per-process cache just warms separately in each worker.
+    """
+    key = summary_key(user.pk, member_version(user.pk))
+    summary = cache.get(key)
+    if summary is not None:
+        count(HITS_KEY)
+        return summary
+
+    count(MISSES_KEY)
+    summary = compute(user)
+    cache.set(key, summary, DASHBOARD_TIMEOUT)
+    return summary
+
+
+async def acached_dashboard_summary(user, compute):
+    """cached_dashboard_summary for async views; `compute` is a coroutine function."""
+    key = summary_key(user.pk, await amember_version(user.pk))
+    summary = await cache.aget(key)
+    if summary is not None:
+        count(HITS_KEY)
+        return summary
+
+    count(MISSES_KEY)
+    summary = await compute(user)
+    await cache.aset(key, summary, DASHBOARD_TIMEOUT)
+    return summary
+
+
+def admin_totals_key():
+    return f'finance:admin-totals:{ledger_version()}'
+
+
+# Staff streams wake together on a ledger event; only one of them should run the aggregates
+admin_totals_lock = threading.Lock()
+
+
+def cached_admin_totals(compute):
+    """
+    Sacco-wide admin totals under the ledger version, calling `compute()` on
+    a miss. Each change is aggregated once per process and shared by every
+    open staff stream.
+    """
+    totals = cache.get(admin_totals_key())
+    if totals is not None:
+        return totals
+    with admin_totals_lock:
+        key = admin_totals_key()
+        totals = cache.get(key)
+        if totals is None:
+            totals = compute()
+            cache.set(key, totals, DASHBOARD_TIMEOUT)
+    return totals
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
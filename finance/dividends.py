@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery
+from django.utils import timezone
+
+from .archive import ROLLUP_REFERENCE, uses_archive
+from .cache import members_changed
+from .models import Transaction, ArchivedTransaction, Dividend, MemberAccount
+
+DIVIDEND_RATE = Decimal(str(getattr(settings, 'DIVIDEND_RATE', 10)))
+
+BATCH_SIZE = 1000
+# Rows fetched per round trip while streaming share history
+STREAM_CHUNK = 5000
+
+CENT = Decimal('0.01')
+
+
+class DividendError(Exception):
+    pass
+
+
+def dividend_reference(year):
+    return f'DIV-{year}'
+
+
+def year_bounds(year):
+    start = timezone.make_aware(datetime(year, 1, 1))
+    return start, timezone.make_aware(datetime(year + 1, 1, 1))
+
+
+def share_day_totals(year):
+    """
+    Stream every SHARE_TRANSFER up to the end of `year` once and return
+    ({user_id: sum of amount x days held}, days in year). Capital bought
+    before the year counts for every day; a purchase during the year counts
+    from its (local) date to year end.
+    """
+    start, end = year_bounds(year)
+    days_in_year = (end - start).days
+    last_day = end.date()
+
+    def days_held(stamp):
+        if timezone.is_naive(stamp):
+            stamp = timezone.make_aware(stamp, dt_timezone.utc)
+        if stamp < start:
+            return days_in_year
+        return (last_day - timezone.localtime(stamp).date()).days
+
+    # Rollups (archive.py) date everything archived just before the archive cutoff. That only
+    # counts correctly when the cutoff is before the year, otherwise read the archived detail.
+    archived = uses_archive(start, end)
+    hot = Transaction.objects.filter(transaction_type='SHARE_TRANSFER', date__lt=end)
+    sources = [hot.exclude(reference_code=ROLLUP_REFERENCE), ArchivedTransaction.objects.filter(
+        transaction_type='SHARE_TRANSFER', date__lt=end)] if archived else [hot]
+
+    # Raw rows skip Django's per-row datetime/decimal converters, which dominate at
+    # this volume. Sums are kept in integer cents x days, so they stay exact; the
+    # day count is looked up per UTC quarter-hour (every UTC offset is a multiple of one).
+    totals = defaultdict(int)
+    held = {}
+    for queryset in sources:
+        sql, params = queryset.values_list('user_id', 'date', 'amount').order_by().query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(STREAM_CHUNK):
+                for user_id, stamp, amount in rows:
+                    slot = stamp.toordinal() * 96 + stamp.hour * 4 + stamp.minute // 15
+                    days = held.get(slot)
+                    if days is None:
+                        days = held[slot] = days_held(stamp)
+                    totals[user_id] += round(amount * 100) * days
+
+    return {user_id: Decimal(cent_days) / 100 for user_id, cent_days in totals.items()}, days_in_year
+
+
+def compute_dividends(year, rate=DIVIDEND_RATE):
+    """
+    Unsaved Dividend rows for every member with share capital during `year`.
+    Each amount is rounded to the cent once, from the unrounded weighted
+    capital, so the total never drifts with the member count.
+    """
+    totals, days_in_year = share_day_totals(year)
+    now = timezone.now()
+    dividends = []
+    for user_id, share_days in totals.items():
+        weighted = share_days / days_in_year
+        amount = (weighted * rate / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+        if amount > 0:
+            dividends.append(Dividend(
+                user_id=user_id, year=year, rate=rate, amount=amount, date_paid=now,
+                weighted_shares=weighted.quantize(CENT, rounding=ROUND_HALF_UP),
+            ))
+    return dividends
+
+
+def pay_dividends(year, rate=DIVIDEND_RATE, dry_run=False):
+    """
+    Compute and pay the dividend for a closed financial year: the per-member
+    results are stored as Dividend rows and credited to savings as DIVIDEND
+    transactions. A year can only be paid once; `dry_run` computes without
+    writing (and also works for the current, open year).
+    Returns a summary dict.
+    """
+    if not dry_run and year_bounds(year)[1] > timezone.now():
+        raise DividendError(f"The {year} financial year has not ended yet")
+    if not dry_run and Dividend.objects.filter(year=year).exists():
+        raise DividendError(f"Dividends for {year} have already been paid")
+
+    dividends = compute_dividends(year, rate)
+    summary = {
+        'year': year,
+        'rate': rate,
+        'members': len(dividends),
+        'weighted_shares': sum((d.weighted_shares for d in dividends), Decimal(0)),
+        'total': sum((d.amount for d in dividends), Decimal(0)),
+    }
+    if dry_run or not dividends:
+        return summary
+
+    reference = dividend_reference(year)
+    user_ids = [d.user_id for d in dividends]
+    try:
+        with transaction.atomic():
+            Dividend.objects.bulk_create(dividends, batch_size=BATCH_SIZE)
+            # Also creates any missing account rows
+            versions = MemberAccount.next_versions(user_ids)
+            Transaction.objects.bulk_create([
+                Transaction(user_id=d.user_id, amount=d.amount, transaction_type='DIVIDEND',
+                            reference_code=reference, date=d.date_paid, version=versions[d.user_id])
+                for d in dividends
+            ], batch_size=BATCH_SIZE)
+
+            # Credit every member in one statement, reading each amount back from the stored results
+            paid = Dividend.objects.filter(year=year)
+            MemberAccount.objects.filter(user_id__in=paid.values('user_id')).update(
+                savings=F('savings') + Subquery(
+                    paid.filter(user_id=OuterRef('user_id')).values('amount')[:1],
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                updated_at=timezone.now(),
+            )
+            transaction.on_commit(lambda: members_changed(user_ids))
+    except IntegrityError:
+        raise DividendError(f"Dividends for {year} have already been paid")
+
+    return summary
+
+
+def latest_dividend(user):
+    """The member's most recent stored dividend as {'year', 'amount'}, or None."""
+    return Dividend.objects.filter(user=user).order_by('-year').values('year', 'amount').first()
+
+
+async def alatest_dividend(user):
+    return await Dividend.objects.filter(user=user).order_by('-year').values('year', 'amount').afirst()
@@ -0,0 +1,84 @@
+from decimal import Decimal, ROUND_DOWN
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import DecimalField, F, IntegerField, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import MemberAccount
+
+# A member may borrow this multiple of their savings...
+SAVINGS_MULTIPLIER = Decimal(str(getattr(settings, 'LOAN_SAVINGS_MULTIPLIER', 3)))
+# ...plus this much more per loan already repaid, counting at most TRACK_RECORD_CAP loans
+TRACK_RECORD_BONUS = Decimal(str(getattr(settings, 'LOAN_TRACK_RECORD_BONUS', '0.5')))
+TRACK_RECORD_CAP = 4
+
+# Score out of 100: how far the limit covers the request, plus the track record
+COVERAGE_POINTS = 70
+POINTS_PER_REPAID_LOAN = 10
+
+CENT = Decimal('0.01')
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class Assessment(NamedTuple):
+    limit: Decimal
+    score: int
+    eligible: bool
+    reasons: tuple
+
+
+def limit_expression(prefix=''):
+    """
+    The member's borrowing limit as a SQL expression over their MemberAccount
+    columns: savings times a multiple that grows with the loans they have
+    repaid, less what they still owe. `prefix` reaches the account through a
+    join (e.g. 'user__account__' from Loan); members without an account row
+    get a limit of zero.
+    """
+    savings = Coalesce(F(prefix + 'savings'), Value(Decimal(0)), output_field=MONEY)
+    owed = Coalesce(F(prefix + 'loan_balance'), Value(Decimal(0)), output_field=MONEY)
+    repaid = Least(Coalesce(F(prefix + 'loans_repaid'), Value(0)), Value(TRACK_RECORD_CAP), output_field=IntegerField())
+    multiple = Value(SAVINGS_MULTIPLIER, output_field=MONEY) + Value(TRACK_RECORD_BONUS, output_field=MONEY) * repaid
+    return Greatest(savings * multiple - owed, Value(Decimal(0)), output_field=MONEY)
+
+
+def assess(limit, amount, loans_repaid=0, active_loans=0):
+    """
+    Score a request for `amount` against a limit from limit_expression.
+    Pure arithmetic on values already fetched, so it adds no queries.
+    """
+    limit = (limit or Decimal(0)).quantize(CENT, rounding=ROUND_DOWN)
+    loans_repaid = loans_repaid or 0
+    reasons = []
+    if active_loans:
+        reasons.append('Member already has an active loan')
+    if amount > limit:
+        reasons.append(f'Requested amount exceeds the limit of KES {limit:,.2f}')
+
+    coverage = min(limit / amount, 1) if amount > 0 else Decimal(0)
+    score = int(COVERAGE_POINTS * coverage) + POINTS_PER_REPAID_LOAN * min(loans_repaid, 3)
+    if active_loans:
+        score = 0
+    return Assessment(limit, score, not reasons, tuple(reasons))
+
+
+def member_eligibility(user_id, amount):
+    """Assess one application from the member's MemberAccount row: one primary-key lookup."""
+    account = (MemberAccount.objects
+               .filter(user_id=user_id)
+               .values('loans_repaid', 'active_loans', limit=limit_expression())
+               .first()) or {}
+    return assess(account.get('limit'), amount, account.get('loans_repaid'), account.get('active_loans'))
+
+
+def annotate_eligibility(loans):
+    """
+    Add each applicant's borrowing limit and track record to a Loan queryset,
+    read through the join to MemberAccount in the same query.
+    """
+    return loans.annotate(
+        loan_limit=limit_expression('user__account__'),
+        loans_repaid=F('user__account__loans_repaid'),
+        active_loans=F('user__account__active_loans'),
+    )
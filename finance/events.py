@@ -0,0 +1,238 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Events buffered per open stream; a stream that falls further behind is sent a full snapshot instead
+QUEUE_LIMIT = getattr(settings, 'EVENTS_QUEUE_LIMIT', 100)
+# Milliseconds an EventSource waits before reconnecting after a stream ends
+RETRY_MS = 2000
+# How often a dashboard without a stream polls for changes
+POLL_SECONDS = getattr(settings, 'DASHBOARD_POLL_SECONDS', 30)
+
+STAFF_CHANNEL = 'staff'
+
+
+def member_channel(user_id):
+    return f'member:{user_id}'
+
+
+class Subscription:
+    """
+    One open stream's inbox. Publishers on any thread put() into it; a sync
+    stream blocks in get(), an async one awaits aget() on its event loop.
+    """
+    def __init__(self, channel, loop=None):
+        self.channel = channel
+        self.loop = loop
+        self.events = asyncio.Queue(QUEUE_LIMIT) if loop else queue.Queue(QUEUE_LIMIT)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.loop is None:
+            self.offer(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.offer, event)
+        except RuntimeError:
+            # The stream's loop has closed; unsubscribe is on its way
+            pass
+
+    def offer(self, event):
+        try:
+            self.events.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self):
+        """Everything already queued, without waiting."""
+        drained = []
+        while True:
+            try:
+                drained.append(self.events.get_nowait())
+            except (queue.Empty, asyncio.QueueEmpty):
+                return drained
+
+
+class Broker:
+    """
+    In-process publish/subscribe between ledger writes and open event
+    streams. Each worker process has its own, so with several workers a
+    stream only hears about writes made by the process serving it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+
+    def subscribe(self, channel, loop=None):
+        subscription = Subscription(channel, loop)
+        with self.lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.channels.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.channels.pop(subscription.channel, None)
+
+    def publish(self, channel, event):
+        if channel not in self.channels:
+            return
+        with self.lock:
+            subscribers = list(self.channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+broker = Broker()
+
+
+def publish_changes(user_ids):
+    """
+    Tell open streams that these members' balances changed (called after
+    commit by member_changed in cache.py). Events carry no figures,
+    so writers never query on behalf of listeners.
+    """
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        broker.publish(member_channel(user_id), {'type': 'changed'})
+    broker.publish(STAFF_CHANNEL, {'type': 'changed', 'user_ids': user_ids})
+
+
+def publish_row(event_type, user_id, row):
+    """Forward one new or updated ledger row to the member's and the staff streams."""
+    event = {'type': event_type, 'data': {'user_id': user_id, **row}}
+    broker.publish(member_channel(user_id), event)
+    broker.publish(STAFF_CHANNEL, event)
+
+
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'.encode()
+
+
+class EventStream:
+    """
+    Server-sent events for one channel. Opens with a `snapshot` event holding
+    snapshot(), then sends `summary` events with only the keys that changed
+    whenever the figures move, and forwards row events (`transaction`,
+    `loan`). On a staff stream, `members(user_ids)` supplies the changed
+    members' rows for a `members` event. The stream ends after
+    EVENTS_MAX_SECONDS; the browser's EventSource reconnects by itself.
+    """
+    def __init__(self, channel, snapshot, members=None):
+        self.channel = channel
+        self.snapshot = snapshot
+        self.members = members
+        self.sent = None
+
+    def open(self):
+        self.sent = self.snapshot()
+        return f'retry: {RETRY_MS}\n\n'.encode() + sse('snapshot', self.sent)
+
+    def handle(self, events, overflowed):
+        """SSE chunks for a batch of queued events. Any number of changes cost one snapshot()."""
+        if overflowed:
+            return self.open()
+        chunks, changed, user_ids = [], False, set()
+        for event in events:
+            if event['type'] == 'changed':
+                changed = True
+                user_ids.update(event.get('user_ids', ()))
+            else:
+                chunks.append(sse(event['type'], event['data']))
+        if changed:
+            current = self.snapshot()
+            delta = {key: value for key, value in current.items() if self.sent.get(key) != value}
+            self.sent = current
+            if delta:
+                chunks.append(sse('summary', delta))
+            if user_ids and self.members:
+                chunks.append(sse('members', self.members(sorted(user_ids))))
+        return b''.join(chunks)
+
+    def limits(self):
+        return (getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15),
+                time.monotonic() + getattr(settings, 'EVENTS_MAX_SECONDS', 300))
+
+    def __iter__(self):
+        heartbeat, deadline = self.limits()
+        subscription = broker.subscribe(self.channel)
+        try:
+            yield self.open()
+            while time.monotonic() < deadline:
+                event = subscription.get(min(heartbeat, max(deadline - time.monotonic(), 0)))
+                if event is None:
+                    yield b': keep-alive\n\n'
+                    continue
+                overflowed, subscription.overflowed = subscription.overflowed, False
+                chunk = self.handle([event] + subscription.drain(), overflowed)
+                if chunk:
+                    yield chunk
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def __aiter__(self):
+        heartbeat, deadline = self.limits()
+        subscription = broker.subscribe(self.channel, asyncio.get_running_loop())
+        try:
+            yield await sync_to_async(self.open)()
+            while time.monotonic() < deadline:
+                event = await subscription.aget(min(heartbeat, max(deadline - time.monotonic(), 0)))
+                if event is None:
+                    yield b': keep-alive\n\n'
+                    continue
+                overflowed, subscription.overflowed = subscription.overflowed, False
+                chunk = await sync_to_async(self.handle)([event] + subscription.drain(), overflowed)
+                if chunk:
+                    yield chunk
+        finally:
+            broker.unsubscribe(subscription)
+
+
+def events_enabled():
+    # Read per call so tests can switch streams on
+    return getattr(settings, 'EVENTS_ENABLED', False)
+
+
+def live_page_context(request):
+    """
+    Template context for the dashboards. They open event streams only when
+    streams are enabled and the page itself came over ASGI, which serves
+    the streams too; otherwise they poll every POLL_SECONDS.
+    """
+    return {'live_events': events_enabled() and isinstance(request, ASGIRequest), 'poll_seconds': POLL_SECONDS}
+
+
+def event_response(request, stream):
+    """
+    Serve `stream` as text/event-stream. Under ASGI it is iterated on the
+    event loop, so an idle stream holds no thread; under WSGI each open
+    stream occupies a worker thread until it ends.
+    """
+    content = stream.__aiter__() if isinstance(request, ASGIRequest) else iter(stream)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
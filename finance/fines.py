@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import DecimalField, Exists, OuterRef, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archive import archived_through
+from .cache import members_changed
+from .models import Transaction, MemberAccount
+
+BATCH_SIZE = 1000
+
+
+class FineError(ValueError):
+    pass
+
+
+def fine_reference(period):
+    return f'FINE-{period}'
+
+
+def members_to_fine(period, start, end, required):
+    """
+    Members who were members for the whole period, paid less than `required`
+    in DEPOSITs during it, have savings to charge and have not been fined for
+    it yet. Members who joined partway through owe nothing for their first
+    month. One grouped query.
+    """
+    already_fined = Transaction.objects.filter(
+        user=OuterRef('pk'), transaction_type='FINE', reference_code=fine_reference(period)
+    )
+    return (User.objects
+            .filter(is_staff=False, date_joined__lt=start, account__savings__gt=0)
+            .annotate(paid=Coalesce(
+                Sum('transactions__amount', filter=Q(
+                    transactions__transaction_type='DEPOSIT',
+                    transactions__date__gte=start,
+                    transactions__date__lt=end,
+                )),
+                Value(Decimal(0)),
+                output_field=DecimalField(),
+            ))
+            .filter(paid__lt=required)
+            .filter(~Exists(already_fined))
+            .values_list('id', flat=True))
+
+
+def apply_fines(period, start, end, required, fine, dry_run=False):
+    """
+    Charge a FINE against savings for every member short on the period's
+    contribution. A fine never overdraws savings: a member holding less than
+    `fine` is charged what they hold. Safe to re-run: members already fined
+    for the period are skipped, and those skipped for lack of savings are
+    fined once they have some. Raises FineError for archived periods and,
+    unless `dry_run`, for a month that hasn't ended. Returns the number of
+    members fined.
+    """
+    # Members still have until month end to pay, and a fine once charged is never re-evaluated
+    if not dry_run and end > timezone.now():
+        raise FineError(f"{period} has not ended yet")
+
+    # An archived month's deposits are only rollups in the hot table, so nobody would look short
+    through = archived_through()
+    if through and start < through:
+        raise FineError(f"Transactions for {period} have been archived")
+
+    # Materialize the ids first; SQLite shouldn't scan a table we're inserting into
+    member_ids = list(members_to_fine(period, start, end, required))
+    if dry_run:
+        return len(member_ids)
+
+    reference = fine_reference(period)
+    fined = 0
+    for offset in range(0, len(member_ids), BATCH_SIZE):
+        chunk = member_ids[offset:offset + BATCH_SIZE]
+        with transaction.atomic():
+            # Write first, so the savings read below can't change before the fines post
+            versions = MemberAccount.next_versions(chunk)
+            savings = dict(MemberAccount.objects.filter(user_id__in=chunk, savings__gt=0)
+                                                .values_list('user_id', 'savings'))
+            charges = {user_id: min(fine, balance) for user_id, balance in savings.items()}
+            Transaction.objects.bulk_create([
+                Transaction(user_id=user_id, amount=amount, transaction_type='FINE', reference_code=reference,
+                            version=versions[user_id])
+                for user_id, amount in charges.items()
+            ])
+            MemberAccount.apply_deltas({user_id: (-amount, Decimal(0)) for user_id, amount in charges.items()})
+            transaction.on_commit(lambda charged=list(charges): members_changed(charged))
+        fined += len(charges)
+
+    return fined
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import transaction
+
+from .posting import post_entry, post_transaction, retry_on_busy, InsufficientFunds
+
+GROUP_COMMIT_WINDOW = getattr(settings, 'TRANSACT_GROUP_COMMIT_WINDOW', 0.005)
+GROUP_COMMIT_MAX_BATCH = getattr(settings, 'TRANSACT_GROUP_COMMIT_MAX_BATCH', 200)
+GROUP_COMMIT_TIMEOUT = getattr(settings, 'TRANSACT_GROUP_COMMIT_TIMEOUT', 30)
+
+STOP = object()
+
+
+class GroupCommitter:
+    """
+    Coalesces postings from many request threads into one database
+    transaction. Requests enqueue and block on a Future; a single writer
+    thread drains whatever arrives within `window` seconds (up to
+    `max_batch`) and commits it together, so a burst of tiny deposits costs
+    one commit and fsync instead of one each. Refused debits fail only their
+    own request; a database error fails the whole batch. A request that
+    times out before the writer claims its posting withdraws it, so the
+    posting is never made behind the caller's back.
+    """
+
+    def __init__(self, window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.postings = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='group-commit-writer', daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                self.queue.put(STOP)
+                self.thread.join()
+            self.thread = None
+
+    def submit(self, user, transaction_type, amount, reference_code=None, timeout=GROUP_COMMIT_TIMEOUT):
+        self.start()
+        future = Future()
+        self.queue.put((future, (user, transaction_type, amount, reference_code)))
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Withdraw the posting so a retry can't post it twice. Once the writer has
+            # claimed it the outcome is one commit away, so wait (boundedly) for that instead
+            if future.cancel():
+                raise
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                raise
+            return future.result(timeout=timeout)
+
+    def run(self):
+        from django.db import connection
+        try:
+            while True:
+                first = self.queue.get()
+                if first is STOP:
+                    return
+                batch = [first]
+                deadline = time.monotonic() + self.window
+                stopping = False
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self.flush(batch)
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+    def flush(self, batch):
+        # Claim each posting; ones whose request gave up waiting are dropped unposted
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.commit(batch)
+        except Exception as e:
+            for future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.postings += len(batch)
+        for (future, _), (entry, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(entry)
+
+    @retry_on_busy
+    def commit(self, batch):
+        results = []
+        with transaction.atomic():
+            for _, args in batch:
+                try:
+                    results.append((post_entry(*args), None))
+                except InsufficientFunds as e:
+                    # Refused before any write, so the rest of the batch is unaffected
+                    results.append((None, e))
+        return results
+
+
+committer = GroupCommitter()
+
+
+def submit_transaction(user, transaction_type, amount, reference_code=None):
+    """Post through the group-commit writer when TRANSACT_GROUP_COMMIT is on, else directly."""
+    if getattr(settings, 'TRANSACT_GROUP_COMMIT', False):
+        return committer.submit(user, transaction_type, amount, reference_code)
+    return post_transaction(user, transaction_type, amount, reference_code)
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import members_changed
+from .models import Transaction, Loan, MemberAccount
+
+BALANCE_FIELDS = ('savings', 'share_capital', 'loan_balance', 'active_loans', 'loans_repaid')
+
+STATEMENT_HEADER = ('date', 'type', 'reference', 'amount', 'savings_balance', 'share_capital_balance')
+
+# Rows fetched per round trip when streaming statements
+STATEMENT_CHUNK = 2000
+
+
+def ledger_balances():
+    """
+    Recompute every member's balances straight from the ledger using grouped
+    queries. Returns {user_id: {field: value}}.
+    """
+    balances = defaultdict(lambda: {
+        'savings': Decimal(0), 'share_capital': Decimal(0), 'loan_balance': Decimal(0), 'active_loans': 0,
+        'loans_repaid': 0,
+    })
+
+    totals = (Transaction.objects
+              .filter(transaction_type__in=Transaction.BALANCE_EFFECTS)
+              .values('user_id', 'transaction_type')
+              .annotate(total=Sum('amount'))
+              .order_by())
+    for row in totals:
+        savings_sign, shares_sign = Transaction.BALANCE_EFFECTS[row['transaction_type']]
+        balances[row['user_id']]['savings'] += row['total'] * savings_sign
+        balances[row['user_id']]['share_capital'] += row['total'] * shares_sign
+
+    loans = (Loan.objects
+             .filter(status__in=['APPROVED', 'PAID'])
+             .values('user_id')
+             .annotate(**MemberAccount.loan_totals())
+             .order_by())
+    for row in loans:
+        balances[row['user_id']]['loan_balance'] = row['balance'] or Decimal(0)
+        balances[row['user_id']]['active_loans'] = row['count']
+        balances[row['user_id']]['loans_repaid'] = row['repaid']
+
+    return balances
+
+
+def rebuild_member_accounts(repair=True):
+    """
+    Compare stored MemberAccount rows with the ledger. Returns a list of
+    (user_id, field, stored, expected) mismatches; when `repair` is set the
+    accounts are corrected in a single transaction.
+    """
+    expected = ledger_balances()
+    stored = {account.user_id: account for account in MemberAccount.objects.all()}
+    zero = {'savings': Decimal(0), 'share_capital': Decimal(0), 'loan_balance': Decimal(0), 'active_loans': 0,
+            'loans_repaid': 0}
+
+    mismatches = []
+    to_create, to_update = [], []
+    now = timezone.now()
+
+    for user_id in set(expected) | set(stored):
+        values = expected.get(user_id, zero)
+        account = stored.get(user_id)
+        if account is None:
+            account = MemberAccount(user_id=user_id, updated_at=now)
+            current = zero
+            to_create.append(account)
+        else:
+            current = {field: getattr(account, field) for field in BALANCE_FIELDS}
+
+        changed = False
+        for field in BALANCE_FIELDS:
+            if current[field] != values[field]:
+                mismatches.append((user_id, field, current[field], values[field]))
+                changed = True
+            setattr(account, field, values[field])
+
+        if changed and account.user_id in stored:
+            account.updated_at = now
+            to_update.append(account)
+
+    if repair:
+        with transaction.atomic():
+            MemberAccount.objects.bulk_create(to_create, batch_size=500)
+            MemberAccount.objects.bulk_update(to_update, BALANCE_FIELDS + ('updated_at',), batch_size=500)
+            # Corrected balances are news to delta-synced dashboards
+            MemberAccount.next_versions(account.user_id for account in to_update)
+        members_changed({user_id for user_id, *_ in mismatches})
+
+    return mismatches
+
+
+def statement_lines(transactions, per_member=False, opening=None, since=None):
+    """
+    Yield CSV rows for `transactions` (oldest first) with the member's
+    running savings and share capital after each entry. The queryset is
+    read with a chunked iterator and balances are carried forward row by
+    row, so memory use doesn't depend on the length of the history. With
+    `per_member` the rows are ordered by member and each line starts with
+    the username; balances restart at each new member. `opening` maps
+    user_id to balances as of `since` (see periods.balances_as_of); each
+    member's rows then start with an OPENING_BALANCE line.
+    """
+    ordering = ('user_id', 'date', 'id') if per_member else ('date', 'id')
+    rows = (transactions
+            .order_by(*ordering)
+            .values_list('user_id', 'user__username', 'date', 'transaction_type', 'reference_code', 'amount')
+            .iterator(chunk_size=STATEMENT_CHUNK))
+
+    zero = Decimal('0.00')
+    current_member, savings, shares = None, zero, zero
+    for user_id, username, date, transaction_type, reference, amount in rows:
+        if user_id != current_member:
+            current_member, savings, shares = user_id, zero, zero
+            if opening is not None:
+                savings, shares = opening[user_id]['savings'], opening[user_id]['share_capital']
+                line = [since.isoformat(), 'OPENING_BALANCE', '', '', savings, shares]
+                yield [username] + line if per_member else line
+        savings_sign, shares_sign = Transaction.BALANCE_EFFECTS.get(transaction_type, (0, 0))
+        savings += amount * savings_sign
+        shares += amount * shares_sign
+        line = [date.isoformat(), transaction_type, reference or '', amount, savings, shares]
+        yield [username] + line if per_member else line
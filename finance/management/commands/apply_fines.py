@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.fines import FineError, apply_fines
+from finance.periods import parse_period
+
+
+class Command(BaseCommand):
+    help = "Fine every member whose DEPOSITs for a month fall short of the required contribution."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', required=True, help="Month to check, as YYYY-MM")
+        parser.add_argument('--required', type=Decimal, default=Decimal(settings.MONTHLY_CONTRIBUTION),
+                            help="Minimum DEPOSIT total for the month")
+        parser.add_argument('--fine', type=Decimal, default=Decimal(settings.LATE_CONTRIBUTION_FINE),
+                            help="Fine charged to each member who falls short")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the members who would be fined")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_period(options['period'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['fine'] <= 0:
+            raise CommandError("--fine must be positive")
+
+        try:
+            count = apply_fines(options['period'], start, end, options['required'], options['fine'],
+                                dry_run=options['dry_run'])
+        except FineError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(f"{count} member(s) would be fined for {options['period']}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fined {count} member(s) up to KES {options['fine']} for {options['period']}."))
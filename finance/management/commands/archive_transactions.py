@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finance.archive import BATCH_SIZE, ArchiveError, archive_transactions
+
+
+class Command(BaseCommand):
+    help = "Move transactions from closed periods into the archive, leaving per-member rollups in the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', required=True, help="Last closed month to archive, as YYYY-MM")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Transactions moved per commit")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="VACUUM the SQLite database afterwards so the file gives back the freed pages")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            stats = archive_transactions(options['through'], batch_size=options['batch_size'])
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['archived']} transaction(s) for {stats['members']} member(s) in {stats['seconds']}s."
+        ))
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+            self.stdout.write("Database vacuumed.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.periods import PeriodError, close_period
+
+
+class Command(BaseCommand):
+    help = "Close a month: snapshot every member's closing balances and lock the month's ledger entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', required=True, help="Month to close, as YYYY-MM")
+
+    def handle(self, *args, **options):
+        try:
+            count = close_period(options['period'])
+        except PeriodError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Closed {options['period']}: {count} member snapshot(s) written."))
@@ -0,0 +1,63 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.statements import import_statement, StatementError
+
+
+class Command(BaseCommand):
+    help = "Import an M-Pesa paybill statement (CSV) as member deposits, skipping receipts already posted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV statement file")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per insert transaction")
+        parser.add_argument('--match', choices=['username', 'email'], default='username',
+                            help="Member field the payer column refers to")
+        parser.add_argument('--payer-column', help="Column holding the member reference (default 'A/C No.')")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default <path>.checkpoint)")
+        parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint offset")
+        parser.add_argument('--start-row', type=int, default=0, help="Skip this many data rows")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        checkpoint = options['checkpoint'] or f"{path}.checkpoint"
+        start_row = options['start_row']
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                start_row = int(f.read().strip() or 0)
+            self.stdout.write(f"Resuming after row {start_row}")
+
+        def save_checkpoint(row_number, stats):
+            with open(checkpoint, 'w') as f:
+                f.write(str(row_number))
+            if options['verbosity'] > 1:
+                self.stdout.write(f"row {row_number}: {stats['imported']} imported")
+
+        columns = {'payer': options['payer_column']} if options['payer_column'] else None
+        try:
+            stats = import_statement(
+                path,
+                batch_size=options['batch_size'],
+                start_row=start_row,
+                match=options['match'],
+                columns=columns,
+                on_batch=save_checkpoint,
+            )
+        except StatementError as e:
+            raise CommandError(str(e))
+
+        os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} of {stats['rows']} rows in {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)"
+        ))
+        self.stdout.write(
+            f"Skipped: {stats['duplicates']} duplicate, {stats['unknown_payer']} unknown payer, "
+            f"{stats['invalid']} invalid, {stats['not_completed']} not completed, "
+            f"{stats['closed_period']} in a closed period"
+        )
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.dividends import DIVIDEND_RATE, DividendError, pay_dividends
+
+
+class Command(BaseCommand):
+    help = "Compute time-weighted share capital for a financial year and pay the dividend into savings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True, help="Financial (calendar) year to pay")
+        parser.add_argument('--rate', type=Decimal, default=DIVIDEND_RATE, help="Dividend rate in %%")
+        parser.add_argument('--dry-run', action='store_true', help="Compute and report without paying anything")
+
+    def handle(self, *args, **options):
+        if options['rate'] <= 0:
+            raise CommandError("--rate must be positive")
+
+        try:
+            summary = pay_dividends(options['year'], options['rate'], dry_run=options['dry_run'])
+        except DividendError as e:
+            raise CommandError(str(e))
+
+        message = (f"{summary['members']} member(s), weighted share capital KES {summary['weighted_shares']}, "
+                   f"dividends KES {summary['total']} at {summary['rate']}% for {summary['year']}")
+        if options['dry_run']:
+            self.stdout.write(f"Dry run: {message}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Paid {message}."))
@@ -0,0 +1,49 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.repayments import repay_batch
+
+
+class Command(BaseCommand):
+    help = "Post a payroll check-off file of loan repayments (CSV with member and amount columns) in one run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV check-off file")
+        parser.add_argument('--member-column', default='member', help="Column holding the member's username")
+        parser.add_argument('--amount-column', default='amount')
+
+    def handle(self, *args, **options):
+        members = dict(User.objects.filter(is_staff=False).values_list('username', 'id'))
+        payments, unknown = [], []
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                for line, row in enumerate(csv.DictReader(f), start=2):
+                    username = (row.get(options['member_column']) or '').strip()
+                    try:
+                        amount = Decimal((row.get(options['amount_column']) or '').replace(',', ''))
+                    except InvalidOperation:
+                        raise CommandError(f"Line {line}: invalid amount")
+                    if amount <= 0:
+                        raise CommandError(f"Line {line}: amount must be positive")
+                    if username not in members:
+                        unknown.append(username)
+                        continue
+                    payments.append((members[username], amount))
+        except FileNotFoundError:
+            raise CommandError(f"{options['path']} does not exist")
+
+        results = repay_batch(payments)
+
+        applied = sum(a for a, _ in results.values())
+        unapplied = {user_id: u for user_id, (_, u) in results.items() if u > 0}
+        self.stdout.write(self.style.SUCCESS(f"Applied KES {applied} across {len(results)} member(s)."))
+        if unapplied:
+            self.stdout.write(self.style.WARNING(
+                f"KES {sum(unapplied.values())} from {len(unapplied)} member(s) exceeded their loan balance and was not applied."
+            ))
+        if unknown:
+            self.stdout.write(self.style.WARNING(f"Skipped {len(unknown)} row(s) for unknown members: {', '.join(sorted(set(unknown)))}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from finance.ledger import rebuild_member_accounts
+
+
+class Command(BaseCommand):
+    help = "Rebuild member balances from the Transaction and Loan ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report mismatches, don't repair them")
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_member_accounts(repair=not options['check'])
+
+        for user_id, field, stored, expected in mismatches:
+            self.stdout.write(f"user {user_id}: {field} stored={stored} ledger={expected}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All member balances match the ledger."))
+        elif options['check']:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)} mismatched balance(s) found."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatches)} mismatched balance(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.replica import ReplicaError, sync_replica
+
+
+class Command(BaseCommand):
+    help = "Refresh the read replica (settings.REPLICA_DATABASE) from the primary SQLite file. Run it from cron."
+
+    def handle(self, *args, **options):
+        try:
+            pages = sync_replica()
+        except ReplicaError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Replica refreshed ({pages} page(s))."))
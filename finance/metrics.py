@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the per-request query count histogram
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Queries listed when a request is slower than METRICS_SLOW_REQUEST_SECONDS
+SLOW_REQUEST_TOP_QUERIES = getattr(settings, 'METRICS_SLOW_REQUEST_TOP_QUERIES', 5)
+
+# Label for requests that matched no URL pattern
+UNMATCHED = 'unmatched'
+
+# The current request's QueryRecorder. A context variable, so it follows the request into
+# sync_to_async threads (async views, finance.async_reads) as well as the WSGI worker thread
+_active_recorder = ContextVar('metrics_recorder', default=None)
+
+
+class ViewStats:
+    __slots__ = ('latency', 'queries', 'requests', 'latency_sum', 'query_total', 'sql_seconds', 'errors')
+
+    def __init__(self):
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.requests = self.query_total = self.errors = 0
+        self.latency_sum = self.sql_seconds = 0.0
+
+
+class Registry:
+    """
+    In-process metrics, keyed by URL name. Each worker process keeps its own
+    counts; Prometheus sums them across scrape targets.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def observe(self, view, seconds, queries, sql_seconds, status):
+        with self.lock:
+            stats = self.views[view]
+            stats.requests += 1
+            stats.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.latency_sum += seconds
+            stats.queries[bisect_left(QUERY_BUCKETS, queries)] += 1
+            stats.query_total += queries
+            stats.sql_seconds += sql_seconds
+            if status >= 500:
+                stats.errors += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {view: (list(s.latency), list(s.queries), s.requests, s.latency_sum,
+                           s.query_total, s.sql_seconds, s.errors)
+                    for view, s in sorted(self.views.items())}
+
+
+registry = Registry()
+
+
+class QueryRecorder:
+    """execute_wrapper callable: times every query run while it is installed."""
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - started, sql))
+
+    @property
+    def seconds(self):
+        return sum(seconds for seconds, _ in self.queries)
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection-wide execute wrapper: hands each query to the current request's recorder, if any."""
+    recorder = _active_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver (FinanceConfig.ready). Connections are per
+    thread, so wrapping each one as it opens covers every thread a request
+    runs queries on. It goes first in the list, so execute_wrapper() blocks
+    opened around it still pop their own wrapper.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else UNMATCHED
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count and SQL time per URL name, and log slow
+    requests with their most expensive queries. Queries are counted by an
+    execute wrapper (record_query), so it works with DEBUG off. Streaming
+    responses are timed up to the first byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _active_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _active_recorder.reset(token)
+        self.observe(request, time.perf_counter() - started, recorder, response)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _active_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _active_recorder.reset(token)
+        self.observe(request, time.perf_counter() - started, recorder, response)
+        return response
+
+    def observe(self, request, seconds, recorder, response):
+        view = view_label(request)
+        registry.observe(view, seconds, len(recorder.queries), recorder.seconds, response.status_code)
+        if seconds >= getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', 1.0):
+            log_slow_request(request, view, seconds, recorder)
+
+
+def log_slow_request(request, view, seconds, recorder):
+    top = sorted(recorder.queries, key=lambda query: query[0], reverse=True)[:SLOW_REQUEST_TOP_QUERIES]
+    lines = [f'  {query_seconds * 1000:8.1f} ms  {sql[:500]}' for query_seconds, sql in top]
+    logger.warning(
+        'Slow request %s %s (%s): %.3fs, %d queries, %.3fs in SQL\n%s',
+        request.method, request.path, view, seconds, len(recorder.queries), recorder.seconds, '\n'.join(lines),
+    )
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def histogram_lines(name, view, bounds, counts, total, count):
+    lines, running = [], 0
+    for bound, bucket in zip(bounds, counts):
+        running += bucket
+        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {running}')
+    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{view="{view}"}} {total}')
+    lines.append(f'{name}_count{{view="{view}"}} {count}')
+    return lines
+
+
+def render_prometheus(snapshot=None):
+    """The registry in the Prometheus text exposition format (version 0.0.4)."""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    sections = {
+        'sacco_request_duration_seconds': ['# HELP sacco_request_duration_seconds Request latency by URL name.',
+                                           '# TYPE sacco_request_duration_seconds histogram'],
+        'sacco_request_queries': ['# HELP sacco_request_queries SQL queries per request by URL name.',
+                                  '# TYPE sacco_request_queries histogram'],
+        'sacco_sql_duration_seconds_total': ['# HELP sacco_sql_duration_seconds_total Time spent in SQL by URL name.',
+                                             '# TYPE sacco_sql_duration_seconds_total counter'],
+        'sacco_request_errors_total': ['# HELP sacco_request_errors_total Responses with a 5xx status by URL name.',
+                                       '# TYPE sacco_request_errors_total counter'],
+    }
+    for view, (latency, queries, requests, latency_sum, query_total, sql_seconds, errors) in snapshot.items():
+        view = escape(view)
+        sections['sacco_request_duration_seconds'] += histogram_lines(
+            'sacco_request_duration_seconds', view, LATENCY_BUCKETS, latency, round(latency_sum, 6), requests)
+        sections['sacco_request_queries'] += histogram_lines(
+            'sacco_request_queries', view, QUERY_BUCKETS, queries, query_total, requests)
+        sections['sacco_sql_duration_seconds_total'].append(
+            f'sacco_sql_duration_seconds_total{{view="{view}"}} {round(sql_seconds, 6)}')
+        sections['sacco_request_errors_total'].append(f'sacco_request_errors_total{{view="{view}"}} {errors}')
+    return '\n'.join(line for lines in sections.values() for line in lines) + '\n'
@@ -0,0 +1,65 @@
+import django.db.models.deletion
+import django.utils.timezone
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+# Frozen copy of Transaction.BALANCE_EFFECTS: how each type moves (savings, share capital).
+# Historical migrations can't read model code, which may change after this was written
+BALANCE_EFFECTS = {
+    'DEPOSIT': (1, 0),
+    'WITHDRAWAL': (-1, 0),
+    'SHARE_TRANSFER': (-1, 1),
+    'FINE': (-1, 0),
+    'DIVIDEND': (1, 0),
+}
+
+
+def backfill_accounts(apps, schema_editor):
+    Transaction = apps.get_model('finance', 'Transaction')
+    Loan = apps.get_model('finance', 'Loan')
+    MemberAccount = apps.get_model('finance', 'MemberAccount')
+
+    effects = BALANCE_EFFECTS
+    balances = defaultdict(lambda: {'savings': Decimal(0), 'share_capital': Decimal(0), 'loan_balance': Decimal(0), 'active_loans': 0})
+
+    rows = Transaction.objects.filter(transaction_type__in=effects).values('user_id', 'transaction_type').annotate(total=Sum('amount')).order_by()
+    for row in rows:
+        savings_sign, shares_sign = effects[row['transaction_type']]
+        balances[row['user_id']]['savings'] += row['total'] * savings_sign
+        balances[row['user_id']]['share_capital'] += row['total'] * shares_sign
+
+    loans = Loan.objects.filter(status='APPROVED').values('user_id').annotate(balance=Sum('balance_due'), count=Count('id')).order_by()
+    for row in loans:
+        balances[row['user_id']]['loan_balance'] = row['balance'] or Decimal(0)
+        balances[row['user_id']]['active_loans'] = row['count']
+
+    MemberAccount.objects.bulk_create(
+        [MemberAccount(user_id=user_id, **values) for user_id, values in balances.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('finance', '0004_alter_transaction_transaction_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberAccount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='account', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('savings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('share_capital', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('loan_balance', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding balance on approved loans', max_digits=14)),
+                ('active_loans', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(backfill_accounts, migrations.RunPython.noop),
+    ]
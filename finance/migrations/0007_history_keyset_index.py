@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Used to replace 0006's (user, -date) history index with (user, date).
+    0006 now builds the (user, date) index itself, so there is nothing left
+    to do. Kept so existing migration histories, and 0008's dependency,
+    still resolve.
+    """
+
+    dependencies = [
+        ('finance', '0006_transaction_loan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = []
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_history_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='reference_code',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_transaction_reference_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Monthly Contribution'), ('WITHDRAWAL', 'Savings Withdrawal'), ('FINE', 'Late Payment Fine'), ('SHARE_TRANSFER', 'Transfer to Share Capital'), ('BOND_INVESTMENT', 'Investment in Govt Bonds'), ('DIVIDEND', 'Dividend on Share Capital')], default='DEPOSIT', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Dividend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('weighted_shares', models.DecimalField(decimal_places=2, help_text='Time-weighted share capital for the year', max_digits=14)),
+                ('rate', models.DecimalField(decimal_places=2, help_text='Dividend rate in %', max_digits=5)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date_paid', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dividends', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'year'), name='dividend_user_year_uniq')],
+            },
+        ),
+    ]
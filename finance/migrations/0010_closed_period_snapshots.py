@@ -0,0 +1,39 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_dividend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(help_text='YYYY-MM', max_length=7, unique=True)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(db_index=True, help_text='Exclusive')),
+                ('closed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('savings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('share_capital', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('loan_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to=settings.AUTH_USER_MODEL)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='finance.closedperiod')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'period'), name='snapshot_user_period_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_closed_period_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='closedperiod',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='When its transactions moved to the archive', null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('DEPOSIT', 'Monthly Contribution'), ('WITHDRAWAL', 'Savings Withdrawal'), ('FINE', 'Late Payment Fine'), ('SHARE_TRANSFER', 'Transfer to Share Capital'), ('BOND_INVESTMENT', 'Investment in Govt Bonds'), ('DIVIDEND', 'Dividend on Share Capital')], max_length=20)),
+                ('date', models.DateTimeField()),
+                ('reference_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='archive_user_date_idx')],
+            },
+        ),
+    ]
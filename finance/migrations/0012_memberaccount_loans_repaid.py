@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_loans_repaid(apps, schema_editor):
+    Loan = apps.get_model('finance', 'Loan')
+    MemberAccount = apps.get_model('finance', 'MemberAccount')
+
+    repaid = Loan.objects.filter(status='PAID').values('user_id').annotate(count=Count('id')).order_by()
+    MemberAccount.objects.bulk_create([MemberAccount(user_id=row['user_id']) for row in repaid],
+                                      batch_size=500, ignore_conflicts=True)
+    for row in repaid:
+        MemberAccount.objects.filter(user_id=row['user_id']).update(loans_repaid=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberaccount',
+            name='loans_repaid',
+            field=models.IntegerField(default=0, help_text="Loans fully repaid (the member's track record)"),
+        ),
+        migrations.RunPython(backfill_loans_repaid, migrations.RunPython.noop),
+    ]
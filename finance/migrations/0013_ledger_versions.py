@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0012_memberaccount_loans_repaid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='memberaccount',
+            name='reset_version',
+            field=models.BigIntegerField(default=0, help_text='Version at which rows were last removed from the ledger'),
+        ),
+        migrations.AddField(
+            model_name='memberaccount',
+            name='version',
+            field=models.BigIntegerField(default=0, help_text="Ledger version, bumped by every write to the member's transactions or loans"),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', 'version'], name='loan_user_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'version'], name='txn_user_version_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
 from django.utils import timezone
+from collections import defaultdict
 from decimal import Decimal
 
 class Transaction(models.Model):
@@ -13,14 +15,62 @@ class Transaction(models.Model):
         ('FINE', 'Late Payment Fine'),
         ('SHARE_TRANSFER', 'Transfer to Share Capital'),
         ('BOND_INVESTMENT', 'Investment in Govt Bonds'),
+        ('DIVIDEND', 'Dividend on Share Capital'),
     ]
 
+    # How each type moves the member's (savings, share capital) balances
+    BALANCE_EFFECTS = {
+        'DEPOSIT': (1, 0),
+        'WITHDRAWAL': (-1, 0),
+        'SHARE_TRANSFER': (-1, 1),
+        'FINE': (-1, 0),
+        'DIVIDEND': (1, 0),
+    }
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="transactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES, default='DEPOSIT')
     date = models.DateTimeField(default=timezone.now)
-    reference_code = models.CharField(max_length=20, blank=True, null=True) # e.g., M-Pesa Code
-    
+    reference_code = models.CharField(max_length=20, blank=True, null=True, db_index=True) # e.g., M-Pesa Code
+    # The member's ledger version when this row was last written (see MemberAccount.next_versions)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Member history feed: filter by user, newest first. Ascending so a backwards
+            # scan yields (date DESC, id DESC) for keyset paging without a sort step
+            models.Index(fields=['user', 'date'], name='txn_user_date_id_idx'),
+            # Per-member sums by type; amount is a key column so SQLite can answer from the index alone
+            models.Index(fields=['user', 'transaction_type', 'amount'], name='txn_user_type_amount_idx'),
+            # Sacco-wide pool totals (share capital, bonds)
+            models.Index(fields=['transaction_type', 'amount'], name='txn_type_amount_idx'),
+            # Dashboard delta sync: a member's rows written since a given version
+            models.Index(fields=['user', 'version'], name='txn_user_version_idx'),
+        ]
+
+    def save(self, *args, update_account=True, **kwargs):
+        # Keep the member's running balances in the same DB transaction as the ledger row.
+        # Callers that already moved the balance (see posting.py) pass update_account=False.
+        # Entries in closed months are frozen so the period snapshots stay valid
+        ClosedPeriod.check_open(self.date)
+        with transaction.atomic():
+            self.version = MemberAccount.next_version(self.user_id)
+            if not self._state.adding:
+                previous = Transaction.objects.filter(pk=self.pk).values('user_id', 'transaction_type', 'amount', 'date').first()
+                if previous:
+                    ClosedPeriod.check_open(previous['date'])
+                    if update_account:
+                        MemberAccount.apply_transaction(previous['user_id'], previous['transaction_type'], -previous['amount'])
+            super().save(*args, **kwargs)
+            if update_account:
+                MemberAccount.apply_transaction(self.user_id, self.transaction_type, self.amount)
+
+    def delete(self, *args, **kwargs):
+        ClosedPeriod.check_open(self.date)
+        with transaction.atomic():
+            MemberAccount.next_version(self.user_id, reset=True)
+            MemberAccount.apply_transaction(self.user_id, self.transaction_type, -self.amount)
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.get_transaction_type_display()} - KES {self.amount}"
@@ -48,6 +98,18 @@ class Loan(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     date_applied = models.DateTimeField(default=timezone.now)
     date_approved = models.DateTimeField(blank=True, null=True)
+    version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Repayment waterfall: a member's approved loans, oldest first
+            models.Index(fields=['user', 'status', 'date_approved'], name='loan_user_status_appr_idx'),
+            # Dashboard "latest application" lookup
+            models.Index(fields=['user', '-date_applied'], name='loan_user_applied_idx'),
+            # Staff queue of pending applications
+            models.Index(fields=['status', '-date_applied'], name='loan_status_applied_idx'),
+            models.Index(fields=['user', 'version'], name='loan_user_version_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Calculate total interest automatically before saving
@@ -61,8 +123,18 @@ class Loan(models.Model):
             
             self.total_due = p + interest
             self.balance_due = self.total_due
-            
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            self.version = MemberAccount.next_version(self.user_id)
+            super().save(*args, **kwargs)
+            MemberAccount.refresh_loans(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            MemberAccount.next_version(self.user_id, reset=True)
+            result = super().delete(*args, **kwargs)
+            MemberAccount.refresh_loans(self.user_id)
+        return result
 
     def __str__(self):
         return f"Loan #{self.id} - {self.user.username} (KES {self.principal_amount})"
@@ -76,16 +148,290 @@ class LoanRepayment(models.Model):
     date = models.DateTimeField(default=timezone.now)
 
     def save(self, *args, **kwargs):
+        ClosedPeriod.check_open(self.date)
         # Deduct from loan balance automatically
-        super().save(*args, **kwargs)
-        self.loan.balance_due -= self.amount
-        
-        # Check if fully paid
-        if self.loan.balance_due <= 0:
-            self.loan.status = 'PAID'
-            self.loan.balance_due = 0
-            
-        self.loan.save()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.loan.balance_due -= self.amount
+
+            # Check if fully paid
+            if self.loan.balance_due <= 0:
+                self.loan.status = 'PAID'
+                self.loan.balance_due = 0
+
+            self.loan.save()
+
+    def __str__(self):
+        return f"Repayment - KES {self.amount} for Loan #{self.loan.id}"
+
+
+class PeriodLocked(Exception):
+    pass
+
+
+class ClosedPeriod(models.Model):
+    """
+    A month whose books are closed by `manage.py close_period`. Ledger entries
+    dated before the latest closed month's end can no longer be added,
+    changed or deleted, so the BalanceSnapshots taken at close stay valid.
+    """
+    period = models.CharField(max_length=7, unique=True, help_text="YYYY-MM")
+    start = models.DateTimeField()
+    end = models.DateTimeField(db_index=True, help_text="Exclusive")
+    closed_at = models.DateTimeField(default=timezone.now)
+    archived_at = models.DateTimeField(blank=True, null=True, help_text="When its transactions moved to the archive")
+
+    @classmethod
+    def closed_through(cls):
+        return cls.objects.aggregate(end=Max('end'))['end']
+
+    @classmethod
+    def check_open(cls, date):
+        """Raise PeriodLocked if `date` falls in a closed month."""
+        # Only months that have ended can be closed, so entries dated this month skip the lookup
+        month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if date is None or date >= month_start:
+            return
+        through = cls.closed_through()
+        if through and date < through:
+            raise PeriodLocked(f"The books are closed through {timezone.localtime(through):%Y-%m-%d}; "
+                               f"entries dated {timezone.localtime(date):%Y-%m-%d} can't be changed")
+
+    def __str__(self):
+        return f"Closed period {self.period}"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    A member's closing balances at the end of a closed period. Balances as of
+    any later date are the snapshot plus the ledger entries since its end.
+    Members with nothing on their books have no row (all zero).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="snapshots")
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name="snapshots")
+    savings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    share_capital = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    loan_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period'], name='snapshot_user_period_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.period.period} - {self.user.username}"
+
+
+class ArchivedTransaction(models.Model):
+    """
+    A Transaction moved out of the hot table by `manage.py archive_transactions`
+    (same id and fields). Routed to settings.ARCHIVE_DATABASE when one is set,
+    so there is no database-level constraint on user.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    date = models.DateTimeField()
+    reference_code = models.CharField(max_length=20, blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archive_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived #{self.id} - {self.transaction_type} - KES {self.amount}"
+
+
+class Dividend(models.Model):
+    """
+    A member's dividend for one financial year, as computed and paid by
+    `manage.py pay_dividends`. Dashboards read the stored figure.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="dividends")
+    year = models.IntegerField()
+    weighted_shares = models.DecimalField(max_digits=14, decimal_places=2, help_text="Time-weighted share capital for the year")
+    rate = models.DecimalField(max_digits=5, decimal_places=2, help_text="Dividend rate in %")
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    date_paid = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # One payout per member per year; also serves the dashboard's latest-dividend lookup
+            models.UniqueConstraint(fields=['user', 'year'], name='dividend_user_year_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Dividend {self.year} - {self.user.username} (KES {self.amount})"
+
+
+class MemberAccount(models.Model):
+    """
+    Running balances for a member, maintained alongside every ledger write so
+    dashboards and balance checks read one row instead of summing history.
+    Rebuild from the ledger with `manage.py rebuild_balances`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="account")
+    savings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    share_capital = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    loan_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Outstanding balance on approved loans")
+    active_loans = models.IntegerField(default=0)
+    loans_repaid = models.IntegerField(default=0, help_text="Loans fully repaid (the member's track record)")
+    updated_at = models.DateTimeField(default=timezone.now)
+    version = models.BigIntegerField(default=0, help_text="Ledger version, bumped by every write to the member's transactions or loans")
+    reset_version = models.BigIntegerField(default=0, help_text="Version at which rows were last removed from the ledger")
+
+    @classmethod
+    def for_user(cls, user):
+        account, _ = cls.objects.get_or_create(user=user)
+        return account
+
+    @classmethod
+    def next_versions(cls, user_ids, reset=False):
+        """
+        Bump the members' ledger versions for a write in progress and return
+        {user_id: new version} to stamp the rows being written. Must run in
+        the write's atomic block: the UPDATE ... RETURNING locks the account
+        rows until commit, so each member's versions commit in order. With
+        `reset` the write removes rows, and clients synced before it must
+        reload in full (see delta.py).
+        """
+        user_ids = list(set(user_ids))
+        table = connection.ops.quote_name(cls._meta.db_table)
+        version = connection.ops.quote_name('version')
+        # updated_at moves with the version: the dashboard's Last-Modified reads it
+        assignments = f'{version} = {version} + 1, {connection.ops.quote_name("updated_at")} = %s'
+        if reset:
+            assignments += f', {connection.ops.quote_name("reset_version")} = {version} + 1'
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        def bump(chunk):
+            with connection.cursor() as cursor:
+                cursor.execute(f'UPDATE {table} SET {assignments} WHERE user_id IN ({", ".join(["%s"] * len(chunk))}) '
+                               f'RETURNING user_id, {version}', [now, *chunk])
+                return dict(cursor.fetchall())
+
+        versions = {}
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            versions.update(bump(chunk))
+            missing = [user_id for user_id in chunk if user_id not in versions]
+            if missing:
+                cls.objects.bulk_create([cls(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+                versions.update(bump(missing))
+        return versions
+
+    @classmethod
+    def next_version(cls, user_id, reset=False):
+        return cls.next_versions([user_id], reset)[user_id]
+
+    @staticmethod
+    def current_version():
+        """The row's member's ledger version, for stamping rows in a queryset update()."""
+        return Subquery(MemberAccount.objects.filter(user_id=OuterRef('user_id')).values('version')[:1])
+
+    @classmethod
+    def apply_transaction(cls, user_id, transaction_type, amount, require_funds=False):
+        """
+        Move the member's balances for one ledger entry. With `require_funds`
+        a debit only applies if savings cover it; the check and the decrement
+        are one conditional UPDATE, so concurrent debits can't overdraw.
+        Returns False if the debit was refused.
+        """
+        savings_sign, shares_sign = Transaction.BALANCE_EFFECTS.get(transaction_type, (0, 0))
+        if not savings_sign and not shares_sign:
+            return True
+        amount = Decimal(amount)
+        changes = {
+            'savings': F('savings') + amount * savings_sign,
+            'share_capital': F('share_capital') + amount * shares_sign,
+            'updated_at': timezone.now(),
+        }
+
+        # Write first: on SQLite a read before the first write in a transaction can't wait out a busy lock
+        account = cls.objects.filter(user_id=user_id)
+        if require_funds and savings_sign < 0:
+            return bool(account.filter(savings__gte=amount).update(**changes))
+        if account.update(**changes):
+            return True
+        cls.objects.bulk_create([cls(user_id=user_id)], ignore_conflicts=True)
+        return bool(account.update(**changes))
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Apply {user_id: (savings_delta, share_capital_delta)} for many members.
+        Used by bulk postings that bypass Transaction.save. Members sharing a
+        delta (a fine, a standard contribution) move in one UPDATE per chunk;
+        this avoids CASE expressions, which Django compiles slowly at scale.
+        """
+        groups = defaultdict(list)
+        for user_id, delta in deltas.items():
+            groups[delta].append(user_id)
+
+        user_ids = list(deltas)
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            existing = set(cls.objects.filter(user_id__in=chunk).values_list('user_id', flat=True))
+            missing = [cls(user_id=user_id) for user_id in chunk if user_id not in existing]
+            if missing:
+                cls.objects.bulk_create(missing, ignore_conflicts=True)
+
+        now = timezone.now()
+        for (savings_delta, shares_delta), members in groups.items():
+            for start in range(0, len(members), 500):
+                cls.objects.filter(user_id__in=members[start:start + 500]).update(
+                    savings=F('savings') + savings_delta,
+                    share_capital=F('share_capital') + shares_delta,
+                    updated_at=now,
+                )
+
+    @staticmethod
+    def loan_totals():
+        # Outstanding approved loans, plus the repaid ones that make up the member's track record
+        approved = Q(status='APPROVED')
+        return {
+            'balance': Sum('balance_due', filter=approved),
+            'count': Count('id', filter=approved),
+            'repaid': Count('id', filter=Q(status='PAID')),
+        }
+
+    @classmethod
+    def refresh_loans(cls, user_id):
+        # A member only ever holds a handful of loans, so re-summing them is cheap
+        totals = Loan.objects.filter(user_id=user_id, status__in=['APPROVED', 'PAID']).aggregate(**cls.loan_totals())
+        cls.objects.update_or_create(user_id=user_id, defaults={
+            'loan_balance': totals['balance'] or 0,
+            'active_loans': totals['count'],
+            'loans_repaid': totals['repaid'],
+            'updated_at': timezone.now(),
+        })
+
+    @classmethod
+    def refresh_loans_for(cls, user_ids):
+        """Grouped version of refresh_loans for many members at once."""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        totals = {
+            row['user_id']: row
+            for row in Loan.objects.filter(user_id__in=user_ids, status__in=['APPROVED', 'PAID'])
+                                   .values('user_id')
+                                   .annotate(**cls.loan_totals())
+                                   .order_by()
+        }
+        now = timezone.now()
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        accounts = list(cls.objects.filter(user_id__in=user_ids))
+        for account in accounts:
+            row = totals.get(account.user_id, {})
+            account.loan_balance = row.get('balance') or 0
+            account.active_loans = row.get('count', 0)
+            account.loans_repaid = row.get('repaid', 0)
+            account.updated_at = now
+        cls.objects.bulk_update(accounts, ['loan_balance', 'active_loans', 'loans_repaid', 'updated_at'], batch_size=500)
 
     def __str__(self):
-        return f"Repayment - KES {self.amount} for Loan #{self.loan.id}"
\ No newline at end of file
+        return f"Account - {self.user.username}"
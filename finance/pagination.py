@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row, direction):
+    payload = json.dumps({'d': row['date'].isoformat(), 'i': row['id'], 'r': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = parse_datetime(payload['d'])
+        if date is None or payload['r'] not in ('next', 'prev'):
+            raise ValueError
+        return date, int(payload['i']), payload['r']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def keyset_page(queryset, cursor, size):
+    """
+    Fetch one page of `queryset` (newest first) after/before an opaque
+    (date, id) cursor. Seeks on the (user, date) index instead of counting
+    and OFFSET-scanning, so the cost is flat however deep the member pages.
+    `queryset` must be a .values() queryset that includes 'date' and 'id'.
+    """
+    direction = 'next'
+    if cursor:
+        date, pk, direction = decode_cursor(cursor)
+        # Written as a range plus an exclusion (not an OR) so SQLite seeks on the index
+        if direction == 'next':
+            queryset = queryset.filter(date__lte=date).exclude(date=date, id__gte=pk)
+        else:
+            queryset = queryset.filter(date__gte=date).exclude(date=date, id__lte=pk)
+
+    if direction == 'next':
+        rows = list(queryset.order_by('-date', '-id')[:size + 1])
+    else:
+        rows = list(queryset.order_by('date', 'id')[:size + 1])
+
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_more if direction == 'next' else True
+    has_previous = bool(cursor) if direction == 'next' else has_more
+
+    return {
+        'rows': rows,
+        'has_next': has_next and bool(rows),
+        'has_previous': has_previous and bool(rows),
+        'next_cursor': encode_cursor(rows[-1], 'next') if has_next and rows else None,
+        'prev_cursor': encode_cursor(rows[0], 'prev') if has_previous and rows else None,
+    }
+
+
+async def apaginate(queryset, per_page, number):
+    """
+    Async Paginator.get_page(number): returns (paginator, page), counting
+    and fetching the requested page's rows with one round trip to the ORM
+    thread. The rows are fetched for the number as given, so only an
+    out-of-range or malformed page costs a second one. page.object_list is
+    a list.
+    """
+    paginator = Paginator(queryset, per_page)
+    try:
+        guess = max(int(number), 1)
+    except (TypeError, ValueError):
+        guess = 1
+    bottom = (guess - 1) * per_page
+    count, rows = await asyncio.gather(queryset.acount(), fetch(queryset[bottom:bottom + per_page]))
+
+    paginator.count = count
+    page = paginator.get_page(number)
+    if page.number != guess:
+        rows = await fetch(page.object_list)
+    page.object_list = rows
+    return paginator, page
+
+
+async def fetch(queryset):
+    return [row async for row in queryset]
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .archive import ledger_sources
+from .models import Transaction, Loan, LoanRepayment, ClosedPeriod, BalanceSnapshot
+
+SNAPSHOT_FIELDS = ('savings', 'share_capital', 'loan_balance')
+
+BATCH_SIZE = 1000
+
+CENT = Decimal('0.01')
+
+
+class PeriodError(ValueError):
+    pass
+
+
+def parse_period(value):
+    """
+    Parse a 'YYYY-MM' period into (start, end) aware datetimes, end exclusive.
+    Raises ValueError for anything else.
+    """
+    try:
+        start = datetime.strptime(value, '%Y-%m')
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid period '{value}', expected YYYY-MM")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def zero_balances():
+    return {field: Decimal(0) for field in SNAPSHOT_FIELDS}
+
+
+def ledger_deltas(start, end, user_ids=None):
+    """
+    Movement in each member's balances for entries dated in [start, end)
+    (start None means from the beginning), as {user_id: {field: delta}}.
+    A few grouped queries over the window only.
+    """
+    deltas = defaultdict(zero_balances)
+
+    def window(field):
+        q = Q(**{f'{field}__lt': end})
+        if start is not None:
+            q &= Q(**{f'{field}__gte': start})
+        return q
+
+    # Hot table (plus the archive when the window reaches into archived months)
+    sources = [entries.filter(transaction_type__in=Transaction.BALANCE_EFFECTS) for entries in ledger_sources(start, end)]
+    disbursed = Loan.objects.filter(window('date_approved'), status__in=['APPROVED', 'PAID'])
+    repaid = LoanRepayment.objects.filter(window('date'))
+    if user_ids is not None:
+        sources = [entries.filter(user_id__in=user_ids) for entries in sources]
+        disbursed = disbursed.filter(user_id__in=user_ids)
+        repaid = repaid.filter(loan__user_id__in=user_ids)
+
+    for entries in sources:
+        for row in entries.values('user_id', 'transaction_type').annotate(total=Sum('amount')).order_by():
+            savings_sign, shares_sign = Transaction.BALANCE_EFFECTS[row['transaction_type']]
+            deltas[row['user_id']]['savings'] += row['total'] * savings_sign
+            deltas[row['user_id']]['share_capital'] += row['total'] * shares_sign
+    for row in disbursed.values('user_id').annotate(total=Sum('total_due')).order_by():
+        deltas[row['user_id']]['loan_balance'] += row['total']
+    for row in repaid.values('loan__user_id').annotate(total=Sum('amount')).order_by():
+        deltas[row['loan__user_id']]['loan_balance'] -= row['total']
+    return deltas
+
+
+def snapshot_balances(period, user_ids=None):
+    """{user_id: {field: value}} stored for a closed period (members without a row are zero)."""
+    snapshots = BalanceSnapshot.objects.filter(period=period)
+    if user_ids is not None:
+        snapshots = snapshots.filter(user_id__in=user_ids)
+    return {row['user_id']: row for row in snapshots.values('user_id', *SNAPSHOT_FIELDS)}
+
+
+def combine(base, deltas):
+    balances = defaultdict(zero_balances)
+    for source in (base, deltas):
+        for user_id, values in source.items():
+            for field in SNAPSHOT_FIELDS:
+                balances[user_id][field] += values[field]
+    for values in balances.values():
+        for field in SNAPSHOT_FIELDS:
+            values[field] = values[field].quantize(CENT)
+    return balances
+
+
+def balances_as_of(when, user_ids=None):
+    """
+    Members' savings, share capital and loan balance as of `when`: the latest
+    closed snapshot at or before `when` plus the ledger entries since, so
+    only the open tail of history is read. Returns {user_id: {field: value}}
+    (a defaultdict; members with no history read as zero).
+    """
+    period = ClosedPeriod.objects.filter(end__lte=when).order_by('-end').first()
+    base = snapshot_balances(period, user_ids) if period else {}
+    return combine(base, ledger_deltas(period.end if period else None, when, user_ids))
+
+
+def close_period(value):
+    """
+    Close the month `value` ('YYYY-MM'): write every member's closing balances
+    as BalanceSnapshots and lock the month's ledger entries. Each close starts
+    from the previous month's snapshot and reads only the month's own
+    entries. Months close in order; the first close covers all earlier
+    history. Returns the number of snapshots written.
+    """
+    try:
+        start, end = parse_period(value)
+    except ValueError as e:
+        raise PeriodError(str(e))
+    if end > timezone.now():
+        raise PeriodError(f"{value} has not ended yet")
+
+    with transaction.atomic():
+        last = ClosedPeriod.objects.order_by('-end').first()
+        if last and end <= last.end:
+            raise PeriodError(f"{value} is already closed")
+        if last and start != last.end:
+            raise PeriodError(f"Close the months after {last.period} in order first")
+
+        balances = combine(snapshot_balances(last) if last else {}, ledger_deltas(last.end if last else None, end))
+        period = ClosedPeriod.objects.create(period=value, start=start, end=end)
+        snapshots = [
+            BalanceSnapshot(user_id=user_id, period=period, **values)
+            for user_id, values in balances.items() if any(values.values())
+        ]
+        BalanceSnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE)
+
+    return len(snapshots)
@@ -0,0 +1,62 @@
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .models import Transaction, MemberAccount
+
+RETRY_ATTEMPTS = getattr(settings, 'POSTING_RETRY_ATTEMPTS', 6)
+RETRY_BASE_DELAY = getattr(settings, 'POSTING_RETRY_BASE_DELAY', 0.01)
+RETRY_MAX_DELAY = getattr(settings, 'POSTING_RETRY_MAX_DELAY', 0.5)
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_busy(func):
+    """
+    Retry a short atomic unit when the database reports it is locked, with
+    jittered exponential backoff. Only retries at the outermost level: inside
+    an enclosing atomic block the whole transaction is already lost.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if connection.in_atomic_block or not is_busy(e) or attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                delay = min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+    return wrapper
+
+
+def post_entry(user, transaction_type, amount, reference_code=None):
+    """
+    Post one ledger entry and its balance movement. Must run inside an atomic
+    block. Debits (withdrawals, share transfers) are checked against savings by
+    the conditional UPDATE on the member's account row, which serializes
+    postings per member rather than across the whole Sacco. A refused debit
+    raises InsufficientFunds before anything is written.
+    """
+    if not MemberAccount.apply_transaction(user.pk, transaction_type, amount, require_funds=True):
+        raise InsufficientFunds('Insufficient funds in Current Account')
+    entry = Transaction(user=user, amount=amount, transaction_type=transaction_type, reference_code=reference_code)
+    entry.save(update_account=False)
+    return entry
+
+
+@retry_on_busy
+def post_transaction(user, transaction_type, amount, reference_code=None):
+    """Post one entry as its own short atomic unit (one commit per request)."""
+    with transaction.atomic():
+        return post_entry(user, transaction_type, amount, reference_code)
@@ -0,0 +1,139 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .cache import member_changed, members_changed
+from .models import Loan, LoanRepayment, MemberAccount, ClosedPeriod
+from .posting import post_entry, retry_on_busy, InsufficientFunds
+
+# Keep CASE expressions (and their bound parameters) within SQLite's limits
+UPDATE_CHUNK = 500
+
+
+class RepaymentError(Exception):
+    pass
+
+
+def allocate(loans, amount):
+    """
+    Waterfall a payment across loans (oldest approval first). `loans` is an
+    ordered list of (loan_id, balance_due). Returns [(loan_id, paid), ...].
+    """
+    allocations = []
+    remaining = amount
+    for loan_id, balance in loans:
+        if remaining <= 0:
+            break
+        paid = min(balance, remaining)
+        if paid > 0:
+            allocations.append((loan_id, paid))
+            remaining -= paid
+    return allocations
+
+
+def apply_allocations(allocations, user_ids, date=None):
+    """
+    Post [(loan_id, paid), ...] for the loans of members `user_ids` with
+    set-based statements: one bulk insert of LoanRepayment rows, one
+    F()-expression UPDATE per chunk of loans, and one UPDATE flipping fully
+    repaid loans to PAID. Must run inside an atomic block.
+    """
+    if not allocations:
+        return
+    MemberAccount.next_versions(user_ids)
+    # bulk_create skips LoanRepayment.save, so check backdated postings against closed months here
+    ClosedPeriod.check_open(date)
+    extra = {'date': date} if date else {}
+    LoanRepayment.objects.bulk_create(
+        [LoanRepayment(loan_id=loan_id, amount=paid, **extra) for loan_id, paid in allocations],
+        batch_size=UPDATE_CHUNK,
+    )
+
+    for start in range(0, len(allocations), UPDATE_CHUNK):
+        chunk = allocations[start:start + UPDATE_CHUNK]
+        Loan.objects.filter(id__in=[loan_id for loan_id, _ in chunk]).update(
+            balance_due=F('balance_due') - Case(
+                *[When(id=loan_id, then=Value(paid)) for loan_id, paid in chunk],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            version=MemberAccount.current_version(),
+        )
+
+    loan_ids = [loan_id for loan_id, _ in allocations]
+    for start in range(0, len(loan_ids), UPDATE_CHUNK):
+        Loan.objects.filter(id__in=loan_ids[start:start + UPDATE_CHUNK], balance_due__lte=0).update(
+            status='PAID', balance_due=0
+        )
+
+
+@retry_on_busy
+def repay_member(user, amount, reference='LOAN REPAYMENT'):
+    """
+    Repay a member's approved loans from their Current Account in one atomic
+    block. Only the amount the loans can absorb is withdrawn from savings;
+    raises RepaymentError if savings don't cover it. Returns the total applied.
+    """
+    with transaction.atomic():
+        # Write first: bumping the member's account row takes the write lock (SQLite ignores
+        # select_for_update), so concurrent postings for this member wait here, before the loans
+        # are read, instead of failing the lock upgrade after it
+        MemberAccount.next_version(user.pk)
+        loans = list(Loan.objects.filter(user=user, status='APPROVED')
+                                 .order_by('date_approved')
+                                 .values_list('id', 'balance_due'))
+        if not loans:
+            raise RepaymentError('No active loans to repay')
+
+        allocations = allocate(loans, amount)
+        applied = sum((paid for _, paid in allocations), Decimal(0))
+
+        # Funds-checked like any other debit, so a repayment can't overdraw savings
+        try:
+            post_entry(user, 'WITHDRAWAL', applied, reference)
+        except InsufficientFunds as e:
+            raise RepaymentError(str(e))
+        apply_allocations(allocations, [user.pk])
+        MemberAccount.refresh_loans(user.pk)
+        transaction.on_commit(lambda: member_changed(user.pk))
+
+    return applied
+
+
+@retry_on_busy
+def repay_batch(payments, date=None):
+    """
+    Post a payroll check-off: `payments` is an iterable of (user_id, amount)
+    deducted at source, so nothing is withdrawn from savings. Loans are read
+    with one query per chunk of members and the whole run commits (or fails)
+    together. Returns {user_id: (applied, unapplied)}.
+    """
+    totals = defaultdict(Decimal)
+    for user_id, amount in payments:
+        totals[user_id] += amount
+
+    with transaction.atomic():
+        loans_by_member = defaultdict(list)
+        member_ids = list(totals)
+        for start in range(0, len(member_ids), UPDATE_CHUNK):
+            rows = (Loan.objects.filter(user_id__in=member_ids[start:start + UPDATE_CHUNK], status='APPROVED')
+                                .order_by('user_id', 'date_approved')
+                                .values_list('user_id', 'id', 'balance_due'))
+            for user_id, loan_id, balance in rows:
+                loans_by_member[user_id].append((loan_id, balance))
+
+        results, allocations = {}, []
+        for user_id, amount in totals.items():
+            member_allocations = allocate(loans_by_member.get(user_id, []), amount)
+            applied = sum((paid for _, paid in member_allocations), Decimal(0))
+            results[user_id] = (applied, amount - applied)
+            allocations.extend(member_allocations)
+
+        affected = [user_id for user_id, (applied, _) in results.items() if applied]
+        apply_allocations(allocations, affected, date=date)
+        for start in range(0, len(affected), UPDATE_CHUNK):
+            MemberAccount.refresh_loans_for(affected[start:start + UPDATE_CHUNK])
+        transaction.on_commit(lambda: members_changed(affected))
+
+    return results
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaError(Exception):
+    pass
+
+
+def replica_database():
+    return getattr(settings, 'REPLICA_DATABASE', None)
+
+
+@contextmanager
+def replica_reads():
+    """Route ORM reads made inside the block to the replica, when one is configured."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_from_replica(view):
+    """
+    View decorator for read-only staff reports. The replica trails the
+    primary by up to one sync interval, so keep it off pages a member reloads
+    right after a write. Works on async views too: the flag is a context
+    variable, so it follows the view's calls into sync_to_async threads.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            # Streamed rows are queried as the response is sent, after the view has returned
+            response.streaming_content = replica_stream(response.streaming_content)
+        return response
+    return wrapper
+
+
+def replica_stream(content):
+    with replica_reads():
+        yield from content
+
+
+def replica_for_read():
+    """The alias reads should use right now, or None for the router's default."""
+    replica = replica_database()
+    if not replica or not _replica_reads.get():
+        return None
+    # Inside a transaction on the primary, reads must see that transaction's own writes
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return replica
+
+
+def replica_synced_at():
+    """
+    When the replica was last refreshed (its file's modification time), or
+    None without a replica. Conditional-GET validators of responses built
+    from replica reads include it, so a refresh invalidates them.
+    """
+    replica = replica_database()
+    if not replica:
+        return None
+    try:
+        mtime = os.stat(connections[replica].settings_dict['NAME']).st_mtime
+    except OSError:
+        return None
+    return datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+
+def sync_replica(source=None, target=None):
+    """
+    Copy the primary database file into the replica with SQLite's online
+    backup API, in one step so the copy is a consistent snapshot. In WAL
+    mode writers keep committing to the primary meanwhile, and replica
+    readers see the previous copy until it finishes. Returns the number
+    of pages copied.
+    """
+    replica = replica_database()
+    if target is None and not replica:
+        raise ReplicaError("No REPLICA_DATABASE is configured")
+    source = str(source or connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+    target = str(target or connections[replica].settings_dict['NAME'])
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        pages = dst.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    # The copy may land in the WAL without touching the main file, so mark the refresh explicitly
+    os.utime(target)
+    return pages
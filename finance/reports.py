@@ -0,0 +1,190 @@
+import calendar
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from django.db.models import Case, Count, DecimalField, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, ExtractMonth, ExtractYear, Greatest, Least, Round
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .models import Loan, LoanRepayment
+from .schedules import build_schedule, add_months
+
+# (label, min days overdue, max days overdue)
+AGING_BUCKETS = (
+    ('current', 0, 0),
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+)
+
+AGING_CSV_HEADER = (
+    'loan_id', 'member', 'principal', 'total_due', 'balance_due', 'date_approved',
+    'installments_due', 'expected_paid', 'paid', 'arrears', 'days_overdue', 'bucket',
+)
+
+STREAM_CHUNK = 2000
+
+
+def bucket_for(days_overdue):
+    for label, low, high in AGING_BUCKETS:
+        if days_overdue >= low and (high is None or days_overdue <= high):
+            return label
+
+
+@lru_cache(maxsize=256)
+def cumulative_due(principal, rate, months):
+    """Running total owed after each installment of the flat schedule for these terms."""
+    total, running = Decimal(0), []
+    for row in build_schedule(principal, rate, months, 'FLAT').installments:
+        total += row.payment
+        running.append(total)
+    return tuple(running)
+
+
+def installments_due(approved, months, as_of):
+    """How many of the loan's monthly installments have fallen due by the day `as_of`."""
+    elapsed = (as_of.year - approved.year) * 12 + as_of.month - approved.month
+    if elapsed > 0 and add_months(approved, elapsed) > as_of:
+        elapsed -= 1
+    return max(0, min(elapsed, months))
+
+
+def as_float(expression):
+    return Cast(expression, FloatField())
+
+
+def installment_sql():
+    """The flat schedule's regular installment (see schedules.flat_rows), computed in SQL."""
+    principal, months = as_float('principal_amount'), as_float('duration_months')
+    interest = Round(principal * as_float('interest_rate') * months / 1200, 2)
+    return Round(principal / months, 2) + Round(interest / months, 2)
+
+
+def expected_sql(day):
+    """What a loan should have repaid by the day `day`: installments_due() and cumulative_due(), in SQL."""
+    elapsed = (day.year * 12 + day.month) - (ExtractYear('date_approved') * 12 + ExtractMonth('date_approved'))
+    if day.day < calendar.monthrange(day.year, day.month)[1]:
+        # add_months keeps the approval day, so this month's installment falls due later in the month
+        elapsed = elapsed - Case(When(date_approved__day__gt=day.day, then=1), default=0)
+    due = Greatest(Least(elapsed, F('duration_months')), 0)
+    # The last installment absorbs the rounding, so a loan fully due owes its total
+    return Least(
+        Case(When(LessThan(due, F('duration_months')), then=due * installment_sql()), default=as_float('total_due')),
+        as_float('total_due'),
+    )
+
+
+def behind_sql(day):
+    # Float arithmetic in SQL: anything under half a cent is rounding noise
+    return LessThan(as_float('paid') + 0.005, expected_sql(day))
+
+
+def aging_loans(as_of):
+    """
+    Loans outstanding at `as_of`, annotated with what had been paid on each
+    by then, summed from its LoanRepayment rows. A loan repaid since still
+    counts, at the balance it carried that day.
+    """
+    paid = (LoanRepayment.objects
+            .filter(loan=OuterRef('pk'), date__lte=as_of)
+            .values('loan')
+            .annotate(total=Sum('amount'))
+            .values('total'))
+    money = DecimalField(max_digits=12, decimal_places=2)
+    return (Loan.objects
+            .filter(status__in=('APPROVED', 'PAID'))
+            .exclude(date_approved__gt=as_of)
+            .annotate(paid=Coalesce(Subquery(paid), Value(Decimal(0)), output_field=money))
+            .annotate(outstanding=F('total_due') - F('paid'))
+            .filter(outstanding__gt=0))
+
+
+def loan_aging(as_of=None):
+    """
+    Yield the arrears position of every loan outstanding at `as_of` (default
+    now), streamed from one query over the loan table. What a member had
+    paid by `as_of` is summed from the loan's repayments in the same query.
+    Days overdue count from the due date of the oldest installment not
+    fully covered.
+    """
+    as_of = timezone.localtime(as_of or timezone.now())
+    today = as_of.date()
+    loans = (aging_loans(as_of)
+             .values_list('id', 'user__username', 'principal_amount', 'interest_rate', 'duration_months',
+                          'total_due', 'outstanding', 'paid', 'date_approved')
+             .order_by('id')
+             .iterator(chunk_size=STREAM_CHUNK))
+
+    for loan_id, username, principal, rate, months, total_due, outstanding, paid, approved in loans:
+        due_count, expected, days_overdue = 0, Decimal(0), 0
+
+        if approved and months > 0:
+            approved = timezone.localtime(approved).date()
+            schedule = cumulative_due(principal, rate, months)
+            due_count = installments_due(approved, months, today)
+            if due_count:
+                expected = min(schedule[due_count - 1], total_due)
+            if paid < expected:
+                first_unpaid = bisect_right(schedule, paid) + 1
+                days_overdue = (today - add_months(approved, first_unpaid)).days
+
+        yield {
+            'loan_id': loan_id,
+            'member': username,
+            'principal': principal,
+            'total_due': total_due,
+            'balance_due': outstanding,
+            'date_approved': approved.isoformat() if approved else '',
+            'installments_due': due_count,
+            'expected_paid': expected,
+            'paid': paid,
+            'arrears': max(expected - paid, Decimal(0)),
+            'days_overdue': days_overdue,
+            'bucket': bucket_for(days_overdue),
+        }
+
+
+def par_report(as_of=None):
+    """
+    Portfolio-at-risk summary: loans, outstanding balance and arrears per aging
+    bucket, plus PAR30/PAR90 (share of the outstanding portfolio on loans more
+    than 30/90 days overdue). Computed in one aggregate query: a loan is
+    `low` or more days overdue when its repayments by `as_of` fall short of
+    what was due `low` days earlier.
+    """
+    as_of = timezone.localtime(as_of or timezone.now())
+    today = as_of.date()
+    money = DecimalField(max_digits=14, decimal_places=2)
+    bucket = Case(
+        *[When(behind_sql(today - timedelta(days=low)), then=Value(label)) for label, low, _ in reversed(AGING_BUCKETS) if low],
+        default=Value(AGING_BUCKETS[0][0]),
+    )
+    arrears = Greatest(expected_sql(today) - as_float('paid'), 0.0)
+
+    aggregates = {}
+    for label, _, _ in AGING_BUCKETS:
+        in_bucket = Q(bucket=label)
+        aggregates[f'{label}_loans'] = Count('id', filter=in_bucket)
+        aggregates[f'{label}_outstanding'] = Coalesce(Sum('outstanding', filter=in_bucket), Value(Decimal(0)), output_field=money)
+        aggregates[f'{label}_arrears'] = Coalesce(Sum(Round(arrears, 2), filter=in_bucket), 0.0, output_field=FloatField())
+    totals = aging_loans(as_of).annotate(bucket=bucket).aggregate(**aggregates)
+
+    buckets = {label: {
+        'loans': totals[f'{label}_loans'],
+        'outstanding': totals[f'{label}_outstanding'],
+        'arrears': Decimal(totals[f'{label}_arrears']).quantize(Decimal('0.01')),
+    } for label, _, _ in AGING_BUCKETS}
+    outstanding = sum((row['outstanding'] for row in buckets.values()), Decimal(0))
+    at_risk_30 = sum((buckets[label]['outstanding'] for label, low, _ in AGING_BUCKETS if low > 30), Decimal(0))
+    at_risk_90 = sum((buckets[label]['outstanding'] for label, low, _ in AGING_BUCKETS if low > 90), Decimal(0))
+
+    return {
+        'buckets': buckets,
+        'outstanding': outstanding,
+        'par30': round(at_risk_30 / outstanding, 4) if outstanding else Decimal(0),
+        'par90': round(at_risk_90 / outstanding, 4) if outstanding else Decimal(0),
+    }
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .replica import replica_database, replica_for_read
+
+
+def archive_database():
+    return getattr(settings, 'ARCHIVE_DATABASE', None)
+
+
+class ArchiveRouter:
+    """
+    Keep ArchivedTransaction in the database named by settings.ARCHIVE_DATABASE
+    (a separate SQLite file keeps cold history out of the hot one). With no
+    archive database configured it has no opinion and everything stays on
+    'default'.
+    """
+    def is_archive(self, model):
+        return model._meta.label == 'finance.ArchivedTransaction'
+
+    def db_for_read(self, model, **hints):
+        return archive_database() if self.is_archive(model) else None
+
+    def db_for_write(self, model, **hints):
+        return archive_database() if self.is_archive(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive = archive_database()
+        if not archive:
+            return None
+        if app_label == 'finance' and model_name == 'archivedtransaction':
+            return db == archive
+        return False if db == archive else None
+
+
+class ReplicaRouter:
+    """
+    Send reads made inside replica_reads() (finance/replica.py) to
+    settings.REPLICA_DATABASE. Everything else, including every write and
+    any read inside a transaction on the primary, stays on 'default'. The
+    replica is a copy of the primary, so it is never migrated directly.
+    """
+    def db_for_read(self, model, **hints):
+        return replica_for_read()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows read from the replica are the primary's rows
+        databases = {DEFAULT_DB_ALIAS, replica_database()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if replica_database() and db == replica_database():
+            return False
+        return None
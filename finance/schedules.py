@@ -0,0 +1,101 @@
+import calendar
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+
+SCHEDULE_CACHE_SIZE = getattr(settings, 'LOAN_SCHEDULE_CACHE_SIZE', 1024)
+
+# Flat is how Loan.save prices every loan; reducing balance is offered for comparison
+METHODS = ('FLAT', 'REDUCING')
+
+MAX_DURATION_MONTHS = 120
+
+CENT = Decimal('0.01')
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+class Installment(NamedTuple):
+    number: int
+    payment: Decimal
+    principal: Decimal
+    interest: Decimal
+    balance: Decimal
+
+
+class Schedule(NamedTuple):
+    method: str
+    installments: tuple
+    total_interest: Decimal
+    total_payment: Decimal
+
+
+def cents(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def flat_rows(principal, rate, months):
+    # Same total as Loan.save: interest = P * r * t, spread evenly
+    total_interest = cents(principal * rate / 100 * Decimal(months) / 12)
+    principal_part = cents(principal / months)
+    interest_part = cents(total_interest / months)
+    balance = principal + total_interest
+    for number in range(1, months + 1):
+        if number == months:
+            # The last installment absorbs the rounding remainders
+            principal_part = principal - principal_part * (months - 1)
+            interest_part = total_interest - interest_part * (months - 1)
+        payment = principal_part + interest_part
+        balance -= payment
+        yield Installment(number, payment, principal_part, interest_part, balance)
+
+
+def reducing_rows(principal, rate, months):
+    monthly_rate = rate / 1200
+    if monthly_rate:
+        payment = cents(principal * monthly_rate / (1 - (1 + monthly_rate) ** -months))
+    else:
+        payment = cents(principal / months)
+    balance = principal
+    for number in range(1, months + 1):
+        interest = cents(balance * monthly_rate)
+        principal_part = balance if number == months else min(payment - interest, balance)
+        balance -= principal_part
+        yield Installment(number, principal_part + interest, principal_part, interest, balance)
+
+
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def build_schedule(principal, rate, months, method):
+    """
+    Full amortization table for one set of loan terms, in a single pass of
+    exact Decimal arithmetic. Memoized on (principal, rate, months, method):
+    loans share a handful of standard terms, so most calls are cache hits.
+    Pass Decimals for principal and rate.
+    """
+    rows = tuple(flat_rows(principal, rate, months) if method == 'FLAT' else reducing_rows(principal, rate, months))
+    total_interest = sum((row.interest for row in rows), Decimal(0))
+    return Schedule(method, rows, total_interest, principal + total_interest)
+
+
+def schedule_for(principal, rate, months, method='FLAT'):
+    """Validate the terms and return the (memoized) schedule. Raises ScheduleError."""
+    method = (method or 'FLAT').upper()
+    if method not in METHODS:
+        raise ScheduleError(f"Unknown method '{method}', expected one of {', '.join(METHODS)}")
+    principal, rate = cents(Decimal(principal)), Decimal(rate)
+    months = int(months)
+    if principal <= 0 or rate < 0:
+        raise ScheduleError("Amount must be positive and rate non-negative")
+    if not 1 <= months <= MAX_DURATION_MONTHS:
+        raise ScheduleError(f"Duration must be between 1 and {MAX_DURATION_MONTHS} months")
+    return build_schedule(principal, rate, months, method)
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, calendar.monthrange(year, month)[1]))
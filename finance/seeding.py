@@ -0,0 +1,152 @@
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .ledger import rebuild_member_accounts
+from .models import Transaction, Loan, LoanRepayment, ClosedPeriod
+from .schedules import add_months
+
+BATCH_SIZE = 5000
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'benchmark'
+
+# Share of members who take a loan in any one year, and the share of this year's loans still pending
+LOAN_PROBABILITY = 0.3
+PENDING_PROBABILITY = 0.2
+LOAN_RATE = Decimal(12)
+LOAN_MONTHS = 12
+
+
+class SeedError(Exception):
+    pass
+
+
+class Buffer:
+    """
+    Collects ledger rows as plain tuples and inserts them with executemany,
+    batch_size at a time. bulk_create would spend most of its time building
+    model instances and preparing each field value at this volume.
+    """
+    COLUMNS = {
+        Transaction: ('user', 'amount', 'transaction_type', 'date', 'reference_code', 'version'),
+        LoanRepayment: ('loan', 'amount', 'date'),
+    }
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.rows = {model: [] for model in self.COLUMNS}
+        self.counts = {model: 0 for model in self.COLUMNS}
+        self.sql = {}
+        for model, fields in self.COLUMNS.items():
+            columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+            self.sql[model] = (f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) '
+                               f'VALUES ({", ".join(["%s"] * len(fields))})')
+
+    def add(self, model, *values):
+        rows = self.rows[model]
+        # Amounts go in as text (as the SQLite backend stores them); dates as the backend's UTC format
+        rows.append(tuple(connection.ops.adapt_datetimefield_value(value) if isinstance(value, datetime)
+                          else str(value) if isinstance(value, Decimal) else value for value in values))
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for model in [model] if model else list(self.rows):
+            if self.rows[model]:
+                with connection.cursor() as cursor:
+                    cursor.executemany(self.sql[model], self.rows[model])
+            self.counts[model] += len(self.rows[model])
+            self.rows[model] = []
+
+
+def seed_members(members, years, seed=42, batch_size=BATCH_SIZE, prefix=USERNAME_PREFIX):
+    """
+    Create `members` synthetic members with `years` of history ending today:
+    a monthly DEPOSIT, a quarterly SHARE_TRANSFER and, for some members each
+    year, a flat-rate loan repaid by monthly check-off. Everything goes in
+    with batched inserts (no per-row save() or signals), then MemberAccount
+    rows are rebuilt from the ledger in one grouped pass. Usernames continue
+    from any earlier run with the same prefix, so scale points can be grown
+    incrementally. Returns a stats dict.
+    """
+    started = time.monotonic()
+    rng = random.Random(seed)
+    now = timezone.now()
+    first_month = add_months(now, -12 * years).replace(day=1, hour=9, minute=0, second=0, microsecond=0)
+    closed_through = ClosedPeriod.closed_through()
+    if closed_through and closed_through > first_month:
+        raise SeedError(f"Periods up to {closed_through:%Y-%m-%d} are closed; seed an empty or scratch database")
+    offset = User.objects.filter(username__startswith=prefix).count()
+    password = make_password(PASSWORD)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [User(username=f'{prefix}{offset + i}', password=password) for i in range(members)],
+            batch_size=batch_size,
+        )
+
+        loans = []
+        buffer = Buffer(batch_size)
+        for user in users:
+            savings = Decimal(0)
+            for month in range(12 * years):
+                day = add_months(first_month, month) + timedelta(days=rng.randrange(28), hours=rng.randrange(8))
+                if day > now:
+                    break
+                deposit = Decimal(rng.randrange(1000, 5001))
+                buffer.add(Transaction, user.pk, deposit, 'DEPOSIT', day, None, 0)
+                savings += deposit
+                if month % 3 == 2:
+                    shares = (savings * Decimal('0.1')).quantize(Decimal(1))
+                    buffer.add(Transaction, user.pk, shares, 'SHARE_TRANSFER', day + timedelta(hours=1), None, 0)
+                    savings -= shares
+                if month % 12 == 11 and rng.random() < LOAN_PROBABILITY:
+                    loans.append(synthetic_loan(rng, user.pk, savings, day + timedelta(days=1), now))
+        buffer.flush()
+
+        # Loans are saved before their repayments so the repayments can reference them
+        Loan.objects.bulk_create([loan for loan, _ in loans], batch_size=batch_size)
+        for loan, payments in loans:
+            for date, amount in payments:
+                buffer.add(LoanRepayment, loan.pk, amount, date)
+        buffer.flush()
+
+    rebuild_member_accounts(repair=True)
+    return {
+        'members': len(users),
+        'transactions': buffer.counts[Transaction],
+        'loans': len(loans),
+        'repayments': buffer.counts[LoanRepayment],
+        'seconds': round(time.monotonic() - started, 2),
+    }
+
+
+def synthetic_loan(rng, user_id, savings, applied, now):
+    """An unsaved Loan plus its [(date, amount)] check-off repayments up to `now`."""
+    principal = Decimal(rng.randrange(1, 4)) * max(savings, Decimal(1000))
+    total_due = principal * (1 + LOAN_RATE / 100 * LOAN_MONTHS / 12)
+    loan = Loan(user_id=user_id, principal_amount=principal, interest_rate=LOAN_RATE, duration_months=LOAN_MONTHS,
+                total_due=total_due, balance_due=total_due, date_applied=applied)
+    if add_months(applied, 1) > now and rng.random() < PENDING_PROBABILITY:
+        return loan, []
+
+    loan.status, loan.date_approved = 'APPROVED', applied + timedelta(days=2)
+    installment = (total_due / LOAN_MONTHS).quantize(Decimal('0.01'))
+    payments = []
+    for number in range(1, LOAN_MONTHS + 1):
+        due = add_months(loan.date_approved, number)
+        if due > now:
+            break
+        amount = loan.balance_due if number == LOAN_MONTHS else min(installment, loan.balance_due)
+        payments.append((due, amount))
+        loan.balance_due -= amount
+    if loan.balance_due <= 0:
+        loan.status, loan.balance_due = 'PAID', Decimal(0)
+    return loan, payments
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import member_changed, bump_membership_version
+from .events import publish_changes, publish_row
+from .models import Transaction, Loan, LoanRepayment
+
+
+def invalidate_member(user_id):
+    # After commit, so the streams it wakes read the committed figures
+    transaction.on_commit(lambda: member_changed(user_id))
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=Loan)
+def ledger_changed(sender, instance, **kwargs):
+    invalidate_member(instance.user_id)
+
+
+# Live event streams (events.py) get new ledger rows as they commit; balances follow via the version bump
+@receiver(post_save, sender=Transaction)
+def transaction_posted(sender, instance, created, **kwargs):
+    if created:
+        row = {'id': instance.pk, 'transaction_type': instance.transaction_type, 'amount': instance.amount,
+               'date': instance.date, 'reference_code': instance.reference_code}
+        transaction.on_commit(lambda: publish_row('transaction', instance.user_id, row))
+
+
+@receiver(post_save, sender=Loan)
+def loan_saved(sender, instance, **kwargs):
+    row = {'id': instance.pk, 'status': instance.status, 'amount': instance.principal_amount,
+           'reason': instance.rejection_reason if instance.status == 'REJECTED' else ''}
+    transaction.on_commit(lambda: publish_row('loan', instance.user_id, row))
+
+
+@receiver([post_save, post_delete], sender=LoanRepayment)
+def repayment_changed(sender, instance, **kwargs):
+    invalidate_member(instance.loan.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def membership_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no admin view shows
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(bump_membership_version)
+    transaction.on_commit(lambda: publish_changes([]))
@@ -0,0 +1,145 @@
+import csv
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import members_changed
+from .models import Transaction, MemberAccount, ClosedPeriod
+
+# Column names in a Safaricom paybill statement export
+DEFAULT_COLUMNS = {
+    'receipt': 'Receipt No.',
+    'date': 'Completion Time',
+    'amount': 'Paid In',
+    'payer': 'A/C No.',
+    'status': 'Transaction Status',
+}
+
+
+class StatementError(ValueError):
+    pass
+
+
+def member_lookup(match):
+    """Map the payer's account reference (username or email) to a member id."""
+    members = User.objects.filter(is_staff=False).values_list(match, 'id')
+    return {key.strip().lower(): user_id for key, user_id in members if key}
+
+
+def parse_row(row, columns):
+    receipt = (row.get(columns['receipt']) or '').strip()
+    amount = Decimal((row.get(columns['amount']) or '').replace(',', '').strip())
+    date = parse_datetime((row.get(columns['date']) or '').strip())
+    if not receipt or len(receipt) > 20 or date is None or amount <= 0:
+        raise ValueError
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return receipt, date, amount
+
+
+def post_batch(batch, stats):
+    """Insert one batch of parsed deposits, skipping receipts already in the ledger."""
+    with transaction.atomic():
+        codes = {t.reference_code for t in batch}
+        existing = set(Transaction.objects.filter(reference_code__in=codes).values_list('reference_code', flat=True))
+
+        fresh, seen = [], set()
+        for t in batch:
+            if t.reference_code in existing or t.reference_code in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add(t.reference_code)
+            fresh.append(t)
+
+        # bulk_create skips Transaction.save, so stamp the rows and post the balance movement here
+        versions = MemberAccount.next_versions({t.user_id for t in fresh})
+        for t in fresh:
+            t.version = versions[t.user_id]
+        Transaction.objects.bulk_create(fresh)
+        deltas = defaultdict(Decimal)
+        for t in fresh:
+            deltas[t.user_id] += t.amount
+        MemberAccount.apply_deltas({user_id: (total, Decimal(0)) for user_id, total in deltas.items()})
+
+        transaction.on_commit(lambda: members_changed(list(deltas)))
+
+    stats['imported'] += len(fresh)
+
+
+def import_statement(path, batch_size=1000, start_row=0, match='username', columns=None, on_batch=None):
+    """
+    Stream a CSV statement from disk and post each completed payment as a
+    DEPOSIT for the member named in the payer column. Rows are parsed one at a
+    time and inserted in batches of `batch_size`, each in its own transaction,
+    so memory stays bounded by the batch. `on_batch(row_number, stats)` runs
+    after every committed batch and is the checkpoint hook: restarting with
+    `start_row` set to the last reported row resumes where the import stopped.
+    """
+    columns = {**DEFAULT_COLUMNS, **(columns or {})}
+    members = member_lookup(match)
+    stats = {'rows': 0, 'imported': 0, 'duplicates': 0, 'unknown_payer': 0, 'invalid': 0, 'not_completed': 0,
+             'closed_period': 0}
+    # Payments dated in a closed month can't be posted without invalidating its snapshots
+    closed_through = ClosedPeriod.closed_through()
+    started = time.monotonic()
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [columns[k] for k in ('receipt', 'date', 'amount', 'payer') if columns[k] not in (reader.fieldnames or [])]
+        if missing:
+            raise StatementError(f"Statement is missing column(s): {', '.join(missing)}")
+        has_status = columns['status'] in reader.fieldnames
+
+        batch = []
+        row_number = start_row
+        for row_number, row in enumerate(reader, start=1):
+            if row_number <= start_row:
+                continue
+            stats['rows'] += 1
+
+            if has_status and (row.get(columns['status']) or '').strip().lower() != 'completed':
+                stats['not_completed'] += 1
+                continue
+
+            user_id = members.get((row.get(columns['payer']) or '').strip().lower())
+            if user_id is None:
+                stats['unknown_payer'] += 1
+                continue
+
+            try:
+                receipt, date, amount = parse_row(row, columns)
+            except (ValueError, InvalidOperation):
+                stats['invalid'] += 1
+                continue
+            if closed_through and date < closed_through:
+                stats['closed_period'] += 1
+                continue
+
+            batch.append(Transaction(
+                user_id=user_id,
+                amount=amount,
+                transaction_type='DEPOSIT',
+                date=date,
+                reference_code=receipt,
+            ))
+
+            if len(batch) >= batch_size:
+                post_batch(batch, stats)
+                batch = []
+                if on_batch:
+                    on_batch(row_number, stats)
+
+        if batch:
+            post_batch(batch, stats)
+        if on_batch:
+            on_batch(row_number, stats)
+
+    elapsed = time.monotonic() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed else 0.0
+    return stats
@@ -1,9 +1,44 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, AsyncRequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Transaction, Loan, LoanRepayment
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .approvals import decide_loans
+from .archive import archive_transactions
+from .cache import cache_stats, member_version
+from .dividends import compute_dividends, pay_dividends
+from .eligibility import member_eligibility
+from .events import EventStream, broker, live_page_context, publish_changes
+from .fines import apply_fines, FineError
+from .group_commit import GroupCommitter, committer
+from .ledger import rebuild_member_accounts, ledger_balances
+from .metrics import registry
+from .models import Transaction, Loan, LoanRepayment, MemberAccount, Dividend, ClosedPeriod, PeriodLocked, ArchivedTransaction
+from .periods import parse_period, balances_as_of, close_period, PeriodError
+from .posting import post_transaction, InsufficientFunds
+from .reports import AGING_BUCKETS, loan_aging, par_report
+from .repayments import repay_member
+from .replica import replica_for_read, replica_reads, reads_from_replica, sync_replica, ReplicaError
+from .routers import ArchiveRouter, ReplicaRouter
+from .schedules import build_schedule, schedule_for
+from . import views
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from decimal import Decimal
+from io import StringIO
+import asyncio
 import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
 
 class ModelTests(TestCase):
     def setUp(self):
@@ -48,6 +83,7 @@ class ModelTests(TestCase):
 class ViewTests(TestCase):
     def setUp(self):
         """Set up client and user for view tests."""
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='password')
         self.client.login(username='testuser', password='password')
@@ -91,6 +127,7 @@ class ViewTests(TestCase):
 
     def test_apply_loan_success(self):
         """Test applying for a loan via API."""
+        Transaction.objects.create(user=self.user, amount=Decimal(2000), transaction_type='DEPOSIT')
         url = reverse('apply_loan_api')
         data = {'amount': '5000', 'duration': '6'}
         
@@ -112,4 +149,1534 @@ class ViewTests(TestCase):
         
         res_data = json.loads(response.content)
         self.assertFalse(res_data['success'])
-        self.assertIn('already have an active loan', res_data['error'])
\ No newline at end of file
+        self.assertIn('already have an active loan', res_data['error'])
+
+class MemberAccountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def test_balances_follow_ledger_writes(self):
+        """Test that savings and share capital move with every transaction save and delete."""
+        Transaction.objects.create(user=self.user, amount=Decimal(1000), transaction_type='DEPOSIT')
+        share = Transaction.objects.create(user=self.user, amount=Decimal(300), transaction_type='SHARE_TRANSFER')
+        Transaction.objects.create(user=self.user, amount=Decimal(200), transaction_type='WITHDRAWAL')
+
+        account = MemberAccount.objects.get(user=self.user)
+        self.assertEqual(account.savings, Decimal(500))
+        self.assertEqual(account.share_capital, Decimal(300))
+
+        share.amount = Decimal(100)
+        share.save()
+        account.refresh_from_db()
+        self.assertEqual(account.savings, Decimal(700))
+        self.assertEqual(account.share_capital, Decimal(100))
+
+        share.delete()
+        account.refresh_from_db()
+        self.assertEqual(account.savings, Decimal(800))
+        self.assertEqual(account.share_capital, Decimal(0))
+
+    def test_loan_balance_follows_repayments(self):
+        """Test that approving and repaying a loan keeps the outstanding balance in step."""
+        loan = Loan.objects.create(user=self.user, principal_amount=Decimal(10000), status='APPROVED')
+        account = MemberAccount.objects.get(user=self.user)
+        self.assertEqual(account.loan_balance, Decimal(11200))
+        self.assertEqual(account.active_loans, 1)
+
+        LoanRepayment.objects.create(loan=loan, amount=Decimal(11200))
+        account.refresh_from_db()
+        self.assertEqual(account.loan_balance, Decimal(0))
+        self.assertEqual(account.active_loans, 0)
+
+    def test_rebuild_balances_repairs_drift(self):
+        """Test that the rebuild command detects and repairs a drifted account."""
+        Transaction.objects.create(user=self.user, amount=Decimal(1000), transaction_type='DEPOSIT')
+        MemberAccount.objects.filter(user=self.user).update(savings=Decimal(5))
+
+        out = StringIO()
+        call_command('rebuild_balances', '--check', stdout=out)
+        self.assertIn('1 mismatched', out.getvalue())
+        self.assertEqual(MemberAccount.objects.get(user=self.user).savings, Decimal(5))
+
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(MemberAccount.objects.get(user=self.user).savings, Decimal(1000))
+
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.login(username='admin', password='password')
+
+    def create_members(self, count, start=0):
+        for i in range(start, start + count):
+            member = User.objects.create_user(username=f'member{i:03d}', password='password')
+            Transaction.objects.create(user=member, amount=Decimal(100 * (i + 1)), transaction_type='DEPOSIT')
+
+    def test_query_count_is_constant(self):
+        """Test that the admin API does not issue per-member queries."""
+        self.create_members(3)
+        # Session, user, the ledger version for the ETag, two aggregates, the page count and the page
+        with self.assertNumQueries(7) as small:
+            self.client.get(reverse('admin_dashboard_api'))
+
+        self.create_members(30, start=3)
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.client.get(reverse('admin_dashboard_api'))
+
+    def test_sorting_and_paging(self):
+        """Test server-side sort, limit and page parameters."""
+        self.create_members(5)
+        response = self.client.get(reverse('admin_dashboard_api'), {'sort': '-savings', 'limit': 2, 'page': 2})
+        data = json.loads(response.content)
+
+        self.assertEqual(data['total_users'], 5)
+        self.assertEqual(data['num_pages'], 3)
+        self.assertEqual([u['savings'] for u in data['users']], [300.0, 200.0])
+        self.assertTrue(data['has_next'])
+        self.assertTrue(data['has_previous'])
+
+    def test_search_filters_members(self):
+        """Test that the q parameter narrows the member list."""
+        self.create_members(12)
+        response = self.client.get(reverse('admin_dashboard_api'), {'q': 'member01'})
+        data = json.loads(response.content)
+
+        self.assertEqual(data['matching_users'], 2)
+        self.assertEqual(data['total_users'], 12)
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN checks that the hot queries are served by an index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotRegex(plan, r'SCAN finance_(transaction|loan)\b(?! USING)')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_dashboard_history_uses_index(self):
+        self.assertUsesIndex(Transaction.objects.filter(user=self.user).order_by('-date')[:5], 'txn_user_date_id_idx')
+
+    def test_member_type_totals_use_covering_index(self):
+        qs = Transaction.objects.filter(user=self.user, transaction_type='DEPOSIT').values('amount')
+        self.assertUsesIndex(qs, 'COVERING INDEX txn_user_type_amount_idx')
+
+    def test_pool_totals_use_covering_index(self):
+        qs = Transaction.objects.filter(transaction_type='SHARE_TRANSFER').values('amount')
+        self.assertUsesIndex(qs, 'COVERING INDEX txn_type_amount_idx')
+
+    def test_history_cursor_seek_uses_index(self):
+        now = timezone.now()
+        qs = (Transaction.objects.filter(user=self.user)
+              .filter(date__lte=now).exclude(date=now, id__gte=10)
+              .order_by('-date', '-id')[:6])
+        self.assertUsesIndex(qs, 'txn_user_date_id_idx')
+
+    def test_latest_loan_uses_index(self):
+        self.assertUsesIndex(Loan.objects.filter(user=self.user).order_by('-date_applied')[:1], 'loan_user_applied_idx')
+
+    def test_repayment_waterfall_uses_index(self):
+        qs = Loan.objects.filter(user=self.user, status='APPROVED').order_by('date_approved')
+        self.assertUsesIndex(qs, 'loan_user_status_appr_idx')
+
+    def test_staff_queue_uses_index(self):
+        qs = Loan.objects.filter(status='PENDING').order_by('-date_applied')
+        self.assertUsesIndex(qs, 'loan_status_applied_idx')
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        # Twelve deposits, several sharing a timestamp so the id tiebreak matters
+        base = timezone.now()
+        for i in range(12):
+            Transaction.objects.create(user=self.user, amount=Decimal(i + 1), transaction_type='DEPOSIT',
+                                       date=base - timedelta(days=i // 3))
+
+    def fetch(self, cursor=''):
+        response = self.client.get(reverse('dashboard_api'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_walks_history_forward_and_back(self):
+        """Test that next/prev cursors visit every row once, newest first, without gaps."""
+        first = self.fetch()
+        self.assertFalse(first['has_previous'])
+        self.assertNotIn('num_pages', first)
+
+        seen, page = [], first
+        while True:
+            seen.extend(float(t['amount']) for t in page['transactions'])
+            if not page['has_next']:
+                break
+            page = self.fetch(page['next_cursor'])
+        self.assertEqual(sorted(seen), [float(i) for i in range(1, 13)])
+        self.assertEqual(len(seen), 12)
+
+        previous = self.fetch(page['prev_cursor'])
+        self.assertEqual(len(previous['transactions']), 5)
+        self.assertTrue(previous['has_next'])
+
+    def test_cursor_page_skips_count(self):
+        """Test that cursor mode never issues COUNT(*)."""
+        with CaptureQueriesContext(connection) as ctx:
+            self.fetch(self.fetch()['next_cursor'])
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_invalid_cursor_rejected(self):
+        response = self.client.get(reverse('dashboard_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_number_fallback(self):
+        """Test that the page-number contract still works without a cursor."""
+        data = json.loads(self.client.get(reverse('dashboard_api'), {'page': 3}).content)
+        self.assertEqual(data['current_page'], 3)
+        self.assertEqual(data['num_pages'], 3)
+        self.assertEqual(len(data['transactions']), 2)
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+
+    def get_summary(self):
+        return json.loads(self.client.get(reverse('dashboard_api')).content)
+
+    def test_repeat_reads_hit_cache(self):
+        """Test that an unchanged member's summary is served from cache."""
+        self.get_summary()
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_summary()
+        # The ETag and the cache key each read the account's version; no figures are recomputed
+        self.assertEqual(len([q for q in ctx.captured_queries if 'finance_memberaccount' in q['sql']]), 2)
+        self.assertFalse(any('finance_loan' in q['sql'] or 'finance_dividend' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_ledger_writes_invalidate_summary(self):
+        """Test that transaction, loan and repayment writes bump the member's cache version."""
+        self.assertEqual(self.get_summary()['savings'], 0.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(user=self.user, amount=Decimal(700), transaction_type='DEPOSIT')
+        self.assertEqual(self.get_summary()['savings'], 700.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            loan = Loan.objects.create(user=self.user, principal_amount=Decimal(1000), status='APPROVED')
+        self.assertEqual(self.get_summary()['loan_balance'], 1120.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LoanRepayment.objects.create(loan=loan, amount=Decimal(120))
+        self.assertEqual(self.get_summary()['loan_balance'], 1000.0)
+
+    def test_writes_from_other_processes_invalidate_summary(self):
+        """Test that a write whose after-commit hooks never run here (another worker, a command) still shows."""
+        self.assertEqual(self.get_summary()['savings'], 0.0)
+        with self.captureOnCommitCallbacks(execute=False):
+            Transaction.objects.create(user=self.user, amount=Decimal(700), transaction_type='DEPOSIT')
+        self.assertEqual(self.get_summary()['savings'], 700.0)
+
+    def test_other_members_stay_cached(self):
+        """Test that one member's write does not invalidate another member's entry."""
+        other = User.objects.create_user(username='other', password='password')
+        before = member_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(user=other, amount=Decimal(50), transaction_type='DEPOSIT')
+        self.assertEqual(member_version(self.user.pk), before)
+
+    def test_stats_endpoint_is_staff_only(self):
+        response = self.client.get(reverse('cache_stats_api'))
+        self.assertEqual(response.status_code, 403)
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+
+    def test_dashboard_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without touching the ledger."""
+        self.client.login(username='testuser', password='password')
+        first = self.client.get(reverse('dashboard_api'))
+        etag = first['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(reverse('dashboard_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+        # Just the member's account row, for its version
+        finance_queries = [q['sql'] for q in ctx.captured_queries if 'finance_' in q['sql']]
+        self.assertEqual(len(finance_queries), 1)
+        self.assertIn('finance_memberaccount', finance_queries[0])
+
+        # A different page is a different representation
+        other_page = self.client.get(reverse('dashboard_api'), {'page': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other_page.status_code, 200)
+
+    def test_dashboard_etag_changes_after_write(self):
+        self.client.login(username='testuser', password='password')
+        etag = self.client.get(reverse('dashboard_api'))['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(user=self.user, amount=Decimal(100), transaction_type='DEPOSIT')
+
+        response = self.client.get(reverse('dashboard_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+    def test_command_writes_change_the_validators(self):
+        """Test that a write made outside this process's hooks, with its cache emptied, still yields a 200."""
+        self.client.login(username='testuser', password='password')
+        first = self.client.get(reverse('dashboard_api'))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'statement.csv')
+            with open(path, 'w') as f:
+                f.write(ImportStatementTests.HEADER)
+                f.write('QAB1,2025-01-31 10:00:00,Pay Bill,Completed,"1,000.00",testuser\n')
+            # The command's after-commit hooks never run here, as for a command in another process
+            call_command('import_statement', path, stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('dashboard_api'), HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+        cache.clear()
+        response = self.client.get(reverse('dashboard_api'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['savings'], 1000.0)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.client.get(reverse('dashboard_api'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_admin_etag_follows_global_ledger(self):
+        """Test that any member's write invalidates the admin view's validator."""
+        self.client.login(username='admin', password='password')
+        etag = self.client.get(reverse('admin_dashboard_api'))['ETag']
+        self.assertEqual(self.client.get(reverse('admin_dashboard_api'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(user=self.user, amount=Decimal(100), transaction_type='DEPOSIT')
+        self.assertEqual(self.client.get(reverse('admin_dashboard_api'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_admin_etag_not_issued_to_members(self):
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(reverse('admin_dashboard_api'))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+
+class ImportStatementTests(TestCase):
+    HEADER = 'Receipt No.,Completion Time,Details,Transaction Status,Paid In,A/C No.\n'
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='password')
+        self.bob = User.objects.create_user(username='bob', password='password')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_statement(self, rows):
+        path = os.path.join(self.tmpdir.name, 'statement.csv')
+        with open(path, 'w') as f:
+            f.write(self.HEADER)
+            f.writelines(rows)
+        return path
+
+    def test_import_batches_and_skips(self):
+        """Test deposits are posted in batches with duplicate, unknown and invalid rows skipped."""
+        path = self.write_statement([
+            'QAB1,2025-01-31 10:00:00,Pay Bill,Completed,"1,000.00",alice\n',
+            'QAB2,2025-01-31 11:00:00,Pay Bill,Completed,500.00,BOB\n',
+            'QAB2,2025-01-31 11:00:00,Pay Bill,Completed,500.00,bob\n',
+            'QAB3,2025-01-31 12:00:00,Pay Bill,Completed,250.00,mallory\n',
+            'QAB4,not-a-date,Pay Bill,Completed,250.00,alice\n',
+            'QAB5,2025-01-31 13:00:00,Pay Bill,Failed,250.00,alice\n',
+            'QAB6,2025-02-01 09:00:00,Pay Bill,Completed,300.00,alice\n',
+        ])
+        out = StringIO()
+        call_command('import_statement', path, '--batch-size', '2', stdout=out)
+
+        self.assertIn('Imported 3 of 7 rows', out.getvalue())
+        self.assertIn('1 duplicate, 1 unknown payer, 1 invalid, 1 not completed', out.getvalue())
+        self.assertEqual(MemberAccount.objects.get(user=self.alice).savings, Decimal(1300))
+        self.assertEqual(MemberAccount.objects.get(user=self.bob).savings, Decimal(500))
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+        # Re-importing the same file posts nothing new
+        call_command('import_statement', path, stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_resume_from_checkpoint(self):
+        """Test that --resume skips rows up to the saved checkpoint offset."""
+        path = self.write_statement([
+            'QAC1,2025-01-31 10:00:00,Pay Bill,Completed,100.00,alice\n',
+            'QAC2,2025-01-31 11:00:00,Pay Bill,Completed,200.00,alice\n',
+        ])
+        with open(path + '.checkpoint', 'w') as f:
+            f.write('1')
+
+        call_command('import_statement', path, '--resume', stdout=StringIO())
+        self.assertEqual(list(Transaction.objects.values_list('reference_code', flat=True)), ['QAC2'])
+
+    def test_missing_columns_rejected(self):
+        path = os.path.join(self.tmpdir.name, 'bad.csv')
+        with open(path, 'w') as f:
+            f.write('Receipt,Amount\nQ1,100\n')
+        with self.assertRaises(CommandError):
+            call_command('import_statement', path, stdout=StringIO())
+
+class RepaymentEngineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.login(username='testuser', password='password')
+        Transaction.objects.create(user=self.user, amount=Decimal(50000), transaction_type='DEPOSIT')
+
+    def approved_loan(self, user, principal, days_ago):
+        return Loan.objects.create(user=user, principal_amount=Decimal(principal), status='APPROVED',
+                                   date_approved=timezone.now() - timedelta(days=days_ago))
+
+    def repay(self, amount):
+        return json.loads(self.client.post(reverse('transact_api'), json.dumps({'action': 'REPAY', 'amount': amount}),
+                                           content_type='application/json').content)
+
+    def test_waterfall_pays_oldest_first(self):
+        """Test that a repayment clears the oldest loan before touching newer ones."""
+        old = self.approved_loan(self.user, 1000, days_ago=30)   # 1120 due
+        new = self.approved_loan(self.user, 2000, days_ago=5)    # 2240 due
+
+        self.assertTrue(self.repay('1500')['success'])
+        old.refresh_from_db()
+        new.refresh_from_db()
+        self.assertEqual(old.status, 'PAID')
+        self.assertEqual(old.balance_due, Decimal(0))
+        self.assertEqual(new.balance_due, Decimal(1860))
+        self.assertEqual(LoanRepayment.objects.count(), 2)
+
+        account = MemberAccount.objects.get(user=self.user)
+        self.assertEqual(account.loan_balance, Decimal(1860))
+        self.assertEqual(account.active_loans, 1)
+
+    def test_overpayment_only_withdraws_what_is_owed(self):
+        self.approved_loan(self.user, 1000, days_ago=1)
+        self.repay('5000')
+        self.assertEqual(MemberAccount.objects.get(user=self.user).savings, Decimal(50000 - 1120))
+
+    def test_account_row_is_written_before_loans_are_read(self):
+        self.approved_loan(self.user, 1000, days_ago=1)
+        with CaptureQueriesContext(connection) as queries:
+            repay_member(self.user, Decimal(100))
+        statements = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith(('BEGIN', 'SAVEPOINT'))]
+        self.assertTrue(statements[0].startswith('UPDATE "finance_memberaccount"'), statements[0])
+
+    def test_repayment_larger_than_savings_is_refused(self):
+        loan = self.approved_loan(self.user, 100000, days_ago=1)
+        data = self.repay('60000')
+        self.assertFalse(data['success'])
+        self.assertIn('Insufficient funds', data['error'])
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.balance_due, loan.total_due)
+        self.assertEqual(MemberAccount.objects.get(user=self.user).savings, Decimal(50000))
+        self.assertFalse(Transaction.objects.filter(transaction_type='WITHDRAWAL').exists())
+        self.assertFalse(LoanRepayment.objects.exists())
+
+    def test_query_count_independent_of_loan_count(self):
+        """Test that repaying several loans costs the same statements as repaying one."""
+        self.approved_loan(self.user, 100, days_ago=3)
+        with CaptureQueriesContext(connection) as one:
+            repay_member(self.user, Decimal(10))
+
+        for i in range(5):
+            self.approved_loan(self.user, 100, days_ago=2 + i)
+        with CaptureQueriesContext(connection) as many:
+            repay_member(self.user, Decimal(600))
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+
+    def test_no_active_loans(self):
+        self.assertEqual(self.repay('100')['error'], 'No active loans to repay')
+
+    def test_checkoff_batch(self):
+        """Test posting a payroll check-off file across several members."""
+        other = User.objects.create_user(username='other', password='password')
+        self.approved_loan(self.user, 1000, days_ago=10)
+        self.approved_loan(other, 1000, days_ago=10)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('member,amount\ntestuser,500\nother,2000\nghost,100\n')
+        self.addCleanup(os.remove, f.name)
+
+        out = StringIO()
+        call_command('post_checkoff', f.name, stdout=out)
+        self.assertIn('Applied KES 1620', out.getvalue())
+        self.assertIn('Skipped 1 row', out.getvalue())
+
+        self.assertEqual(MemberAccount.objects.get(user=self.user).loan_balance, Decimal(620))
+        self.assertEqual(Loan.objects.get(user=other).status, 'PAID')
+        # Check-off is deducted at source, savings are untouched
+        self.assertEqual(MemberAccount.objects.get(user=self.user).savings, Decimal(50000))
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+class ConcurrentPostingTests(TransactionTestCase):
+    """Threads hammer the posting path; balances must never go negative."""
+
+    def run_concurrently(self, jobs, workers=16):
+        def run(job):
+            try:
+                return job()
+            except InsufficientFunds:
+                return None
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, jobs))
+
+    def test_concurrent_withdrawals_never_overdraw(self):
+        member = User.objects.create_user(username='member', password='password')
+        Transaction.objects.create(user=member, amount=Decimal(1000), transaction_type='DEPOSIT')
+
+        jobs = [lambda: post_transaction(member, 'WITHDRAWAL', Decimal(30)) for _ in range(200)]
+        results = self.run_concurrently(jobs)
+
+        self.assertEqual(sum(1 for r in results if r is not None), 33)
+        self.assertEqual(MemberAccount.objects.get(user=member).savings, Decimal(10))
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_concurrent_postings_across_members(self):
+        members = [User.objects.create_user(username=f'm{i}', password='password') for i in range(4)]
+        for m in members:
+            Transaction.objects.create(user=m, amount=Decimal(100), transaction_type='DEPOSIT')
+
+        jobs = []
+        for i in range(200):
+            m = members[i % 4]
+            kind = ('DEPOSIT', 'WITHDRAWAL', 'SHARE_TRANSFER')[i % 3]
+            jobs.append(lambda m=m, kind=kind: post_transaction(m, kind, Decimal(20)))
+        self.run_concurrently(jobs)
+
+        for account in MemberAccount.objects.all():
+            self.assertGreaterEqual(account.savings, 0)
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+class GroupCommitTests(TransactionTestCase):
+    def setUp(self):
+        self.committer = GroupCommitter(window=0.05)
+        self.addCleanup(self.committer.stop)
+
+    def test_burst_is_coalesced_with_per_request_results(self):
+        """Test that a burst commits in few transactions and each caller gets its own outcome."""
+        rich = User.objects.create_user(username='rich', password='password')
+        broke = User.objects.create_user(username='broke', password='password')
+        Transaction.objects.create(user=rich, amount=Decimal(1000), transaction_type='DEPOSIT')
+
+        def submit(job):
+            try:
+                return self.committer.submit(*job)
+            except InsufficientFunds:
+                return 'refused'
+
+        jobs = [(rich, 'DEPOSIT', Decimal(10)) for _ in range(40)] + [(broke, 'WITHDRAWAL', Decimal(5))]
+        with ThreadPoolExecutor(max_workers=41) as pool:
+            results = list(pool.map(submit, jobs))
+
+        self.assertEqual(results[-1], 'refused')
+        self.assertTrue(all(isinstance(r, Transaction) and r.pk for r in results[:-1]))
+        self.assertEqual(self.committer.postings, 41)
+        self.assertLess(self.committer.batches, 41)
+        self.assertEqual(MemberAccount.objects.get(user=rich).savings, Decimal(1400))
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_timed_out_posting_is_withdrawn(self):
+        """Test that a request that gives up waiting never has its posting committed later."""
+        user = User.objects.create_user(username='testuser', password='password')
+        slow = GroupCommitter(window=0.5)
+        self.addCleanup(slow.stop)
+        with self.assertRaises(TimeoutError):
+            slow.submit(user, 'DEPOSIT', Decimal(100), timeout=0.05)
+        slow.stop()
+        self.assertEqual(slow.postings, 0)
+        self.assertFalse(Transaction.objects.filter(user=user).exists())
+
+    def test_claimed_posting_wait_is_bounded_when_the_writer_hangs(self):
+        user = User.objects.create_user(username='testuser', password='password')
+        release = threading.Event()
+
+        class HungCommitter(GroupCommitter):
+            def commit(self, batch):
+                release.wait(5)
+                return super().commit(batch)
+
+        hung = HungCommitter(window=0)
+        self.addCleanup(hung.stop)
+        self.addCleanup(release.set)
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            hung.submit(user, 'DEPOSIT', Decimal(100), timeout=0.1)
+        self.assertLess(time.monotonic() - started, 2)
+
+    @override_settings(TRANSACT_GROUP_COMMIT=True)
+    def test_transact_api_uses_group_commit(self):
+        User.objects.create_user(username='testuser', password='password')
+        client = Client()
+        client.login(username='testuser', password='password')
+        try:
+            response = client.post(reverse('transact_api'), json.dumps({'action': 'DEPOSIT', 'amount': '250'}),
+                                   content_type='application/json')
+        finally:
+            committer.stop()
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(committer.postings, 1)
+
+class ApplyFinesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        joined = timezone.make_aware(datetime(2024, 12, 1))
+        self.paid = User.objects.create_user(username='paid', password='password', date_joined=joined)
+        self.short = User.objects.create_user(username='short', password='password', date_joined=joined)
+        self.silent = User.objects.create_user(username='silent', password='password', date_joined=joined)
+        self.late_joiner = User.objects.create_user(username='new', password='password',
+                                                    date_joined=timezone.make_aware(datetime(2025, 2, 10)))
+        User.objects.create_user(username='staff', password='password', is_staff=True, date_joined=joined)
+
+        in_period = timezone.make_aware(datetime(2025, 1, 15))
+        Transaction.objects.create(user=self.paid, amount=Decimal(1000), transaction_type='DEPOSIT', date=in_period)
+        Transaction.objects.create(user=self.short, amount=Decimal(400), transaction_type='DEPOSIT', date=in_period)
+        # A February deposit doesn't count towards January
+        Transaction.objects.create(user=self.silent, amount=Decimal(5000), transaction_type='DEPOSIT',
+                                   date=timezone.make_aware(datetime(2025, 2, 1)))
+
+    def test_fines_short_members_once(self):
+        """Test that the run fines exactly the short members and is idempotent per period."""
+        out = StringIO()
+        call_command('apply_fines', '--period', '2025-01', stdout=out)
+        self.assertIn('Fined 2 member(s)', out.getvalue())
+
+        fined = set(Transaction.objects.filter(transaction_type='FINE').values_list('user__username', flat=True))
+        self.assertEqual(fined, {'short', 'silent'})
+        self.assertEqual(MemberAccount.objects.get(user=self.short).savings, Decimal(200))
+        self.assertEqual(MemberAccount.objects.get(user=self.silent).savings, Decimal(4800))
+
+        out = StringIO()
+        call_command('apply_fines', '--period', '2025-01', stdout=out)
+        self.assertIn('Fined 0 member(s)', out.getvalue())
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_query_count_independent_of_member_count(self):
+        with CaptureQueriesContext(connection) as few:
+            apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200), dry_run=True)
+        for i in range(20):
+            User.objects.create_user(username=f'extra{i}', password='password',
+                                     date_joined=timezone.make_aware(datetime(2024, 1, 1)))
+        with CaptureQueriesContext(connection) as many:
+            apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200), dry_run=True)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_dry_run_and_bad_period(self):
+        out = StringIO()
+        call_command('apply_fines', '--period', '2025-01', '--dry-run', stdout=out)
+        self.assertIn('2 member(s) would be fined', out.getvalue())
+        self.assertFalse(Transaction.objects.filter(transaction_type='FINE').exists())
+
+        with self.assertRaises(CommandError):
+            call_command('apply_fines', '--period', 'January', stdout=StringIO())
+
+    def test_members_who_joined_during_the_month_are_not_fined(self):
+        mid_month = User.objects.create_user(username='mid', password='password',
+                                             date_joined=timezone.make_aware(datetime(2025, 1, 20)))
+        Transaction.objects.create(user=mid_month, amount=Decimal(100), transaction_type='DEPOSIT',
+                                   date=timezone.make_aware(datetime(2025, 1, 25)))
+        apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200))
+        self.assertFalse(Transaction.objects.filter(user=mid_month, transaction_type='FINE').exists())
+        self.assertEqual(MemberAccount.objects.get(user=mid_month).savings, Decimal(100))
+
+    def test_fines_never_overdraw_savings(self):
+        post_transaction(self.short, 'WITHDRAWAL', Decimal(350))
+        self.assertEqual(apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200)), 2)
+        # 50 held against a 200 fine: charged the 50
+        self.assertEqual(Transaction.objects.get(user=self.short, transaction_type='FINE').amount, Decimal(50))
+        self.assertEqual(MemberAccount.objects.get(user=self.short).savings, Decimal(0))
+
+        # Nothing held, nothing charged; a later run picks the member up once they have savings
+        broke = User.objects.create_user(username='broke', password='password',
+                                         date_joined=timezone.make_aware(datetime(2024, 12, 1)))
+        self.assertEqual(apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200)), 0)
+        self.assertFalse(Transaction.objects.filter(user=broke, transaction_type='FINE').exists())
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_refuses_a_month_that_has_not_ended(self):
+        period = f'{timezone.localtime():%Y-%m}'
+        with self.assertRaisesMessage(CommandError, 'has not ended'):
+            call_command('apply_fines', '--period', period, stdout=StringIO())
+        self.assertFalse(Transaction.objects.filter(transaction_type='FINE').exists())
+
+        out = StringIO()
+        call_command('apply_fines', '--period', period, '--dry-run', stdout=out)
+        self.assertIn('would be fined', out.getvalue())
+
+
+class DividendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.holder = User.objects.create_user(username='holder', password='password')
+        self.buyer = User.objects.create_user(username='buyer', password='password')
+        self.late = User.objects.create_user(username='late', password='password')
+
+        def shares(user, amount, date):
+            date = timezone.make_aware(date)
+            Transaction.objects.create(user=user, amount=Decimal(amount), transaction_type='DEPOSIT', date=date)
+            Transaction.objects.create(user=user, amount=Decimal(amount), transaction_type='SHARE_TRANSFER', date=date)
+
+        shares(self.holder, 1000, datetime(2024, 6, 1))
+        # Held for 183 of 365 days: weighted 730 * 183 / 365 = 366
+        shares(self.buyer, 730, datetime(2025, 7, 2))
+        # Bought after the year closed
+        shares(self.late, 5000, datetime(2026, 1, 3))
+
+    def test_time_weighted_amounts(self):
+        dividends = {d.user_id: d for d in compute_dividends(2025, Decimal(10))}
+        self.assertEqual(set(dividends), {self.holder.id, self.buyer.id})
+        self.assertEqual(dividends[self.holder.id].weighted_shares, Decimal('1000.00'))
+        self.assertEqual(dividends[self.holder.id].amount, Decimal('100.00'))
+        self.assertEqual(dividends[self.buyer.id].weighted_shares, Decimal('366.00'))
+        self.assertEqual(dividends[self.buyer.id].amount, Decimal('36.60'))
+
+    def test_pay_once_and_dashboard_reads_stored_figure(self):
+        out = StringIO()
+        call_command('pay_dividends', '--year', '2025', stdout=out)
+        self.assertIn('Paid 2 member(s)', out.getvalue())
+        self.assertIn('KES 136.60', out.getvalue())
+
+        self.assertEqual(MemberAccount.objects.get(user=self.holder).savings, Decimal(100))
+        self.assertEqual(Transaction.objects.filter(transaction_type='DIVIDEND', reference_code='DIV-2025').count(), 2)
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+        with self.assertRaises(CommandError):
+            call_command('pay_dividends', '--year', '2025', stdout=StringIO())
+        self.assertEqual(Dividend.objects.count(), 2)
+
+        self.client.login(username='holder', password='password')
+        data = self.client.get(reverse('dashboard_api')).json()
+        self.assertEqual(data['dividends'], 100.0)
+        self.assertEqual(data['dividend_year'], 2025)
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('pay_dividends', '--year', '2025', '--dry-run', stdout=out)
+        self.assertIn('Dry run: 2 member(s)', out.getvalue())
+        self.assertFalse(Dividend.objects.exists())
+        self.assertFalse(Transaction.objects.filter(transaction_type='DIVIDEND').exists())
+
+        # The open year can be previewed but not paid
+        call_command('pay_dividends', '--year', str(timezone.now().year), '--dry-run', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('pay_dividends', '--year', str(timezone.now().year), stdout=StringIO())
+
+    def test_query_count_independent_of_member_count(self):
+        with CaptureQueriesContext(connection) as few:
+            pay_dividends(2025, dry_run=True)
+        for i in range(20):
+            user = User.objects.create_user(username=f'extra{i}')
+            Transaction.objects.create(user=user, amount=Decimal(50), transaction_type='SHARE_TRANSFER',
+                                       date=timezone.make_aware(datetime(2025, 3, 1)))
+        with CaptureQueriesContext(connection) as many:
+            pay_dividends(2025, dry_run=True)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class LoanScheduleTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.loan = Loan.objects.create(user=self.member, principal_amount=Decimal(10000), duration_months=7,
+                                        status='APPROVED', date_approved=timezone.make_aware(datetime(2025, 1, 31)))
+
+    def test_flat_schedule_matches_loan_total(self):
+        """Test that the flat schedule repays exactly the total Loan.save charges."""
+        schedule = schedule_for(self.loan.principal_amount, self.loan.interest_rate, self.loan.duration_months)
+        self.assertEqual(schedule.total_payment, self.loan.total_due.quantize(Decimal('0.01')))
+        self.assertEqual(sum(row.principal for row in schedule.installments), Decimal(10000))
+        self.assertEqual(schedule.installments[-1].balance, Decimal(0))
+
+    def test_reducing_balance_schedule(self):
+        schedule = schedule_for(100000, 12, 12, 'reducing')
+        self.assertEqual(schedule.installments[0].payment, Decimal('8884.88'))
+        self.assertEqual(schedule.installments[0].interest, Decimal('1000.00'))
+        self.assertEqual(sum(row.principal for row in schedule.installments), Decimal(100000))
+        self.assertEqual(schedule.installments[-1].balance, Decimal(0))
+        # Interest on a reducing balance is cheaper than flat for the same terms
+        self.assertLess(schedule.total_interest, schedule_for(100000, 12, 12, 'FLAT').total_interest)
+
+    def test_schedules_are_memoized(self):
+        build_schedule.cache_clear()
+        schedule_for(5000, 12, 6)
+        schedule_for('5000.00', Decimal(12), 6, 'flat')
+        self.assertEqual(build_schedule.cache_info().hits, 1)
+
+    def test_schedule_api_access(self):
+        url = reverse('loan_schedule_api', args=[self.loan.id])
+        self.client.login(username='member', password='password')
+        data = self.client.get(url).json()
+        self.assertEqual(len(data['installments']), 7)
+        # Due dates run monthly from approval, clamped to month end
+        self.assertEqual(data['installments'][0]['due_date'], '2025-02-28')
+        self.assertEqual(data['installments'][1]['due_date'], '2025-03-31')
+        self.assertEqual(self.client.get(url, {'method': 'bogus'}).status_code, 400)
+
+        self.client.login(username='other', password='password')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.login(username='staff', password='password')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_preview_touches_no_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('schedule_preview_api'),
+                                       {'amount': '50000', 'duration': '12', 'method': 'REDUCING'})
+        self.assertEqual(response.json()['method'], 'REDUCING')
+        self.assertEqual(len(response.json()['installments']), 12)
+
+        for params in ({'amount': 'abc', 'duration': '12'}, {'amount': '100', 'duration': '0'}, {'amount': '-5', 'duration': '3'}):
+            self.assertEqual(self.client.get(reverse('schedule_preview_api'), params).status_code, 400)
+
+
+class PortfolioAtRiskTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.as_of = timezone.make_aware(datetime(2025, 6, 15))
+
+        # KES 1000 at 12% over 10 months: total 1100, installments of 110
+        def loan(name, approved, paid):
+            user = User.objects.create_user(username=name, password='password')
+            approved = timezone.make_aware(approved)
+            loan = Loan.objects.create(user=user, principal_amount=Decimal(1000), duration_months=10,
+                                       total_due=Decimal(1100), balance_due=Decimal(1100), status='APPROVED',
+                                       date_approved=approved)
+            if paid:
+                LoanRepayment.objects.create(loan=loan, amount=paid, date=approved + timedelta(days=20))
+            return loan
+
+        loan('current', datetime(2025, 5, 1), Decimal(110))
+        loan('late14', datetime(2025, 4, 1), Decimal(110))
+        loan('late45', datetime(2025, 3, 1), Decimal(110))
+        loan('late66', datetime(2025, 3, 10), Decimal(0))
+        loan('late165', datetime(2024, 12, 1), Decimal(0))
+        User.objects.create_user(username='pending')
+        Loan.objects.create(user=User.objects.get(username='pending'), principal_amount=Decimal(500))
+
+    def test_buckets_every_approved_loan(self):
+        rows = {row['member']: row for row in loan_aging(self.as_of)}
+        self.assertEqual({name: row['bucket'] for name, row in rows.items()}, {
+            'current': 'current', 'late14': '1-30', 'late45': '31-60', 'late66': '61-90', 'late165': '90+',
+        })
+        self.assertEqual(rows['late45']['days_overdue'], 45)
+        self.assertEqual(rows['late45']['arrears'], Decimal(220))
+
+        report = par_report(self.as_of)
+        self.assertEqual(report['outstanding'], Decimal(5170))
+        self.assertEqual(report['buckets']['90+']['loans'], 1)
+        self.assertEqual(report['par30'], Decimal('0.6170'))
+        self.assertEqual(report['par90'], Decimal('0.2128'))
+
+    def test_single_query_regardless_of_repayments(self):
+        loan = Loan.objects.filter(status='APPROVED').first()
+        LoanRepayment.objects.bulk_create([LoanRepayment(loan=loan, amount=Decimal(1)) for _ in range(50)])
+        with self.assertNumQueries(1):
+            par_report(self.as_of)
+
+    def test_past_as_of_ignores_later_repayments(self):
+        # late66 clears its loan after the report date: on that date it was still 66 days overdue
+        late66 = Loan.objects.get(user__username='late66')
+        LoanRepayment.objects.create(loan=late66, amount=Decimal(1100), date=self.as_of + timedelta(days=30))
+        self.assertEqual(Loan.objects.get(pk=late66.pk).status, 'PAID')
+
+        rows = {row['member']: row for row in loan_aging(self.as_of)}
+        self.assertEqual(rows['late66']['paid'], Decimal(0))
+        self.assertEqual(rows['late66']['balance_due'], Decimal(1100))
+        self.assertEqual(rows['late66']['days_overdue'], 66)
+        report = par_report(self.as_of)
+        self.assertEqual(report['outstanding'], Decimal(5170))
+        self.assertEqual(report['buckets']['61-90']['loans'], 1)
+        self.assertEqual(report['par30'], Decimal('0.6170'))
+
+        # Today the loan is repaid and drops out of the report
+        self.assertNotIn('late66', [row['member'] for row in loan_aging()])
+        self.assertEqual(par_report()['buckets']['61-90']['loans'], 0)
+
+    def test_summary_agrees_with_rows(self):
+        for as_of in (self.as_of, self.as_of + timedelta(days=17), self.as_of + timedelta(days=48)):
+            rows = list(loan_aging(as_of))
+            report = par_report(as_of)
+            for label, _, _ in AGING_BUCKETS:
+                in_bucket = [row for row in rows if row['bucket'] == label]
+                self.assertEqual(report['buckets'][label]['loans'], len(in_bucket), (as_of, label))
+                self.assertEqual(report['buckets'][label]['outstanding'], sum((row['balance_due'] for row in in_bucket), Decimal(0)))
+                self.assertEqual(report['buckets'][label]['arrears'], sum((row['arrears'] for row in in_bucket), Decimal(0)))
+
+    def test_staff_only_endpoints(self):
+        member = User.objects.get(username='current')
+        self.client.force_login(member)
+        self.assertEqual(self.client.get(reverse('par_report_api')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('par_report_csv')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(len(self.client.get(reverse('par_report_api')).json()['buckets']), 5)
+        response = self.client.get(reverse('par_report_csv'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('loan_id,member,'))
+        self.assertEqual(len(lines), 6)
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        start = timezone.make_aware(datetime(2025, 1, 1))
+        for i, (kind, amount) in enumerate([('DEPOSIT', 1000), ('SHARE_TRANSFER', 300), ('WITHDRAWAL', 200), ('FINE', 50)]):
+            Transaction.objects.create(user=self.member, amount=Decimal(amount), transaction_type=kind,
+                                       date=start + timedelta(days=i), reference_code=f'REF{i}')
+        Transaction.objects.create(user=self.other, amount=Decimal(70), transaction_type='DEPOSIT', date=start)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_member_statement_running_balance(self):
+        self.client.force_login(self.member)
+        lines = self.read(self.client.get(reverse('statement_csv')))
+        self.assertEqual(lines[0], 'date,type,reference,amount,savings_balance,share_capital_balance')
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[2].endswith('SHARE_TRANSFER,REF1,300.00,700.00,300.00'))
+        # The closing balance matches the member's account
+        self.assertTrue(lines[-1].endswith(f'{MemberAccount.objects.get(user=self.member).savings:.2f},300.00'))
+
+    def test_staff_bulk_statements(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('staff_statements_csv')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        lines = self.read(self.client.get(reverse('staff_statements_csv')))
+        self.assertEqual(lines[0].split(',')[0], 'member')
+        self.assertEqual(len(lines), 6)
+        # Balances restart for each member
+        self.assertIn('other,', lines[-1])
+        self.assertTrue(lines[-1].endswith('70.00,70.00,0.00'))
+
+        lines = self.read(self.client.get(reverse('staff_statements_csv'), {'user': self.other.id}))
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(self.client.get(reverse('staff_statements_csv'), {'user': 'x'}).status_code, 400)
+
+
+class PeriodCloseTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.on = lambda y, m, d: timezone.make_aware(datetime(y, m, d, 12))
+
+        Transaction.objects.create(user=self.member, amount=Decimal(1000), transaction_type='DEPOSIT', date=self.on(2025, 1, 5))
+        Transaction.objects.create(user=self.member, amount=Decimal(400), transaction_type='SHARE_TRANSFER', date=self.on(2025, 1, 20))
+        self.loan = Loan.objects.create(user=self.member, principal_amount=Decimal(1000), duration_months=12,
+                                        status='APPROVED', date_approved=self.on(2025, 1, 10))
+        LoanRepayment.objects.create(loan=self.loan, amount=Decimal(120), date=self.on(2025, 2, 1))
+        Transaction.objects.create(user=self.member, amount=Decimal(300), transaction_type='DEPOSIT', date=self.on(2025, 2, 14))
+
+    def test_incremental_snapshots(self):
+        self.assertEqual(close_period('2025-01'), 1)
+        self.assertEqual(close_period('2025-02'), 1)
+        february = ClosedPeriod.objects.get(period='2025-02').snapshots.get(user=self.member)
+        self.assertEqual((february.savings, february.share_capital, february.loan_balance),
+                         (Decimal(900), Decimal(400), Decimal(1000)))
+
+        with self.assertRaises(PeriodError):
+            close_period('2025-02')
+        with self.assertRaises(PeriodError):
+            close_period('2025-04')
+        with self.assertRaises(CommandError):
+            call_command('close_period', '--period', timezone.localtime().strftime('%Y-%m'), stdout=StringIO())
+
+    def test_balance_as_of_reads_snapshot_plus_deltas(self):
+        close_period('2025-01')
+        with CaptureQueriesContext(connection) as ctx:
+            balances = balances_as_of(self.on(2025, 2, 20), [self.member.id])[self.member.id]
+        self.assertEqual(balances, {'savings': Decimal(900), 'share_capital': Decimal(400), 'loan_balance': Decimal(1000)})
+        # Only entries after the January close are summed
+        ledger_sql = [q['sql'] for q in ctx.captured_queries if 'finance_transaction' in q['sql']]
+        self.assertTrue(all('"finance_transaction"."date" >=' in sql for sql in ledger_sql))
+
+        # The open-ended answer agrees with the maintained account
+        account = MemberAccount.objects.get(user=self.member)
+        now = balances_as_of(timezone.now(), [self.member.id])[self.member.id]
+        self.assertEqual((now['savings'], now['share_capital'], now['loan_balance']),
+                         (account.savings, account.share_capital, account.loan_balance))
+
+    def test_closed_months_are_locked(self):
+        close_period('2025-01')
+        january = Transaction.objects.get(date=self.on(2025, 1, 5))
+        with self.assertRaises(PeriodLocked):
+            Transaction.objects.create(user=self.member, amount=Decimal(5), transaction_type='DEPOSIT', date=self.on(2025, 1, 31))
+        with self.assertRaises(PeriodLocked):
+            january.delete()
+        # Moving a locked entry out of the closed month is refused too
+        january.date = self.on(2025, 2, 2)
+        with self.assertRaises(PeriodLocked):
+            january.save()
+        # February is still open
+        Transaction.objects.create(user=self.member, amount=Decimal(5), transaction_type='DEPOSIT', date=self.on(2025, 2, 2))
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_statement_from_opening_balance(self):
+        close_period('2025-01')
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('statement_csv'), {'from': '2025-02-01'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[1].startswith('2025-02-01T00:00:00+00:00,OPENING_BALANCE,,,600.00,400.00'))
+        self.assertTrue(lines[2].endswith('DEPOSIT,,300.00,900.00,400.00'))
+        self.assertEqual(self.client.get(reverse('statement_csv'), {'from': 'soon'}).status_code, 400)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.members = [User.objects.create_user(username=f'member{i}', password='password') for i in range(3)]
+        on = lambda m, d: timezone.make_aware(datetime(2025, m, d, 9))
+        for member in self.members:
+            for month in (1, 2, 3):
+                Transaction.objects.create(user=member, amount=Decimal(1000), transaction_type='DEPOSIT', date=on(month, 3))
+                Transaction.objects.create(user=member, amount=Decimal(100 * month), transaction_type='SHARE_TRANSFER',
+                                           date=on(month, 20))
+        close_period('2025-01')
+        close_period('2025-02')
+        self.mid_february = on(2, 15)
+
+    def test_totals_survive_archiving(self):
+        before_as_of = balances_as_of(self.mid_february)
+        before_dividends = {d.user_id: d.amount for d in compute_dividends(2025)}
+
+        stats = archive_transactions('2025-02', batch_size=5)
+        self.assertEqual(stats['archived'], 12)
+        self.assertEqual(ArchivedTransaction.objects.count(), 12)
+        # Six March rows plus one DEPOSIT and one SHARE_TRANSFER rollup per member
+        self.assertEqual(Transaction.objects.count(), 12)
+        self.assertEqual(Transaction.objects.filter(reference_code='ROLLUP').count(), 6)
+
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+        self.assertEqual(balances_as_of(self.mid_february), before_as_of)
+        self.assertEqual({d.user_id: d.amount for d in compute_dividends(2025)}, before_dividends)
+
+    def test_incremental_runs_merge_rollups(self):
+        expected = ledger_balances()
+        archive_transactions('2025-01')
+        close_period('2025-03')
+        out = StringIO()
+        call_command('archive_transactions', '--through', '2025-03', stdout=out)
+        self.assertIn('Archived 12 transaction(s) for 3 member(s)', out.getvalue())
+
+        self.assertEqual(Transaction.objects.count(), 6)
+        rollup = Transaction.objects.get(user=self.members[0], transaction_type='SHARE_TRANSFER')
+        self.assertEqual(rollup.amount, Decimal(600))
+        self.assertEqual(ledger_balances(), expected)
+
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', '--through', '2025-03', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', '--through', '2025-04', stdout=StringIO())
+
+    def test_archived_months_are_refused_by_window_readers(self):
+        archive_transactions('2025-02')
+        with self.assertRaises(FineError):
+            apply_fines('2025-01', *parse_period('2025-01'), Decimal(1000), Decimal(200))
+        apply_fines('2025-03', *parse_period('2025-03'), Decimal(1000), Decimal(200), dry_run=True)
+
+        self.client.force_login(self.members[0])
+        self.assertEqual(self.client.get(reverse('statement_csv'), {'from': '2025-01-15'}).status_code, 400)
+        lines = b''.join(self.client.get(reverse('statement_csv'), {'from': '2025-03-01'}).streaming_content).decode().splitlines()
+        self.assertIn('OPENING_BALANCE,,,1700.00,300.00', lines[1])
+
+    @override_settings(ARCHIVE_DATABASE='archive')
+    def test_router_sends_archive_to_its_own_database(self):
+        archive_router = ArchiveRouter()
+        self.assertEqual(archive_router.db_for_write(ArchivedTransaction), 'archive')
+        self.assertIsNone(archive_router.db_for_write(Transaction))
+        self.assertTrue(archive_router.allow_migrate('archive', 'finance', 'archivedtransaction'))
+        self.assertFalse(archive_router.allow_migrate('archive', 'finance', 'transaction'))
+        self.assertFalse(archive_router.allow_migrate('default', 'finance', 'archivedtransaction'))
+
+
+class LoanDecisionTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.members = [User.objects.create_user(username=f'member{i}', password='password') for i in range(6)]
+        self.loans = [Loan.objects.create(user=member, principal_amount=Decimal(1000 * (i + 1)), duration_months=12)
+                      for i, member in enumerate(self.members)]
+        self.client.force_login(self.staff)
+
+    def decide(self, decisions):
+        return self.client.post(reverse('decide_loans_api'), json.dumps({'decisions': decisions}),
+                                content_type='application/json')
+
+    def test_batch_applies_and_reports_each_decision(self):
+        first, second, third = self.loans[:3]
+        response = self.decide([
+            {'loan_id': first.id, 'action': 'approve'},
+            {'loan_id': second.id, 'action': 'reject', 'reason': 'Insufficient savings'},
+            {'loan_id': third.id, 'action': 'reject'},
+            {'loan_id': 999999, 'action': 'approve'},
+        ])
+        data = response.json()
+        self.assertEqual(data['approved'], [first.id])
+        self.assertEqual(data['rejected'], [second.id])
+        self.assertEqual({item['loan_id'] for item in data['skipped']}, {third.id, 999999})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'APPROVED')
+        self.assertIsNotNone(first.date_approved)
+        self.assertEqual(second.rejection_reason, 'Insufficient savings')
+        self.assertEqual(Loan.objects.get(id=third.id).status, 'PENDING')
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+        # A loan already decided is skipped rather than flipped again
+        data = self.decide([{'loan_id': first.id, 'action': 'reject', 'reason': 'Changed mind'}]).json()
+        self.assertEqual(data['skipped'][0]['loan_id'], first.id)
+        self.assertEqual(Loan.objects.get(id=first.id).status, 'APPROVED')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def queries_for(loans):
+            with CaptureQueriesContext(connection) as ctx:
+                self.decide([{'loan_id': loan.id, 'action': 'approve'} for loan in loans])
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(self.loans[:2]), queries_for(self.loans[2:]))
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.decide([]).status_code, 400)
+        self.assertEqual(self.client.post(reverse('decide_loans_api'), 'nope', content_type='application/json').status_code, 400)
+        self.client.force_login(self.members[0])
+        self.assertEqual(self.decide([{'loan_id': self.loans[0].id, 'action': 'approve'}]).status_code, 403)
+
+    def test_decisions_require_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.staff)
+        body = json.dumps({'decisions': [{'loan_id': self.loans[0].id, 'action': 'approve'}]})
+        # A cross-site form can post text/plain with the staff member's session cookie
+        self.assertEqual(client.post(reverse('decide_loans_api'), body, content_type='text/plain').status_code, 403)
+        self.assertEqual(Loan.objects.get(id=self.loans[0].id).status, 'PENDING')
+
+        # The staff page sends the token from its own render
+        token = client.get(reverse('staff_dashboard')).context['csrf_token']
+        response = client.post(reverse('decide_loans_api'), body, content_type='application/json',
+                               HTTP_X_CSRFTOKEN=str(token))
+        self.assertEqual(response.json()['approved'], [self.loans[0].id])
+
+    def test_pending_queue_is_paged_and_filtered(self):
+        Loan.objects.bulk_create([Loan(user=self.members[5], principal_amount=Decimal(500), total_due=Decimal(560),
+                                       balance_due=Decimal(560)) for _ in range(50)])
+        first = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(len(first.context['loans']), 50)
+        self.assertTrue(first.context['page']['has_next'])
+        rest = self.client.get(reverse('staff_dashboard'), {'cursor': first.context['page']['next_cursor']})
+        self.assertEqual(len(rest.context['loans']), 6)
+        self.assertFalse(rest.context['page']['has_next'])
+
+        filtered = self.client.get(reverse('staff_dashboard'), {'q': 'member1', 'min_amount': '1500'})
+        self.assertEqual([loan['id'] for loan in filtered.context['loans']], [self.loans[1].id])
+
+
+class EligibilityTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        Transaction.objects.create(user=self.member, amount=Decimal(1000), transaction_type='DEPOSIT')
+
+    def apply(self, amount):
+        return self.client.post(reverse('apply_loan_api'), json.dumps({'amount': str(amount), 'duration': '6'}),
+                                content_type='application/json').json()
+
+    def test_application_is_checked_against_the_limit(self):
+        with self.assertNumQueries(1):
+            assessment = member_eligibility(self.member.pk, Decimal(5000))
+        self.assertEqual(assessment.limit, Decimal(3000))
+        self.assertFalse(assessment.eligible)
+
+        self.client.force_login(self.member)
+        refused = self.apply(5000)
+        self.assertFalse(refused['success'])
+        self.assertEqual(refused['limit'], 3000.0)
+        self.assertFalse(Loan.objects.exists())
+
+        accepted = self.apply(3000)
+        self.assertTrue(accepted['success'])
+        self.assertEqual(accepted['score'], 70)
+
+    def test_repaid_loans_raise_the_limit(self):
+        loan = Loan.objects.create(user=self.member, principal_amount=Decimal(1000), duration_months=12,
+                                   status='APPROVED', date_approved=timezone.now())
+        self.assertEqual(member_eligibility(self.member.pk, Decimal(1)).limit, Decimal(3000) - loan.total_due)
+
+        LoanRepayment.objects.create(loan=loan, amount=loan.total_due)
+        self.assertEqual(MemberAccount.objects.get(user=self.member).loans_repaid, 1)
+        assessment = member_eligibility(self.member.pk, Decimal(3500))
+        self.assertEqual(assessment.limit, Decimal(3500))
+        self.assertEqual(assessment.score, 80)
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+
+    def test_staff_queue_is_scored_in_one_query(self):
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        for i in range(5):
+            member = User.objects.create_user(username=f'applicant{i}', password='password')
+            Transaction.objects.create(user=member, amount=Decimal(1000 * i), transaction_type='DEPOSIT')
+            Loan.objects.create(user=member, principal_amount=Decimal(2500), duration_months=12)
+        self.client.force_login(staff)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(sum('finance_loan' in query['sql'] for query in ctx.captured_queries), 1)
+        scores = {row['username']: row['assessment'] for row in response.context['loans']}
+        self.assertFalse(scores['applicant0'].eligible)
+        self.assertEqual(scores['applicant1'].limit, Decimal(3000))
+        self.assertTrue(scores['applicant1'].eligible)
+
+        eligible = self.client.get(reverse('staff_dashboard'), {'eligible': '1'}).context['loans']
+        self.assertEqual(sorted(row['username'] for row in eligible), ['applicant1', 'applicant2', 'applicant3', 'applicant4'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.force_login(self.member)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('dashboard_api'))
+        self.client.get(reverse('dashboard_api'))
+        self.assertEqual(self.client.get(reverse('metrics_api')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse('metrics_api')).content.decode()
+        self.assertIn('sacco_request_duration_seconds_count{view="dashboard_api"} 2', body)
+        self.assertIn('sacco_request_duration_seconds_bucket{view="dashboard_api",le="+Inf"} 2', body)
+        total = int(next(line for line in body.splitlines()
+                         if line.startswith('sacco_request_queries_sum{view="dashboard_api"}')).split()[-1])
+        self.assertGreaterEqual(total, len(ctx.captured_queries))
+        self.assertIn('sacco_request_errors_total{view="metrics_api"} 0', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scraper_token(self):
+        self.assertEqual(self.client.get(reverse('metrics_api'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics_api'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_log_their_queries(self):
+        self.client.force_login(self.member)
+        with self.assertLogs('finance.metrics', 'WARNING') as logs:
+            self.client.get(reverse('dashboard_api'))
+        self.assertIn('Slow request GET /api/dashboard-data/ (dashboard_api)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class SeedBenchmarkTests(TestCase):
+    def test_seeds_a_consistent_ledger(self):
+        out = StringIO()
+        call_command('seed_benchmark', '--members', '20', '--years', '2', '--batch-size', '50', stdout=out)
+        self.assertIn('Seeded 20 member(s)', out.getvalue())
+
+        members = User.objects.filter(username__startswith='bench')
+        self.assertEqual(members.count(), 20)
+        self.assertGreaterEqual(Transaction.objects.filter(transaction_type='DEPOSIT').count(), 20 * 23)
+        self.assertTrue(Loan.objects.filter(status__in=['APPROVED', 'PAID']).exists())
+        for loan in Loan.objects.filter(status__in=['APPROVED', 'PAID']):
+            paid = loan.repayments.aggregate(total=Sum('amount'))['total'] or Decimal(0)
+            self.assertEqual(loan.total_due - paid, loan.balance_due)
+        self.assertEqual(rebuild_member_accounts(repair=False), [])
+        self.assertTrue(self.client.login(username='bench0', password='benchmark'))
+
+        # A second run continues the numbering instead of colliding
+        call_command('seed_benchmark', '--members', '5', '--years', '1', stdout=StringIO())
+        self.assertTrue(User.objects.filter(username='bench24').exists())
+
+    def test_refuses_closed_history(self):
+        close_period((timezone.localdate().replace(day=1) - timedelta(days=1)).strftime('%Y-%m'))
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', '--members', '1', stdout=StringIO())
+
+
+class ReplicaTests(TransactionTestCase):
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_only_flagged_reads_outside_transactions_use_the_replica(self):
+        self.assertIsNone(replica_for_read())
+        with replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Transaction), 'replica')
+            with transaction.atomic():
+                self.assertIsNone(replica_for_read())
+        self.assertIsNone(replica_for_read())
+        self.assertFalse(ReplicaRouter().allow_migrate('replica', 'finance'))
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'finance'))
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_streamed_responses_keep_reading_from_the_replica(self):
+        @reads_from_replica
+        def view(request):
+            return StreamingHttpResponse(replica_for_read() or 'default' for _ in range(2))
+
+        response = view(None)
+        self.assertIsNone(replica_for_read())
+        self.assertEqual(b''.join(response.streaming_content), b'replicareplica')
+
+    def test_sync_copies_the_primary(self):
+        target = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        self.assertGreater(sync_replica(target=target), 0)
+        with sqlite3.connect(target) as copy:
+            tables = {name for name, in copy.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertIn(Transaction._meta.db_table, tables)
+
+        with self.assertRaises(ReplicaError):
+            sync_replica()
+
+
+@override_settings(ASYNC_PARALLEL_READS=True)
+class AsyncDashboardTests(TransactionTestCase):
+    """The ASGI variants return what the sync views return, with their reads on separate connections."""
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        for i in range(7):
+            post_transaction(self.member, 'DEPOSIT', Decimal(100 * (i + 1)))
+        Loan.objects.create(user=self.member, principal_amount=Decimal(500), total_due=Decimal(560),
+                            balance_due=Decimal(560))
+
+    def assertSameJson(self, sync_name, async_name, params):
+        expected = self.client.get(reverse(sync_name), params)
+        cache.clear()
+        actual = self.client.get(reverse(async_name), params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.json(), expected.json())
+        self.assertTrue(actual.has_header('ETag'))
+
+    def test_member_dashboard_matches_sync_view(self):
+        self.client.force_login(self.member)
+        for params in ({}, {'page': 2}, {'page': 9}, {'page': 'x'}, {'cursor': ''}, {'cursor': 'bad'}):
+            with self.subTest(params=params):
+                self.assertSameJson('dashboard_api', 'dashboard_api_async', params)
+
+        first = self.client.get(reverse('dashboard_api_async'), {'cursor': ''}).json()
+        self.assertSameJson('dashboard_api', 'dashboard_api_async', {'cursor': first['next_cursor']})
+
+    def test_admin_dashboard_matches_sync_view(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('admin_dashboard_api_async')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        for params in ({}, {'sort': 'username', 'limit': 1, 'page': 2}, {'q': 'nobody'}):
+            with self.subTest(params=params):
+                self.assertSameJson('admin_dashboard_api', 'admin_dashboard_api_async', params)
+
+        etag = self.client.get(reverse('admin_dashboard_api_async'))['ETag']
+        self.assertEqual(self.client.get(reverse('admin_dashboard_api_async'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    async def test_asgi_requests_count_queries_from_worker_threads(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('admin_dashboard_api_async'))
+        self.assertEqual(response.status_code, 200)
+        # Pool totals and member count on executor threads, matching count and the page on the ORM thread
+        _, _, requests, _, queries, *_ = registry.snapshot()['admin_dashboard_api_async']
+        self.assertEqual(requests, 1)
+        self.assertGreaterEqual(queries, 4)
+
+
+def sse_events(chunk):
+    """[(event, data)] from a chunk of a text/event-stream body."""
+    events = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@override_settings(EVENTS_ENABLED=True, EVENTS_HEARTBEAT_SECONDS=0.05, EVENTS_MAX_SECONDS=5)
+class LiveEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        post_transaction(self.member, 'DEPOSIT', Decimal(1000))
+
+    def open_stream(self, view, user):
+        # Called directly: the test client would close the test's connection when the stream is closed early
+        request = RequestFactory().get('/')
+        request.user = user
+        response = view(request)
+        self.addCleanup(self.close_stream, response)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response, iter(response.streaming_content)
+
+    def close_stream(self, response):
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+
+    def test_member_stream_pushes_new_rows_and_changed_figures_only(self):
+        response, content = self.open_stream(views.dashboard_events, self.member)
+        [(event, snapshot)] = sse_events(next(content))
+        self.assertEqual((event, snapshot['savings']), ('snapshot', 1000.0))
+        self.assertEqual(next(content), b': keep-alive\n\n')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.member, 'DEPOSIT', Decimal(250))
+        events = dict(sse_events(next(content)))
+        self.assertEqual(events['transaction']['amount'], '250')
+        self.assertEqual(events['summary'], {'savings': 1250.0})
+
+        self.close_stream(response)
+        self.assertEqual(broker.channels, {})
+
+    def test_staff_stream_patches_changed_members(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('staff_events')).status_code, 403)
+
+        response, content = self.open_stream(views.staff_events, self.staff)
+        [(_, snapshot)] = sse_events(next(content))
+        self.assertEqual(snapshot['total_users'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.member, 'SHARE_TRANSFER', Decimal(400))
+        events = dict(sse_events(next(content)))
+        self.assertEqual(events['summary'], {'share_pool': 400.0, 'available_capital': 400.0})
+        self.assertEqual(events['members'], [{'id': self.member.pk, 'savings': 600.0, 'loan_balance': 0.0}])
+
+    def test_staff_streams_share_one_aggregate_per_change(self):
+        streams = [self.open_stream(views.staff_events, self.staff)[1] for _ in range(3)]
+        for content in streams:
+            next(content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.member, 'SHARE_TRANSFER', Decimal(100))
+        with CaptureQueriesContext(connection) as queries:
+            summaries = [dict(sse_events(next(content)))['summary'] for content in streams]
+        self.assertEqual(summaries, [{'share_pool': 100.0, 'available_capital': 100.0}] * 3)
+        pool_queries = [q for q in queries.captured_queries if 'BOND_INVESTMENT' in q['sql']]
+        self.assertEqual(len(pool_queries), 1)
+
+    async def test_async_stream_coalesces_queued_changes(self):
+        figures = {'savings': 1}
+        stream = EventStream('member:test', lambda: dict(figures))
+        events = stream.__aiter__()
+        self.assertEqual(sse_events(await anext(events)), [('snapshot', {'savings': 1})])
+
+        figures['savings'] = 3
+        # Published from another thread, as a commit in a sync view would
+        await asyncio.to_thread(publish_changes, ['test'] * 2)
+        self.assertEqual(sse_events(await anext(events)), [('summary', {'savings': 3})])
+        await events.aclose()
+        self.assertEqual(broker.channels, {})
+
+    def test_streams_are_off_by_default(self):
+        with self.settings(EVENTS_ENABLED=False):
+            self.client.force_login(self.member)
+            self.assertEqual(self.client.get(reverse('dashboard_events')).status_code, 404)
+            page = self.client.get(reverse('dashboard'))
+            self.assertFalse(page.context['live_events'])
+            self.assertContains(page, 'const liveEvents = false;')
+
+            self.client.force_login(self.staff)
+            self.assertEqual(self.client.get(reverse('staff_events')).status_code, 404)
+            self.assertFalse(self.client.get(reverse('admin_dashboard')).context['live_events'])
+
+    def test_only_asgi_pages_open_streams(self):
+        # Enabled here, but a page served under WSGI still polls
+        self.client.force_login(self.member)
+        self.assertFalse(self.client.get(reverse('dashboard')).context['live_events'])
+        self.assertTrue(live_page_context(AsyncRequestFactory().get('/'))['live_events'])
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.member = User.objects.create_user(username='member', password='password')
+        self.client.force_login(self.member)
+        post_transaction(self.member, 'DEPOSIT', Decimal(1000))
+
+    def sync(self, since):
+        response = self.client.get(reverse('dashboard_api'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unchanged_version_returns_marker_only(self):
+        version = self.client.get(reverse('dashboard_api')).json()['version']
+        self.assertEqual(MemberAccount.objects.get(user=self.member).version, version)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.sync(version), {'changed': False, 'version': version})
+        self.assertFalse(any('finance_transaction' in query['sql'] for query in queries.captured_queries))
+
+    def test_delta_carries_only_rows_written_since(self):
+        version = self.client.get(reverse('dashboard_api')).json()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            withdrawal = post_transaction(self.member, 'WITHDRAWAL', Decimal(300))
+            loan = Loan.objects.create(user=self.member, principal_amount=Decimal(500), duration_months=6)
+
+        data = self.sync(version)
+        self.assertTrue(data['changed'])
+        self.assertEqual(data['savings'], 700.0)
+        self.assertEqual([row['id'] for row in data['transactions']], [withdrawal.pk])
+        self.assertEqual([(row['id'], row['status']) for row in data['loans']], [(loan.pk, 'PENDING')])
+        self.assertEqual(self.sync(data['version']), {'changed': False, 'version': data['version']})
+        self.assertEqual(self.client.get(reverse('dashboard_api_async'), {'since': version}).json(), data)
+
+    def test_rows_past_the_account_version_wait_for_the_next_delta(self):
+        version = self.sync(0)['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.member, 'DEPOSIT', Decimal(50))
+        # As if a writer committed between the account read and the row reads
+        late = Transaction.objects.create(user=self.member, amount=Decimal(5), transaction_type='DEPOSIT')
+        account = MemberAccount.objects.get(user=self.member)
+        MemberAccount.objects.filter(user=self.member).update(version=account.version - 1)
+
+        data = self.sync(version)
+        self.assertEqual([row['amount'] for row in data['transactions']], ['50.00'])
+        self.assertNotIn(late.pk, [row['id'] for row in data['transactions']])
+
+    def test_bulk_paths_stamp_the_rows_they_write(self):
+        loan = Loan.objects.create(user=self.member, principal_amount=Decimal(500), duration_months=6)
+        version = self.sync(0)['version']
+        decide_loans({loan.pk: ('approve', '')})
+        after_approval = self.sync(version)
+        self.assertEqual([row['status'] for row in after_approval['loans']], ['APPROVED'])
+        self.assertEqual(after_approval['transactions'], [])
+
+        repay_member(self.member, Decimal(100))
+        data = self.sync(after_approval['version'])
+        self.assertEqual([row['transaction_type'] for row in data['transactions']], ['WITHDRAWAL'])
+        self.assertEqual([(row['id'], row['balance_due']) for row in data['loans']], [(loan.pk, '430.00')])
+
+    def test_removed_rows_and_unknown_versions_force_a_reload(self):
+        version = self.sync(0)['version']
+        self.assertEqual(self.sync(version + 5), {'changed': True, 'resync': True, 'version': version})
+
+        Transaction.objects.get(user=self.member).delete()
+        data = self.sync(version)
+        self.assertEqual((data['resync'], data['version']), (True, version + 1))
+        self.assertEqual(self.client.get(reverse('dashboard_api'), {'since': 'abc'}).status_code, 400)
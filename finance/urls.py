@@ -10,18 +10,31 @@ urlpatterns = [
     
     # API Routes
     path("api/dashboard-data/", views.dashboard_api, name="dashboard_api"),
+    path("api/async/dashboard-data/", views.dashboard_api_async, name="dashboard_api_async"),
     path("api/apply-loan/", views.apply_loan_api, name="apply_loan_api"),
     path("loans/apply/", views.apply_loan, name="loan_apply"),
     path("api/transact/", views.transact_api, name="transact_api"),
+    path("api/loans/<int:loan_id>/schedule/", views.loan_schedule_api, name="loan_schedule_api"),
+    path("api/loans/schedule-preview/", views.schedule_preview_api, name="schedule_preview_api"),
+    path("api/statement.csv", views.statement_csv, name="statement_csv"),
+    path("api/events/", views.dashboard_events, name="dashboard_events"),
 
     # Staff Routes
     path("staff/dashboard/", views.staff_dashboard, name="staff_dashboard"),
     path("staff/approve/<int:loan_id>/", views.approve_loan, name="approve_loan"),
     path("staff/reject/<int:loan_id>/", views.reject_loan, name="reject_loan"),
+    path("api/staff/loans/decide/", views.decide_loans_api, name="decide_loans_api"),
 
     # ADMIN ROUTES
     path("admin-portal/", views.admin_dashboard, name="admin_dashboard"), # Admin Home
     path("api/admin-data/", views.admin_dashboard_api, name="admin_dashboard_api"), # Admin Data
+    path("api/async/admin-data/", views.admin_dashboard_api_async, name="admin_dashboard_api_async"), # Admin Data (ASGI)
+    path("api/staff/events/", views.staff_events, name="staff_events"), # Live admin updates
     path("api/admin-invest/", views.admin_invest_api, name="admin_invest_api"), # Buy Bonds
+    path("api/cache-stats/", views.cache_stats_api, name="cache_stats_api"), # Dashboard cache hit rate
+    path("api/metrics", views.metrics_api, name="metrics_api"), # Prometheus scrape target
+    path("api/reports/par/", views.par_report_api, name="par_report_api"), # Portfolio at risk summary
+    path("staff/reports/loan-aging.csv", views.par_report_csv, name="par_report_csv"), # Per-loan aging export
+    path("staff/statements.csv", views.staff_statements_csv, name="staff_statements_csv"), # Bulk member statements
     path("staff/delete-user/<int:user_id>/", views.delete_user, name="delete_user"), # Delete User
 ]
\ No newline at end of file
@@ -11,19 +11,59 @@ from django.db import IntegrityError
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Transaction, Loan, LoanRepayment
+from .models import Transaction, Loan, MemberAccount
 from django.contrib.admin.views.decorators import staff_member_required # <--- Add to imports
 from django.shortcuts import get_object_or_404, redirect
 from django.utils import timezone 
 from django.core.paginator import Paginator
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+from .pagination import keyset_page, apaginate, InvalidCursor
+from .delta import RESYNC, InvalidVersion, changes_since, parse_version
+from .repayments import repay_member, RepaymentError
+from .approvals import parse_decisions, decide_loans
+from .eligibility import member_eligibility, annotate_eligibility, assess
+from .dividends import latest_dividend, alatest_dividend
+from .schedules import schedule_for, add_months, ScheduleError
+from .ledger import STATEMENT_HEADER, statement_lines
+from .periods import balances_as_of
+from .archive import archived_through
+from .reports import AGING_BUCKETS, AGING_CSV_HEADER, loan_aging, par_report
+from .posting import InsufficientFunds
+from .group_commit import submit_transaction
+from .events import EventStream, STAFF_CHANNEL, event_response, events_enabled, live_page_context, member_channel
+from .metrics import render_prometheus
+from .replica import reads_from_replica, replica_synced_at
+from .async_reads import acondition, gather_reads, resolve_user
+from .cache import cached_dashboard_summary, acached_dashboard_summary, cached_admin_totals, cache_stats, member_state, ledger_state
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
+import asyncio
+from asgiref.sync import sync_to_async
+import hashlib
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
+from datetime import datetime, time
+from django.utils.dateparse import parse_date
+import csv
+import itertools
+from django.http import StreamingHttpResponse
+
+HISTORY_PAGE_SIZE = 5
+
+# Pending applications shown per page of the staff queue
+STAFF_QUEUE_PAGE_SIZE = 50
+
+# Annual rate (%) applied to new loan applications
+LOAN_INTEREST_RATE = Decimal(12)
 
 
 @login_required
 def dashboard(request):
     if request.user.is_staff:
         return HttpResponseRedirect(reverse("admin_dashboard")) 
-    return render(request, "finance/index.html")
+    return render(request, "finance/index.html", live_page_context(request))
 
 def index(request):
     if request.user.is_authenticated:
@@ -32,24 +72,30 @@ def index(request):
         return HttpResponseRedirect(reverse("dashboard"))       # Users go here
     return render(request, "finance/landing.html")
 
-@login_required
-def dashboard_api(request):
-    user = request.user
-
-    deposits = Transaction.objects.filter(user=user, transaction_type='DEPOSIT').aggregate(Sum('amount'))['amount__sum'] or 0
-    withdrawals = Transaction.objects.filter(user=user, transaction_type='WITHDRAWAL').aggregate(Sum('amount'))['amount__sum'] or 0
-    share_transfers = Transaction.objects.filter(user=user, transaction_type='SHARE_TRANSFER').aggregate(Sum('amount'))['amount__sum'] or 0
+def dashboard_summary(user, account=None):
+    account = account or MemberAccount.for_user(user)
+    # Stored by the annual dividend run (dividends.py), not recomputed per request
+    dividend = latest_dividend(user)
+    latest_loan = Loan.objects.filter(user=user).order_by('-date_applied').first()
+    return summary_data(account, dividend, latest_loan)
+
+async def adashboard_summary(user):
+    # Single-row index lookups: queued together on the async ORM's thread, no extra connections
+    (account, _), dividend, latest_loan = await asyncio.gather(
+        MemberAccount.objects.aget_or_create(user=user),
+        alatest_dividend(user),
+        Loan.objects.filter(user=user).order_by('-date_applied').afirst(),
+    )
+    return summary_data(account, dividend, latest_loan)
 
-    current_savings = deposits - withdrawals - share_transfers
-    
-    share_capital = share_transfers
+def summary_data(account, dividend, latest_loan):
+    current_savings = account.savings
     
-    projected_dividends = float(share_capital) * 0.10
+    share_capital = account.share_capital
 
-    active_loans = Loan.objects.filter(user=user, status='APPROVED').aggregate(Sum('balance_due'))['balance_due__sum'] or 0
-    total_loans_count = Loan.objects.filter(user=user, status='APPROVED').count()
+    active_loans = account.loan_balance
+    total_loans_count = account.active_loans
     
-    latest_loan = Loan.objects.filter(user=user).order_by('-date_applied').first()
     loan_status_data = None
     if latest_loan:
         loan_status_data = {
@@ -58,29 +104,163 @@ def dashboard_api(request):
             'reason': latest_loan.rejection_reason if latest_loan.status == 'REJECTED' else ''
         }
 
-    
-    page_number = request.GET.get('page', 1)
-    transaction_query = Transaction.objects.filter(user=user).order_by('-date').values(
-        'transaction_type', 'amount', 'date', 'reference_code'
-    )
-    
-    paginator = Paginator(transaction_query, 5) 
-    page_obj = paginator.get_page(page_number)
-
-    return JsonResponse({
+    return {
         'savings': float(current_savings),
         'share_capital': float(share_capital), 
-        'dividends': projected_dividends,      
+        'dividends': float(dividend['amount']) if dividend else 0.0,
+        'dividend_year': dividend['year'] if dividend else None,
         'loan_balance': float(active_loans),
         'loans_count': total_loans_count,
         'recent_loan': loan_status_data,
+        # Ledger version these figures reflect; send it back as ?since= for a delta
+        'version': account.version,
+    }
+
+# Conditional GET validators: built from account versions only, so a 304 costs no ledger queries
+def query_digest(request):
+    return hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest()[:12]
+
+def account_state(request):
+    # The ETag and Last-Modified both come from the account row; read it once per request
+    if not hasattr(request, '_account_state'):
+        request._account_state = member_state(request.user.pk)
+    return request._account_state
+
+def dashboard_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    version, _ = account_state(request)
+    return f"member-{request.user.pk}-{version}-{query_digest(request)}"
+
+def dashboard_last_modified(request):
+    if not request.user.is_authenticated:
+        return None
+    _, modified = account_state(request)
+    return modified
+
+def admin_state(request):
+    if not hasattr(request, '_ledger_state'):
+        request._ledger_state = ledger_state()
+    return request._ledger_state
+
+def admin_etag(request):
+    if not request.user.is_staff:
+        return None
+    # Served from the replica: a refresh changes the data without a ledger write
+    synced = replica_synced_at()
+    replica = f"-{synced.timestamp():.6f}" if synced else ""
+    version, _ = admin_state(request)
+    return f"ledger-{version}{replica}-{query_digest(request)}"
+
+def admin_last_modified(request):
+    if not request.user.is_staff:
+        return None
+    _, modified = admin_state(request)
+    return max(filter(None, (modified, replica_synced_at())), default=None)
+
+def cursor_history(user):
+    return Transaction.objects.filter(user=user).values('id', 'transaction_type', 'amount', 'date', 'reference_code')
+
+def page_history(user):
+    return Transaction.objects.filter(user=user).order_by('-date').values(
+        'id', 'transaction_type', 'amount', 'date', 'reference_code'
+    )
+
+def cursor_payload(summary, page):
+    return {
+        **summary,
+        'transactions': page['rows'],
+        'has_next': page['has_next'],
+        'has_previous': page['has_previous'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    }
+
+def delta_payload(user, since):
+    account, rows = changes_since(user, since)
+    if rows is None:
+        return {'changed': False, 'version': account.version}
+    if rows is RESYNC:
+        return {'changed': True, 'resync': True, 'version': account.version}
+
+    summary = cached_dashboard_summary(user, dashboard_summary)
+    # The cache key is read apart from `account`, so a write in between can leave them a version apart
+    if summary.get('version') != account.version:
+        summary = dashboard_summary(user, account)
+    return {'changed': True, **summary, **rows}
+
+def page_payload(summary, paginator, page_obj):
+    return {
+        **summary,
         
         'transactions': list(page_obj.object_list),
         'has_next': page_obj.has_next(),
         'has_previous': page_obj.has_previous(),
         'current_page': page_obj.number,
         'num_pages': paginator.num_pages
-    })
+    }
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
+def dashboard_api(request):
+    user = request.user
+
+    # Delta mode (?since=<version> from an earlier response): only rows written after it
+    if 'since' in request.GET:
+        try:
+            since = parse_version(request.GET['since'])
+        except InvalidVersion as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(delta_payload(user, since))
+
+    summary = cached_dashboard_summary(user, dashboard_summary)
+
+    # Cursor mode (?cursor=, empty for the first page) seeks by (date, id) without counting
+    if 'cursor' in request.GET:
+        try:
+            page = keyset_page(cursor_history(user), request.GET['cursor'], HISTORY_PAGE_SIZE)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse(cursor_payload(summary, page))
+
+    paginator = Paginator(page_history(user), HISTORY_PAGE_SIZE) 
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+
+    return JsonResponse(page_payload(summary, paginator, page_obj))
+
+# ASGI variants: same JSON and validators as the sync views, with independent
+# queries gathered, and no worker thread held while a slow client downloads the response.
+@login_required
+@resolve_user
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=dashboard_etag, last_modified_func=dashboard_last_modified)
+async def dashboard_api_async(request):
+    user = request.user
+    if 'since' in request.GET:
+        try:
+            since = parse_version(request.GET['since'])
+        except InvalidVersion as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(await sync_to_async(delta_payload)(user, since))
+
+    summary = acached_dashboard_summary(user, adashboard_summary)
+
+    if 'cursor' in request.GET:
+        cursor = request.GET['cursor']
+        try:
+            summary, page = await asyncio.gather(
+                summary, sync_to_async(keyset_page)(cursor_history(user), cursor, HISTORY_PAGE_SIZE),
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(cursor_payload(summary, page))
+
+    summary, (paginator, page_obj) = await asyncio.gather(
+        summary, apaginate(page_history(user), HISTORY_PAGE_SIZE, request.GET.get('page', 1)),
+    )
+    return JsonResponse(page_payload(summary, paginator, page_obj))
 
 @csrf_exempt
 @login_required
@@ -99,15 +279,20 @@ def apply_loan_api(request):
             if amount <= 0 or duration <= 0:
                 return JsonResponse({'success': False, 'error': 'Invalid values'})
 
+            assessment = member_eligibility(request.user.pk, amount)
+            if not assessment.eligible:
+                return JsonResponse({'success': False, 'error': assessment.reasons[0], 'limit': float(assessment.limit)})
+
             # Create the Loan (Default status is PENDING)
             loan = Loan.objects.create(
                 user=request.user,
                 principal_amount=amount,
                 duration_months=duration,
-                interest_rate=Decimal(12.0) 
+                interest_rate=LOAN_INTEREST_RATE
             )
             
-            return JsonResponse({'success': True, 'message': 'Loan Application Submitted!'})
+            return JsonResponse({'success': True, 'message': 'Loan Application Submitted!',
+                                 'limit': float(assessment.limit), 'score': assessment.score})
 
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
@@ -118,6 +303,44 @@ def apply_loan_api(request):
 def apply_loan(request):
     return render(request, "finance/loan_apply.html")
 
+def schedule_data(schedule, start=None):
+    return {
+        'method': schedule.method,
+        'total_interest': float(schedule.total_interest),
+        'total_payment': float(schedule.total_payment),
+        'installments': [{
+            'number': row.number,
+            'due_date': add_months(start, row.number).date().isoformat() if start else None,
+            'payment': float(row.payment),
+            'principal': float(row.principal),
+            'interest': float(row.interest),
+            'balance': float(row.balance),
+        } for row in schedule.installments],
+    }
+
+@login_required
+def loan_schedule_api(request, loan_id):
+    # Members see their own loans only; staff see any
+    loans = Loan.objects.all() if request.user.is_staff else Loan.objects.filter(user=request.user)
+    loan = get_object_or_404(loans, id=loan_id)
+    try:
+        schedule = schedule_for(loan.principal_amount, loan.interest_rate, loan.duration_months,
+                                request.GET.get('method', 'FLAT'))
+    except ScheduleError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Installments fall due monthly from the disbursement date
+    return JsonResponse({'loan_id': loan.id, 'status': loan.status, **schedule_data(schedule, loan.date_approved)})
+
+def schedule_preview_api(request):
+    # What-if schedule for loan_apply.html: pure arithmetic, no database access
+    try:
+        schedule = schedule_for(request.GET.get('amount', ''), LOAN_INTEREST_RATE,
+                                request.GET.get('duration', ''), request.GET.get('method', 'FLAT'))
+    except (ScheduleError, ArithmeticError, ValueError):
+        return JsonResponse({'error': 'Invalid amount, duration or method'}, status=400)
+    return JsonResponse(schedule_data(schedule))
+
 def login_view(request):
     if request.method == "POST":
         username = request.POST["username"]
@@ -174,80 +397,31 @@ def transact_api(request):
                 return JsonResponse({'success': False, 'error': 'Invalid amount'})
 
             if action == 'DEPOSIT':
-                Transaction.objects.create(
-                    user=request.user,
-                    amount=amount,
-                    transaction_type='DEPOSIT',
-                    reference_code='MPESA-TOPUP'
-                )
+                submit_transaction(request.user, 'DEPOSIT', amount, reference_code='MPESA-TOPUP')
                 return JsonResponse({'success': True, 'message': 'Top-up Successful!'})
 
             elif action == 'SHARE_TRANSFER':
-                current_bal = dashboard_api(request).content
+                try:
+                    submit_transaction(request.user, 'SHARE_TRANSFER', amount, reference_code='TO SHARES')
+                except InsufficientFunds as e:
+                    return JsonResponse({'success': False, 'error': str(e)})
 
-                deps = Transaction.objects.filter(user=request.user, transaction_type='DEPOSIT').aggregate(Sum('amount'))['amount__sum'] or 0
-                wds = Transaction.objects.filter(user=request.user, transaction_type__in=['WITHDRAWAL', 'SHARE_TRANSFER']).aggregate(Sum('amount'))['amount__sum'] or 0
-                available = deps - wds
-                
-                if available < amount:
-                    return JsonResponse({'success': False, 'error': 'Insufficient funds in Current Account'})
-
-                Transaction.objects.create(
-                    user=request.user,
-                    amount=amount,
-                    transaction_type='SHARE_TRANSFER',
-                    reference_code='TO SHARES'
-                )
                 return JsonResponse({'success': True, 'message': 'Shares bought successfully!'})
 
             elif action == 'REPAY':
-                
-                active_loans = Loan.objects.filter(user=request.user, status='APPROVED').order_by('date_approved')
-                
-                if not active_loans.exists():
-                    return JsonResponse({'success': False, 'error': 'No active loans to repay'})
-                
-                remaining_payment = amount
-                Transaction.objects.create(
-                    user=request.user,
-                    amount=amount,
-                    transaction_type='WITHDRAWAL',
-                    reference_code='LOAN REPAYMENT'
-                )
-
-                for loan in active_loans:
-                    if remaining_payment <= 0:
-                        break
-
-                    debt = loan.balance_due
-                    
-                    if remaining_payment >= debt:
-                        pay_amount = debt
-                        remaining_payment -= debt
-                        
-                        LoanRepayment.objects.create(loan=loan, amount=pay_amount) 
-                    else:
-                        LoanRepayment.objects.create(loan=loan, amount=remaining_payment)
-                        remaining_payment = 0
+                try:
+                    repay_member(request.user, amount)
+                except RepaymentError as e:
+                    return JsonResponse({'success': False, 'error': str(e)})
                 
                 return JsonResponse({'success': True, 'message': 'Repayment Successful!'})
             
             elif action == 'WITHDRAW':
-                deps = Transaction.objects.filter(user=request.user, transaction_type='DEPOSIT').aggregate(Sum('amount'))['amount__sum'] or 0
-                
-                wds = Transaction.objects.filter(user=request.user, transaction_type__in=['WITHDRAWAL', 'SHARE_TRANSFER']).aggregate(Sum('amount'))['amount__sum'] or 0
-                
-                available = deps - wds
-
-                if available < amount:
-                    return JsonResponse({'success': False, 'error': 'Insufficient funds in Current Account'})
+                try:
+                    submit_transaction(request.user, 'WITHDRAWAL', amount, reference_code='MPESA-WITHDRAW')
+                except InsufficientFunds as e:
+                    return JsonResponse({'success': False, 'error': str(e)})
 
-                Transaction.objects.create(
-                    user=request.user,
-                    amount=amount,
-                    transaction_type='WITHDRAWAL',
-                    reference_code='MPESA-WITHDRAW'
-                )
                 return JsonResponse({'success': True, 'message': 'Withdrawal Successful!'})
 
         except Exception as e:
@@ -257,9 +431,55 @@ def transact_api(request):
 
 @staff_member_required
 def staff_dashboard(request):
-    pending_loans = Loan.objects.filter(status='PENDING').order_by('-date_applied')
+    try:
+        page = keyset_page(pending_loans(request.GET), request.GET.get('cursor'), STAFF_QUEUE_PAGE_SIZE)
+    except InvalidCursor:
+        page = keyset_page(pending_loans(request.GET), None, STAFF_QUEUE_PAGE_SIZE)
+    for row in page['rows']:
+        row['assessment'] = assess(row['loan_limit'], row['principal_amount'], row['loans_repaid'], row['active_loans'])
     return render(request, "finance/staff_dashboard.html", {
-        "loans": pending_loans
+        "loans": page['rows'],
+        "page": page,
+        "filters": {key: request.GET.get(key, '') for key in ('q', 'min_amount', 'max_amount', 'eligible')},
+    })
+
+def pending_loans(params):
+    """
+    The pending queue as keyset-pageable rows (see pagination.keyset_page),
+    filtered by ?q= (username prefix), ?min_amount= / ?max_amount= and
+    ?eligible=1 (requests within the applicant's limit). Each row carries
+    the applicant's savings and borrowing limit, joined in the same query.
+    """
+    loans = annotate_eligibility(Loan.objects.filter(status='PENDING'))
+    if params.get('eligible'):
+        loans = loans.filter(principal_amount__lte=F('loan_limit'))
+    if params.get('q'):
+        loans = loans.filter(user__username__istartswith=params['q'])
+    for key, lookup in (('min_amount', 'principal_amount__gte'), ('max_amount', 'principal_amount__lte')):
+        try:
+            loans = loans.filter(**{lookup: Decimal(params[key])})
+        except (KeyError, ArithmeticError):
+            pass
+    return loans.values('id', 'principal_amount', 'duration_months', 'loan_limit', 'loans_repaid', 'active_loans',
+                        date=F('date_applied'), username=F('user__username'), savings=F('user__account__savings'))
+
+@login_required
+def decide_loans_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    if request.method != "POST":
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    try:
+        decisions, errors = parse_decisions(json.loads(request.body).get('decisions'))
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': str(e) or 'Invalid JSON'}, status=400)
+
+    summary = decide_loans(decisions)
+    return JsonResponse({
+        'success': True,
+        'approved': summary['approved'],
+        'rejected': summary['rejected'],
+        'skipped': errors + summary['skipped'],
     })
 
 @staff_member_required
@@ -284,9 +504,17 @@ def reject_loan(request, loan_id):
 
 # ADMIN VIEWS 
 
+# Sort keys accepted by admin_dashboard_api, mapped to annotated columns
+ADMIN_SORT_FIELDS = {
+    'username': 'username',
+    'joined': 'date_joined',
+    'savings': 'savings',
+    'loan_balance': 'loan_balance',
+}
+
 @staff_member_required
 def admin_dashboard(request):
-    return render(request, "finance/admin_dashboard.html")
+    return render(request, "finance/admin_dashboard.html", live_page_context(request))
 
 @staff_member_required
 def delete_user(request, user_id):
@@ -296,46 +524,111 @@ def delete_user(request, user_id):
             user_to_delete.delete()
     return redirect('admin_dashboard')
 
-@login_required
-def admin_dashboard_api(request):
-    if not request.user.is_staff:
-        return JsonResponse({'error': 'Unauthorized'}, status=403)
+def share_pool():
+    return Transaction.objects.aggregate(
+        shares=Sum('amount', filter=Q(transaction_type='SHARE_TRANSFER')),
+        bonds=Sum('amount', filter=Q(transaction_type='BOND_INVESTMENT')),
+    )
+
+def member_count():
+    return User.objects.filter(is_staff=False).count()
+
+def admin_members(params):
+    """The searched, sorted member table for admin_dashboard_api, and its page size."""
+    members = User.objects.filter(is_staff=False)
+
+    search = params.get('q', '').strip()
+    if search:
+        members = members.filter(Q(username__icontains=search) | Q(email__icontains=search))
+
+    # Balances come from the materialized MemberAccount row, so the whole table is one joined query
+    sort = params.get('sort', '-joined')
+    sort_field = ADMIN_SORT_FIELDS.get(sort.lstrip('-'), 'date_joined')
+    if sort.startswith('-'):
+        sort_field = '-' + sort_field
+
+    members = members.annotate(
+        savings=Coalesce('account__savings', Value(Decimal(0)), output_field=DecimalField()),
+        loan_balance=Coalesce('account__loan_balance', Value(Decimal(0)), output_field=DecimalField()),
+    ).order_by(sort_field, 'id').values('id', 'username', 'email', 'savings', 'loan_balance', 'date_joined')
+
+    try:
+        limit = min(max(int(params.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    return members, limit
 
-    total_share_pool = Transaction.objects.filter(transaction_type='SHARE_TRANSFER').aggregate(Sum('amount'))['amount__sum'] or 0
+def admin_totals(pool, total_users):
+    total_share_pool = pool['shares'] or 0
     
-    total_bonds = Transaction.objects.filter(transaction_type='BOND_INVESTMENT').aggregate(Sum('amount'))['amount__sum'] or 0
+    total_bonds = pool['bonds'] or 0
     
     available_capital = total_share_pool - total_bonds
 
     projected_returns = float(total_bonds) * 0.15
 
-    users = User.objects.filter(is_staff=False).order_by('-date_joined')
-    user_data = []
-
-    for u in users:
-        deps = Transaction.objects.filter(user=u, transaction_type='DEPOSIT').aggregate(Sum('amount'))['amount__sum'] or 0
-        wds = Transaction.objects.filter(user=u, transaction_type__in=['WITHDRAWAL', 'SHARE_TRANSFER']).aggregate(Sum('amount'))['amount__sum'] or 0
-        savings = deps - wds
-
-        loan_bal = Loan.objects.filter(user=u, status='APPROVED').aggregate(Sum('balance_due'))['balance_due__sum'] or 0
-        
-        user_data.append({
-            'id': u.id,
-            'username': u.username,
-            'email': u.email,
-            'savings': float(savings),
-            'loan_balance': float(loan_bal),
-            'joined': u.date_joined
-        })
-
-    return JsonResponse({
-        'total_users': users.count(),
+    return {
+        'total_users': total_users,
         'share_pool': float(total_share_pool),
         'bonds_balance': float(total_bonds),
         'available_capital': float(available_capital),
         'returns': projected_returns,
-        'users': user_data
-    })
+    }
+
+def admin_payload(pool, total_users, paginator, page_obj):
+    user_data = [{
+        'id': u['id'],
+        'username': u['username'],
+        'email': u['email'],
+        'savings': float(u['savings']),
+        'loan_balance': float(u['loan_balance']),
+        'joined': u['date_joined']
+    } for u in page_obj.object_list]
+
+    return {
+        **admin_totals(pool, total_users),
+        'users': user_data,
+
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+        'current_page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'matching_users': paginator.count
+    }
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=admin_etag, last_modified_func=admin_last_modified)
+@reads_from_replica
+def admin_dashboard_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    pool = share_pool()
+    total_users = member_count()
+
+    members, limit = admin_members(request.GET)
+    paginator = Paginator(members, limit)
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+
+    return JsonResponse(admin_payload(pool, total_users, paginator, page_obj))
+
+@login_required
+@resolve_user
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=admin_etag, last_modified_func=admin_last_modified)
+@reads_from_replica
+async def admin_dashboard_api_async(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    members, limit = admin_members(request.GET)
+    # The two table-wide aggregates can run on threads of their own while the page is counted and fetched
+    (pool, total_users), (paginator, page_obj) = await asyncio.gather(
+        gather_reads(share_pool, member_count),
+        apaginate(members, limit, request.GET.get('page', 1)),
+    )
+    return JsonResponse(admin_payload(pool, total_users, paginator, page_obj))
 
 @csrf_exempt
 @staff_member_required
@@ -363,4 +656,139 @@ def admin_invest_api(request):
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
             
-    return JsonResponse({'success': False, 'error': 'POST required'})
\ No newline at end of file
+    return JsonResponse({'success': False, 'error': 'POST required'})
+
+class Echo:
+    """Pseudo-buffer for csv.writer: hands each formatted line straight back."""
+    def write(self, value):
+        return value
+
+def csv_response(header, rows, filename):
+    # Lines are generated as the response is sent, so memory stays flat however many rows there are
+    writer = csv.writer(Echo())
+    lines = itertools.chain([writer.writerow(header)], (writer.writerow(row) for row in rows))
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+@reads_from_replica
+def par_report_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    report = par_report()
+    return JsonResponse({
+        'buckets': [{
+            'bucket': label,
+            'loans': report['buckets'][label]['loans'],
+            'outstanding': float(report['buckets'][label]['outstanding']),
+            'arrears': float(report['buckets'][label]['arrears']),
+        } for label, _, _ in AGING_BUCKETS],
+        'outstanding': float(report['outstanding']),
+        'par30': float(report['par30']),
+        'par90': float(report['par90']),
+    })
+
+@staff_member_required
+@reads_from_replica
+def par_report_csv(request):
+    rows = ([row[column] for column in AGING_CSV_HEADER] for row in loan_aging())
+    return csv_response(AGING_CSV_HEADER, rows, f"loan-aging-{timezone.localdate().isoformat()}.csv")
+
+def statement_since(request):
+    """Parse ?from=YYYY-MM-DD into the start of that day. Returns (since, error)."""
+    if not request.GET.get('from'):
+        return None, None
+    day = parse_date(request.GET['from'])
+    if day is None:
+        return None, JsonResponse({'error': 'Invalid from date, expected YYYY-MM-DD'}, status=400)
+    since = timezone.make_aware(datetime.combine(day, time.min))
+    # Entries before the archive cutoff are only rollups in the hot table
+    through = archived_through()
+    if through and since < through:
+        return None, JsonResponse({'error': f'History before {timezone.localtime(through):%Y-%m-%d} is archived'}, status=400)
+    return since, None
+
+@login_required
+def statement_csv(request):
+    # With ?from= the statement opens with the balance as of that day (closed snapshot + deltas)
+    since, error = statement_since(request)
+    if error:
+        return error
+    transactions = Transaction.objects.filter(user=request.user)
+    opening = None
+    if since:
+        transactions = transactions.filter(date__gte=since)
+        opening = balances_as_of(since, [request.user.pk])
+    rows = statement_lines(transactions, opening=opening, since=since)
+    return csv_response(STATEMENT_HEADER, rows, f"statement-{request.user.username}-{timezone.localdate().isoformat()}.csv")
+
+@staff_member_required
+@reads_from_replica
+def staff_statements_csv(request):
+    # Every member's statement in one file, or only the members given as ?user=<id>&user=<id>
+    since, error = statement_since(request)
+    if error:
+        return error
+    transactions = Transaction.objects.all()
+    user_ids = request.GET.getlist('user')
+    if user_ids:
+        if not all(user_id.isdigit() for user_id in user_ids):
+            return JsonResponse({'error': 'Invalid user id'}, status=400)
+        transactions = transactions.filter(user_id__in=user_ids)
+    opening = None
+    if since:
+        transactions = transactions.filter(date__gte=since)
+        opening = balances_as_of(since, [int(user_id) for user_id in user_ids] or None)
+    rows = statement_lines(transactions, per_member=True, opening=opening, since=since)
+    return csv_response(('member',) + STATEMENT_HEADER, rows, f"statements-{timezone.localdate().isoformat()}.csv")
+
+@login_required
+def cache_stats_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return JsonResponse(cache_stats())
+
+def metrics_api(request):
+    # Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`; staff can read it from a browser
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scraper = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (scraper or request.user.is_staff):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# LIVE UPDATES (server-sent events, see events.py)
+
+def events_disabled():
+    return JsonResponse({'error': 'Live updates are disabled'}, status=404)
+
+@login_required
+def dashboard_events(request):
+    if not events_enabled():
+        return events_disabled()
+    user = request.user
+    stream = EventStream(member_channel(user.pk), lambda: live_summary(user))
+    return event_response(request, stream)
+
+def live_summary(user):
+    # The ledger version is for ?since= catch-ups; a stream delivers rows as events instead
+    summary = cached_dashboard_summary(user, dashboard_summary)
+    return {key: value for key, value in summary.items() if key != 'version'}
+
+def member_rows(user_ids):
+    # Same figures as the rows of admin_dashboard_api, for patching the table in place
+    rows = MemberAccount.objects.filter(user_id__in=user_ids, user__is_staff=False).values_list(
+        'user_id', 'savings', 'loan_balance')
+    return [{'id': user_id, 'savings': float(savings), 'loan_balance': float(loan_balance)}
+            for user_id, savings, loan_balance in rows]
+
+@login_required
+def staff_events(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    if not events_enabled():
+        return events_disabled()
+    # The totals are cached per ledger version, so a change is aggregated once for all staff streams
+    stream = EventStream(STAFF_CHANNEL, lambda: cached_admin_totals(lambda: admin_totals(share_pool(), member_count())),
+                         members=member_rows)
+    return event_response(request, stream)